@@ -1,6 +1,14 @@
 import streamlit as st
 import json
-from services.db.crud._frameworks import save_framework, update_framework, delete_framework
+from services.db.crud._frameworks import save_framework, update_framework, delete_framework, get_framework_structure
+from services.db.crud._framework_items import (
+    get_framework_categories, get_framework_subcategories, get_subcategory_statements,
+    add_framework_category, rename_framework_category, delete_framework_category,
+    add_framework_subcategory, delete_framework_subcategory,
+    add_framework_statement, update_framework_statement, delete_framework_statement
+)
+from services.db.crud._framework_versions import get_framework_versions, diff_framework_versions
+from services.framework_io_service import FRAMEWORK_FILE_FORMATS, detect_file_format, import_framework, iter_framework_export
 
 def display_framework_builder():
     """Display interactive framework builder component"""
@@ -399,20 +407,37 @@ def display_framework_list(available_frameworks):
             with st.expander(f"{framework['name']}", expanded=False):
                 st.markdown(f"**Description:** {framework.get('description', 'No description')}")
                 st.markdown(f"**Created:** {framework.get('created_at', 'Unknown')}")
+                st.markdown(f"**Statements:** {framework.get('statement_count', 0)}")
                 
-                # Show structure preview
-                structure = framework.get('structure', {})
-                if structure:
-                    st.markdown("**Structure:**")
-                    for category in structure.keys():
-                        subcategory_count = len(structure[category])
-                        total_statements = sum(len(statements) for statements in structure[category].values())
-                        st.markdown(f"- {category}: {subcategory_count} subcategories, {total_statements} statements")
+                # Export is generated only on request, streaming rows from the database
+                col1, col2 = st.columns([1, 1])
+                with col1:
+                    export_format = st.selectbox("Export format", FRAMEWORK_FILE_FORMATS, key=f"export_format_{framework['id']}")
+                with col2:
+                    st.write("")
+                    if st.button("Prepare Export", key=f"prepare_export_{framework['id']}", use_container_width=True):
+                        st.session_state[f"export_data_{framework['id']}"] = (export_format, "".join(iter_framework_export(framework['id'], export_format)))
+                prepared_export = st.session_state.get(f"export_data_{framework['id']}")
+                if prepared_export:
+                    st.download_button(
+                        f"Download {prepared_export[0].upper()}",
+                        data=prepared_export[1],
+                        file_name=f"{framework['name']}.{prepared_export[0]}",
+                        key=f"download_export_{framework['id']}",
+                        use_container_width=True
+                    )
+                
+                # Categories and statements are loaded on demand so the listing doesn't fetch every framework's structure
+                if st.toggle("Edit structure in place", key=f"show_structure_{framework['id']}"):
+                    display_framework_item_editor(framework['id'])
+                
+                if st.toggle("Version history", key=f"show_versions_{framework['id']}"):
+                    display_framework_versions(framework['id'])
                 
                 col1, col2, col3 = st.columns([1, 1, 1])
                 with col1:
                     if st.button("Load to Builder", key=f"load_{framework['id']}", use_container_width=True):
-                        load_framework_to_builder(framework)
+                        load_framework_to_builder({**framework, 'structure': get_framework_structure(framework['id']) or {}})
                         st.success("Framework loaded to builder!")
                         st.rerun()
                 with col2:
@@ -453,7 +478,7 @@ def display_framework_list(available_frameworks):
                             st.session_state.framework_builder = {
                                 'name': new_name,
                                 'description': new_description,
-                                'categories': framework.get('structure', {})
+                                'categories': get_framework_structure(framework['id']) or {}
                             }
                             del st.session_state[f"editing_framework_{framework['id']}"]
                             st.success("Framework loaded to builder for editing!")
@@ -463,4 +488,187 @@ def display_framework_list(available_frameworks):
                             del st.session_state[f"editing_framework_{framework['id']}"]
                             st.rerun()
     else:
-        st.info("No custom frameworks created yet. Create your first framework above!") 
\ No newline at end of file
+        st.info("No custom frameworks created yet. Create your first framework above!")
+
+def display_framework_item_editor(framework_id):
+    """Edit a saved framework one category/subcategory at a time without rewriting its whole structure"""
+    
+    categories = get_framework_categories(framework_id)
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        new_category = st.text_input("New category", key=f"item_new_category_{framework_id}")
+    with col2:
+        st.write("")
+        if st.button("Add Category", key=f"item_add_category_{framework_id}", use_container_width=True):
+            if add_framework_category(framework_id, new_category.strip()):
+                st.rerun()
+            else:
+                st.error("Category name is empty or already exists.")
+    
+    if not categories:
+        st.info("This framework has no categories yet.")
+        return
+    
+    category_names = [category["name"] for category in categories]
+    selected_category = st.selectbox(
+        "Category",
+        category_names,
+        format_func=lambda name: f"{name} ({next(c['subcategory_count'] for c in categories if c['name'] == name)} subcategories)",
+        key=f"item_category_{framework_id}"
+    )
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        renamed_category = st.text_input("Category name", value=selected_category, key=f"item_category_name_{framework_id}_{selected_category}")
+    with col2:
+        st.write("")
+        if st.button("Rename", key=f"item_rename_category_{framework_id}", use_container_width=True):
+            if rename_framework_category(framework_id, selected_category, renamed_category.strip()):
+                st.rerun()
+            else:
+                st.error("Category name is empty or already exists.")
+    with col3:
+        st.write("")
+        if st.button("Delete Category", key=f"item_delete_category_{framework_id}", use_container_width=True):
+            if delete_framework_category(framework_id, selected_category):
+                st.rerun()
+    
+    subcategories = get_framework_subcategories(framework_id, selected_category)
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        new_subcategory = st.text_input("New subcategory", key=f"item_new_subcategory_{framework_id}_{selected_category}")
+    with col2:
+        st.write("")
+        if st.button("Add Subcategory", key=f"item_add_subcategory_{framework_id}", use_container_width=True):
+            if add_framework_subcategory(framework_id, selected_category, new_subcategory.strip()):
+                st.rerun()
+            else:
+                st.error("Subcategory name is empty or already exists.")
+    
+    if not subcategories:
+        st.info("This category has no subcategories yet.")
+        return
+    
+    subcategory_names = [subcategory["name"] for subcategory in subcategories]
+    selected_subcategory = st.selectbox(
+        "Subcategory",
+        subcategory_names,
+        format_func=lambda name: f"{name} ({next(s['statement_count'] for s in subcategories if s['name'] == name)} statements)",
+        key=f"item_subcategory_{framework_id}_{selected_category}"
+    )
+    
+    if st.button("Delete Subcategory", key=f"item_delete_subcategory_{framework_id}"):
+        if delete_framework_subcategory(framework_id, selected_category, selected_subcategory):
+            st.rerun()
+    
+    # Only the selected subcategory's statements are loaded
+    for statement in get_subcategory_statements(framework_id, selected_category, selected_subcategory):
+        key_suffix = f"{framework_id}_{statement['statement_hash']}_{statement['position']}"
+        col1, col2, col3 = st.columns([6, 1, 1])
+        with col1:
+            edited_text = st.text_area(
+                f"Statement {statement['position'] + 1}",
+                value=statement["text"],
+                height=68,
+                key=f"item_statement_{key_suffix}"
+            )
+        with col2:
+            if st.button("Save", key=f"item_save_statement_{key_suffix}", use_container_width=True):
+                if update_framework_statement(framework_id, selected_category, selected_subcategory, statement["position"], edited_text.strip()):
+                    st.rerun()
+                else:
+                    st.error("Statement is empty or already exists in this subcategory.")
+        with col3:
+            if st.button("Delete", key=f"item_delete_statement_{key_suffix}", use_container_width=True):
+                if delete_framework_statement(framework_id, selected_category, selected_subcategory, statement["position"]):
+                    st.rerun()
+    
+    new_statement = st.text_area("New statement", height=68, key=f"item_new_statement_{framework_id}_{selected_category}_{selected_subcategory}")
+    if st.button("Add Statement", key=f"item_add_statement_{framework_id}"):
+        if add_framework_statement(framework_id, selected_category, selected_subcategory, new_statement.strip()):
+            st.rerun()
+        else:
+            st.error("Statement is empty or already exists in this subcategory.")
+
+def display_framework_import():
+    """Import a framework from a CSV, JSONL or JSON file"""
+    
+    st.markdown("#### Import Framework")
+    st.markdown("Upload a CSV/JSONL file with `category`, `subcategory` and `statement` columns, "
+                "or a JSON file with a list of such rows or a `{category: {subcategory: [statements]}}` structure.")
+    
+    uploaded_file = st.file_uploader("Framework file", type=["csv", "jsonl", "ndjson", "json"], key="framework_import_file")
+    import_name = st.text_input("Framework Name", key="framework_import_name")
+    import_description = st.text_area("Framework Description", key="framework_import_description", height=68)
+    
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        validate_btn = st.button("Validate", key="framework_import_validate", use_container_width=True, disabled=uploaded_file is None)
+    with col2:
+        import_btn = st.button("Import", key="framework_import_submit", use_container_width=True, type="primary",
+                               disabled=uploaded_file is None or not import_name)
+    
+    if (validate_btn or import_btn) and uploaded_file is not None:
+        file_format = detect_file_format(uploaded_file.name)
+        with st.spinner("Processing framework file..."):
+            report = import_framework(
+                uploaded_file,
+                file_format,
+                import_name,
+                description=import_description or None,
+                created_by=st.session_state.user.get("id") if st.session_state.get("user") else None,
+                dry_run=validate_btn
+            )
+        
+        if report["framework_id"]:
+            st.success(f"Imported {report['imported']} statements into '{import_name}'.")
+        elif validate_btn and report["imported"]:
+            st.info(f"{report['imported']} of {report['rows_read']} rows are valid.")
+        else:
+            st.error("No statements were imported.")
+        
+        if report["error_count"]:
+            st.warning(f"{report['error_count']} rows had errors.")
+            st.dataframe(report["errors"], use_container_width=True)
+
+def display_framework_versions(framework_id):
+    """Show the version history of a framework and the diff between two versions"""
+    
+    versions = get_framework_versions(framework_id)
+    if not versions:
+        st.info("No versions recorded yet.")
+        return
+    
+    st.dataframe(
+        [{"Version": v["version"], "Statements": v["statement_count"], "Created": v["created_at"]} for v in versions],
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    if len(versions) < 2:
+        return
+    
+    version_numbers = [v["version"] for v in versions]
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        from_version = st.selectbox("Compare from", version_numbers, index=1, key=f"diff_from_{framework_id}")
+    with col2:
+        to_version = st.selectbox("To", version_numbers, index=0, key=f"diff_to_{framework_id}")
+    
+    diff = diff_framework_versions(framework_id, from_version, to_version)
+    if not diff:
+        st.error("Could not compare these versions.")
+        return
+    
+    st.markdown(f"**Added:** {len(diff['added'])} | **Removed:** {len(diff['removed'])} | **Moved:** {len(diff['moved'])}")
+    for label, key in (("Added", "added"), ("Removed", "removed")):
+        if diff[key]:
+            st.markdown(f"**{label}:**")
+            for item in diff[key]:
+                st.markdown(f"- {item['text']} _({item['category']} → {item['subcategory']})_")
+    if diff["moved"]:
+        st.markdown("**Moved:**")
+        for item in diff["moved"]:
+            st.markdown(f"- {item['text']} _({item['from']['subcategory']} → {item['to']['subcategory']})_")
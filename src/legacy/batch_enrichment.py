@@ -1,5 +1,5 @@
 import streamlit as st
-from services.enrichment_service import enrich_statement_with_llm
+from services.enrichment_service import enrich_statements_batch
 from services.metrics_service import calculate_quality_metrics
 from services.statement_service import get_statements_from_settings, get_category_for_statement
 from services.db.crud._statements import save_statement
@@ -65,18 +65,24 @@ def display_batch_enrichment(sample_statements):
             
             progress_bar = st.progress(0)
             
+            # Enrich all statements in one batched call
+            results = enrich_statements_batch(
+                context,
+                all_statements,
+                statement_length,
+                progress_callback=lambda completed, total: progress_bar.progress(completed / total)
+            )
+            
             # Process each statement
-            for i, statement in enumerate(all_statements):
+            for statement, result in zip(all_statements, results):
                 try:
-                    # Update progress
-                    progress = (i + 1) / len(all_statements)
-                    progress_bar.progress(progress)
+                    if result["error"] is not None:
+                        raise result["error"]
                     
                     # Get category and subcategory for the statement
                     category, subcategory = get_category_for_statement(statement)
                     
-                    # Enrich statement
-                    enriched_statement = enrich_statement_with_llm(context, statement, statement_length)
+                    enriched_statement = result["enriched"]
                     
                     # Calculate metrics
                     metrics = calculate_quality_metrics(statement, enriched_statement)
@@ -0,0 +1,150 @@
+"""
+Command-line management tasks.
+
+Usage:
+    python src/manage.py import-framework catalog.csv --name "IT Skills"
+    python src/manage.py export-framework 3 catalog.jsonl
+    python src/manage.py build-personas --clusters 8
+    python src/manage.py train-evaluator --min-samples 50
+"""
+import argparse
+import sys
+from dotenv import load_dotenv
+
+from services.db.init_db import init_db
+from services.framework_io_service import (
+    FRAMEWORK_FILE_FORMATS, DEFAULT_IMPORT_BATCH_SIZE, detect_file_format, import_framework, export_framework
+)
+from services.persona_service import DEFAULT_PERSONA_COUNT, build_personas
+from services.learned_evaluator_service import DEFAULT_MIN_TRAINING_SAMPLES, DEFAULT_TEST_FRACTION, train_learned_evaluator
+
+# Load environment variables
+load_dotenv()
+
+def resolve_format(path, file_format):
+    """Returns the explicit format or the one detected from the file extension"""
+    file_format = file_format or detect_file_format(path)
+    if not file_format:
+        raise SystemExit(f"Cannot detect the format of '{path}', use --format ({', '.join(FRAMEWORK_FILE_FORMATS)})")
+    return file_format
+
+def import_framework_command(args):
+    """Import a framework file"""
+    file_format = resolve_format(args.path, args.format)
+    with open(args.path, "rb") as stream:
+        report = import_framework(
+            stream,
+            file_format,
+            args.name,
+            description=args.description,
+            batch_size=args.batch_size,
+            dry_run=args.dry_run
+        )
+
+    for error in report["errors"]:
+        row = f"row {error['row']}" if error["row"] is not None else "file"
+        print(f"{row}: {error['error']}", file=sys.stderr)
+    if report["error_count"] > len(report["errors"]):
+        print(f"... {report['error_count'] - len(report['errors'])} more errors", file=sys.stderr)
+
+    action = "Validated" if args.dry_run else "Imported"
+    print(f"{action} {report['imported']} of {report['rows_read']} rows ({report['error_count']} errors)")
+    if report["framework_id"]:
+        print(f"Framework ID: {report['framework_id']}")
+    return 0 if report["imported"] else 1
+
+def export_framework_command(args):
+    """Export a framework to a file"""
+    file_format = resolve_format(args.path, args.format)
+    with open(args.path, "w", encoding="utf-8", newline="") as stream:
+        export_framework(args.framework_id, stream, file_format)
+    print(f"Exported framework {args.framework_id} to {args.path}")
+    return 0
+
+def build_personas_command(args):
+    """Cluster profiles into personas and pre-enrich the active statements for each"""
+    def report_progress(completed, total):
+        print(f"\rEnriched {completed}/{total}", end="", file=sys.stderr, flush=True)
+
+    report = build_personas(
+        n_clusters=args.clusters,
+        statement_length=args.statement_length,
+        max_attempts=args.max_attempts,
+        max_concurrency=args.max_concurrency,
+        progress_callback=report_progress
+    )
+    print(file=sys.stderr)
+    print(f"Built {report['personas']} personas from {report['profiles']} profiles: "
+          f"{report['enriched']} enrichments for {report['statements']} statements ({report['failed']} failed)")
+    return 0 if report["personas"] else 1
+
+def train_evaluator_command(args):
+    """Fit the learned evaluator on the rated quiz statement pairs"""
+    try:
+        result = train_learned_evaluator(
+            min_samples=args.min_samples,
+            test_fraction=args.test_fraction,
+            activate=not args.no_activate
+        )
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    report = result["report"]
+    roc_auc = f"{report['roc_auc']:.3f}" if report["roc_auc"] is not None else "n/a"
+    print(f"Trained on {report['samples']} pairs ({report['positive_rate']:.0%} prefer the enriched statement)")
+    print(f"Held-out ({report['test_samples']} pairs): accuracy {report['accuracy']:.3f} "
+          f"(majority baseline {report['baseline_accuracy']:.3f}), ROC AUC {roc_auc}, Brier score {report['brier_score']:.3f}")
+    print("Calibration:")
+    for row in report["calibration"]:
+        print(f"  {row['range']}: predicted {row['predicted']:.2f}, observed {row['observed']:.2f} (n={row['count']})")
+    print("Coefficients (standardized):")
+    for name, value in sorted(report["coefficients"].items(), key=lambda item: -abs(item[1])):
+        print(f"  {name}: {value:+.3f}")
+    status = "not activated" if args.no_activate else "active"
+    print(f"Learned evaluator ID: {result['evaluator_id']} ({status})")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="DigiBot management commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import-framework", help="Import a framework from CSV, JSONL or JSON")
+    import_parser.add_argument("path", help="File to import")
+    import_parser.add_argument("--name", required=True, help="Name of the new framework")
+    import_parser.add_argument("--description", help="Framework description")
+    import_parser.add_argument("--format", choices=FRAMEWORK_FILE_FORMATS, help="File format (detected from the extension by default)")
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_IMPORT_BATCH_SIZE, help="Rows validated and inserted per batch")
+    import_parser.add_argument("--dry-run", action="store_true", help="Validate the file without saving")
+    import_parser.set_defaults(func=import_framework_command)
+
+    export_parser = subparsers.add_parser("export-framework", help="Export a framework to CSV, JSONL or JSON")
+    export_parser.add_argument("framework_id", type=int, help="ID of the framework")
+    export_parser.add_argument("path", help="Output file")
+    export_parser.add_argument("--format", choices=FRAMEWORK_FILE_FORMATS, help="File format (detected from the extension by default)")
+    export_parser.set_defaults(func=export_framework_command)
+
+    personas_parser = subparsers.add_parser("build-personas", help="Cluster profiles into personas and pre-enrich statements")
+    personas_parser.add_argument("--clusters", type=int, default=DEFAULT_PERSONA_COUNT, help="Number of personas")
+    personas_parser.add_argument("--statement-length", type=int, default=150, help="Target length of the enriched statements")
+    personas_parser.add_argument("--max-attempts", type=int, help="Regeneration attempts per statement (evaluation settings by default)")
+    personas_parser.add_argument("--max-concurrency", type=int, help="Parallel generations (generation settings by default)")
+    personas_parser.set_defaults(func=build_personas_command)
+
+    evaluator_parser = subparsers.add_parser("train-evaluator", help="Train the learned evaluator on quiz preferences")
+    evaluator_parser.add_argument("--min-samples", type=int, default=DEFAULT_MIN_TRAINING_SAMPLES, help="Minimum number of usable rated pairs")
+    evaluator_parser.add_argument("--test-fraction", type=float, default=DEFAULT_TEST_FRACTION, help="Share of pairs held out for the report")
+    evaluator_parser.add_argument("--no-activate", action="store_true", help="Store the model without making it the active one")
+    evaluator_parser.set_defaults(func=train_evaluator_command)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not init_db():
+        print("Database initialization failed", file=sys.stderr)
+        return 1
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ import pandas as pd
 import datetime
 from services.db.crud._quiz import get_quiz_results_all_users, get_available_quiz_dates, get_quiz_results_by_date_range
 from services.db.crud._settings import get_competency_questions_enabled
+from services.db.crud._llm_calls import get_llm_call_rollup, get_quiz_llm_usage
 from services.results_visualization_service import (
     create_preference_pie_chart,
     create_detailed_criterion_chart,
@@ -24,6 +25,12 @@ def display_analytics():
         return
     
     st.title("📊 Analytics Dashboard")
+    
+    view = st.radio("View:", ["Assessment Results", "LLM Usage"], horizontal=True, key="analytics_view")
+    if view == "LLM Usage":
+        display_llm_usage()
+        return
+    
     st.markdown("### Global Results from All Users")
     
     # Date filtering section
@@ -124,6 +131,84 @@ def display_analytics():
         display_global_preferences_summary(all_quiz_results, total_responses)
         display_global_detailed_results(all_quiz_results)
 
+def display_llm_usage():
+    """Display token usage, latency and cost of LLM calls"""
+    st.markdown("### LLM Usage")
+    
+    period = st.selectbox("Period:", ["Last 7 days", "Last 30 days", "All time"], key="llm_usage_period")
+    start_date = None
+    if period != "All time":
+        start_date = datetime.date.today() - datetime.timedelta(days=7 if period == "Last 7 days" else 30)
+    
+    by_operation = get_llm_call_rollup("operation", start_date=start_date)
+    if not by_operation:
+        st.info("No LLM calls recorded for the selected period.")
+        return
+    
+    total_calls = sum(row["calls"] for row in by_operation)
+    total_input = sum(row["input_tokens"] for row in by_operation)
+    total_cached = sum(row["cached_tokens"] for row in by_operation)
+    total_output = sum(row["output_tokens"] for row in by_operation)
+    total_cost = sum(row["cost"] for row in by_operation)
+    
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("Calls", total_calls)
+    with col2:
+        st.metric("Input Tokens", f"{total_input:,}")
+    with col3:
+        st.metric("Cached Input", f"{total_cached / total_input:.0%}" if total_input else "0%")
+    with col4:
+        st.metric("Output Tokens", f"{total_output:,}")
+    with col5:
+        st.metric("Estimated Cost", f"${total_cost:,.2f}")
+    
+    def usage_table(rows, key_column, key_label):
+        return pd.DataFrame([{
+            key_label: row[key_column] if row[key_column] is not None else "—",
+            "Calls": row["calls"],
+            "Failures": row["failures"],
+            "Input Tokens": row["input_tokens"],
+            "Cached Tokens": row["cached_tokens"],
+            "Output Tokens": row["output_tokens"],
+            "Cost ($)": round(row["cost"], 4),
+            "p50 (ms)": round(row["p50_ms"] or 0),
+            "p99 (ms)": round(row["p99_ms"] or 0),
+            "Queue Wait (ms)": round(row["mean_queue_wait_ms"])
+        } for row in rows])
+    
+    tab_operation, tab_prompt, tab_model, tab_attempt, tab_quiz = st.tabs(
+        ["By Operation", "By Prompt", "By Model", "By Attempt", "By Quiz"]
+    )
+    with tab_operation:
+        st.dataframe(usage_table(by_operation, "operation", "Operation"), hide_index=True, use_container_width=True)
+    with tab_prompt:
+        st.dataframe(usage_table(get_llm_call_rollup("prompt_id", start_date=start_date), "prompt_id", "Prompt ID"),
+                     hide_index=True, use_container_width=True)
+    with tab_model:
+        st.dataframe(usage_table(get_llm_call_rollup("model_name", start_date=start_date), "model_name", "Model"),
+                     hide_index=True, use_container_width=True)
+    with tab_attempt:
+        st.caption("Attempt number within threshold-based regeneration.")
+        st.dataframe(usage_table(get_llm_call_rollup("attempt", start_date=start_date), "attempt", "Attempt"),
+                     hide_index=True, use_container_width=True)
+    with tab_quiz:
+        quizzes = get_quiz_llm_usage(start_date=start_date)
+        if quizzes:
+            st.dataframe(pd.DataFrame([{
+                "Started": quiz["started_at"],
+                "User ID": quiz["user_id"],
+                "Completed": quiz["completed"],
+                "Calls": quiz["calls"],
+                "Failures": quiz["failures"],
+                "Input Tokens": quiz["input_tokens"],
+                "Output Tokens": quiz["output_tokens"],
+                "Cost ($)": round(quiz["cost"], 4),
+                "LLM Time (s)": round(quiz["latency_ms"] / 1000, 1)
+            } for quiz in quizzes]), hide_index=True, use_container_width=True)
+        else:
+            st.info("No quiz generations recorded for the selected period.")
+
 def display_global_preferences_summary(all_quiz_results, total_responses):
     """Display summary of global statement preferences"""
     
@@ -7,6 +7,7 @@ from services.enrichment_service import (
     GENERAL_FEW_SHOT_PROMPT
 )
 from services.metrics_service import calculate_quality_metrics
+from services.ai_service import get_task_model, llm_priority
 from services.db.crud._profiles import get_all_profiles, get_profile
 from services.db.crud._prompts import save_prompt, get_user_prompts, delete_prompt, delete_all_user_prompts
 from services.db.crud._prompt_history import save_prompt_history
@@ -236,7 +237,8 @@ def display_prompt_engineer(sample_statements):
                 st.error("Please select a valid profile before testing.")
             else:
                 try:
-                    with st.spinner("Processing..."):
+                    # Experiments yield to users' quiz generations in the LLM scheduler
+                    with st.spinner("Processing..."), llm_priority("admin"):
                         # Create context from profile
                         context = ", ".join(
                             [f"{k.replace('_', ' ').title()}: {v}" for k, v in active_profile.items() if v])
@@ -263,8 +265,11 @@ def display_prompt_engineer(sample_statements):
                                 max_attempts=max_attempts
                             )
                             
-                            # Get metrics from the best attempt
-                            metrics = history[-1]["metrics"] if history else calculate_quality_metrics(original_statement, enriched_statement)
+                            # Get metrics of the returned attempt
+                            metrics = next((entry["metrics"] for entry in reversed(history)
+                                            if entry["enriched_statement"] == enriched_statement and entry.get("metrics")), None)
+                            if metrics is None:
+                                metrics = calculate_quality_metrics(original_statement, enriched_statement)
                             
                             # Show attempt information
                             st.success(f"Statement generated after {attempts} attempt(s)")
@@ -275,7 +280,8 @@ def display_prompt_engineer(sample_statements):
                                 context, 
                                 original_statement, 
                                 statement_length,
-                                current_prompt
+                                current_prompt,
+                                model_name=get_task_model("enrich")
                             )
                             
                             # Calculate metrics
@@ -62,6 +62,10 @@ def clear_state_for_backward_navigation(from_step, to_step):
         # Clear enriched statements so they can be regenerated
         if 'enriched_statements' in st.session_state:
             st.session_state.enriched_statements = []
+        # Stop generating statements for the abandoned quiz
+        pipeline = st.session_state.pop('quiz_pipeline', None)
+        if pipeline is not None:
+            pipeline.cancel()
         if 'quiz_completed' in st.session_state:
             del st.session_state['quiz_completed']
 
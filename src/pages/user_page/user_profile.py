@@ -1,7 +1,9 @@
 import streamlit as st
 from services.db.crud._profiles import save_profile
 from services.db.crud._settings import get_global_settings
-from services.profile_evaluation_service import evaluate_profile_with_ai
+from services.profile_evaluation_service import aevaluate_profile_with_ai
+from services.event_loop_service import run_async
+from services.telemetry_service import llm_call_context
 
 def display_profile_step():
     st.subheader("Step 1: Create Your Profile")
@@ -120,7 +122,10 @@ def display_profile_step():
                 # Trigger AI evaluation only if enabled in settings
                 if profile_evaluation_enabled:
                     with st.spinner("AI is analyzing your profile..."):
-                        st.session_state.ai_evaluation = evaluate_profile_with_ai(current_profile)
+                        user_id = st.session_state.user.get("id") if st.session_state.get("user") else None
+                        with llm_call_context(user_id=user_id):
+                            # Runs on the shared event loop; the script thread only waits for it
+                            st.session_state.ai_evaluation = run_async(aevaluate_profile_with_ai(current_profile))
                         
                         # If profile is good, automatically proceed to self-assessment
                         if st.session_state.ai_evaluation.get("is_good", True):
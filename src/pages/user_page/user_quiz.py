@@ -1,9 +1,14 @@
 import streamlit as st
 import numpy as np
-from services.statement_service import get_statements_from_settings, get_category_for_statement, get_active_framework
-from services.enrichment_service import enrich_statement_with_llm
-from services.metrics_service import calculate_quality_metrics
+from services.statement_service import get_statements_from_settings, get_category_for_statement, get_active_framework, build_statement_index, get_active_framework_version
+from services.db.crud._statement_catalog import compute_statement_hash
+from services.generation_service import (generate_enriched_statements, get_generation_settings, get_proficiency_label, get_multi_statement_chunk_size,
+                                        get_progressive_settings, lookup_cached_enrichments, GenerationPipeline)
+from services.enrichment_cache_service import get_cache_settings, embed_context
+from services.telemetry_service import llm_call_context, new_quiz_session_id
+from services.persona_service import build_profile_context, get_persona_settings, get_persona_enrichments_for_context, refine_in_background
 from services.db.crud._quiz import save_quiz_results
+from services.db.crud._statement_preferences import save_statement_preference
 from components.meta_questions import display_meta_questions, get_default_criteria, get_competency_criteria, get_meta_questions_styles
 from services.db.crud._settings import get_competency_questions_enabled
 import random  # Добавляем импорт для рандомизации
@@ -20,8 +25,14 @@ def display_quiz_step():
             from pages.user_page.user_flow import navigate_back_to_step
             navigate_back_to_step(1)
     
+    # Pick up statements the background pipeline has finished since the last rerun
+    pipeline = st.session_state.get('quiz_pipeline')
+    if pipeline is not None:
+        report_quiz_position(pipeline)
+        collect_pipeline_statements(pipeline)
+    
     # Check if we have enriched statements
-    if len(st.session_state.get('enriched_statements', [])) < 1:
+    if len(st.session_state.get('enriched_statements', [])) < 1 and pipeline is None:
         handle_empty_statements()
     else:
         display_quiz_interface()
@@ -32,13 +43,14 @@ def handle_empty_statements():
     # Get statements based on user settings
     sample_statements = get_statements_from_settings()
     
+    # Remember the framework version the statements were taken from
+    st.session_state.quiz_framework_version = get_active_framework_version()
+    
     # Use all statements from settings
     # No limit - take all available statements
     
     # Create context from user profile
-    context = ", ".join(
-        [f"{k.replace('_', ' ').title()}: {v}" for k, v in st.session_state.profile.items() if v]
-    )
+    context = build_profile_context(st.session_state.profile)
     
     # Get generation settings from global settings
     from services.db.crud._settings import get_global_settings
@@ -47,63 +59,180 @@ def handle_empty_statements():
     evaluation_enabled = global_settings.get("evaluation_enabled", True) if global_settings else True
     max_attempts = global_settings.get("evaluation_max_attempts", 5) if global_settings else 5
     
-    # Get the active framework for category assignment
-    active_framework = get_active_framework()
+    # Index the active framework once for category assignment
+    statement_index = build_statement_index(get_active_framework())
     
-    # Enrich statements
-    with st.spinner("Generating statements for your self-assessment..."):
-        for statement in sample_statements:
-            # Get category and subcategory for the statement using active framework
-            category, subcategory = get_category_for_statement(statement, active_framework)
-            
-            # Choose generation method based on settings
-            if evaluation_enabled:
-                # Use threshold-based generation with multiple attempts
-                from services.statement_evaluation_service import regenerate_until_threshold
-                
-                # Get proficiency level from profile or use default
-                proficiency = st.session_state.profile.get("digital_proficiency", "Intermediate")
-                if isinstance(proficiency, int):
-                    # Convert numeric proficiency to string
-                    proficiency_map = {
-                        1: "Beginner",
-                        2: "Basic",
-                        3: "Intermediate", 
-                        4: "Advanced",
-                        5: "Expert"
-                    }
-                    proficiency = proficiency_map.get(proficiency, "Intermediate")
-                
-                # Generate with multiple attempts
-                _, enriched, _, _, history = regenerate_until_threshold(
-                    context=context,
-                    original_statement=statement,
-                    proficiency=proficiency,
-                    statement_length=150,
-                    max_attempts=max_attempts
+    # Get proficiency level from profile or use default
+    proficiency = get_proficiency_label(st.session_state.profile.get("digital_proficiency", "Intermediate"))
+    max_concurrency, timeout_seconds = get_generation_settings(global_settings)
+    
+    cache_settings = get_cache_settings(global_settings)
+    persona_settings = get_persona_settings(global_settings)
+    
+    # Group the LLM calls of this quiz for usage telemetry
+    st.session_state.quiz_session_id = new_quiz_session_id()
+    telemetry_fields = {
+        "user_id": st.session_state.user.get("id") if st.session_state.get("user") else None,
+        "quiz_session_id": st.session_state.quiz_session_id,
+        "prompt_id": global_settings.get("selected_prompt_id", 0) if global_settings else 0
+    }
+    
+    with llm_call_context(**telemetry_fields):
+        generation_kwargs = {
+            "proficiency": proficiency,
+            "evaluation_enabled": evaluation_enabled,
+            "max_attempts": max_attempts,
+            "statement_length": 150,
+            "max_concurrency": max_concurrency,
+            "timeout": timeout_seconds,
+            "chunk_size": get_multi_statement_chunk_size(global_settings)
+        }
+        
+        # Serve precomputed enrichments of the nearest persona so the quiz can start right away
+        persona_results = {}
+        if persona_settings["enabled"]:
+            # Cached enrichments (e.g. the refinement of an earlier persona-based quiz) are personalized, so they win
+            cached = lookup_cached_enrichments(
+                sample_statements, context, proficiency, evaluation_enabled, max_attempts,
+                statement_length=150, cache_settings=cache_settings
+            )
+            persona_indices = [index for index in range(len(sample_statements)) if index not in cached]
+            context_embedding = embed_context(context) if persona_indices else None
+            if context_embedding is not None:
+                _, served = get_persona_enrichments_for_context(
+                    [sample_statements[index] for index in persona_indices], context_embedding, proficiency,
+                    statement_length=150, min_similarity=persona_settings["min_similarity"]
+                )
+                persona_results = {persona_indices[index]: enrichment for index, enrichment in served.items()}
+        # Cache hits are served again by generate_enriched_statements
+        remaining_indices = [index for index in range(len(sample_statements)) if index not in persona_results]
+        
+        progressive_enabled, page_size, prefetch_window = get_progressive_settings(global_settings)
+        if progressive_enabled:
+            # Personalize the persona-served statements in the background for the next quiz
+            if persona_results and persona_settings["refinement_enabled"]:
+                refine_in_background(
+                    [sample_statements[index] for index in persona_results], context, cache_settings, **generation_kwargs
                 )
-                
-                # Get metrics from the best attempt
-                metrics = history[-1]["metrics"] if history else calculate_quality_metrics(statement, enriched)
-            else:
-                # Use simple generation (single attempt)
-                enriched = enrich_statement_with_llm(context, statement, 150)
-                metrics = calculate_quality_metrics(statement, enriched)
-            
-            if 'enriched_statements' not in st.session_state:
-                st.session_state.enriched_statements = []
             
-            st.session_state.enriched_statements.append({
-                "original": statement,
-                "enriched": enriched,
-                "metrics": metrics,
-                "category": category,
-                "subcategory": subcategory
-            })
-    
-    st.success(f"Generated {len(sample_statements)} statements! You can now take the self-assessment.")
+            start_progressive_generation(
+                sample_statements, persona_results, remaining_indices, context, statement_index,
+                page_size, prefetch_window, cache_settings, generation_kwargs
+            )
+            return
+        
+        # Enrich statements concurrently; progress is reported from this thread
+        progress_bar = st.progress(0.0, text="Generating statements for your self-assessment...")
+        
+        def report_progress(completed, total):
+            progress_bar.progress(completed / total, text=f"Generated {completed} of {total} statements...")
+        
+        generated = generate_enriched_statements(
+            [sample_statements[index] for index in remaining_indices],
+            context,
+            progress_callback=report_progress,
+            cache_settings=cache_settings,
+            **generation_kwargs
+        )
+        progress_bar.empty()
+        
+        results = [None] * len(sample_statements)
+        for index, enrichment in persona_results.items():
+            results[index] = {"result": enrichment, "error": None}
+        for index, outcome in zip(remaining_indices, generated):
+            results[index] = outcome
+        
+        # Personalize the persona-served statements in the background for the next quiz
+        if persona_results and persona_settings["refinement_enabled"]:
+            refine_in_background(
+                [sample_statements[index] for index in persona_results], context, cache_settings, **generation_kwargs
+            )
+    
+    if 'enriched_statements' not in st.session_state:
+        st.session_state.enriched_statements = []
+    
+    failed_count = 0
+    for statement, outcome in zip(sample_statements, results):
+        if outcome["error"] is not None:
+            failed_count += 1
+            continue
+        
+        append_enriched_statement(statement, outcome["result"], statement_index)
+    
+    if failed_count:
+        st.warning(f"{failed_count} statements could not be generated and were skipped.")
+    
+    st.success(f"Generated {len(sample_statements) - failed_count} statements! You can now take the self-assessment.")
+    st.rerun()
+
+def append_enriched_statement(statement, enrichment, statement_index):
+    """Adds a generated statement pair to the quiz queue"""
+    # Get category and subcategory for the statement using active framework
+    category, subcategory = get_category_for_statement(statement, statement_index=statement_index)
+    
+    st.session_state.enriched_statements.append({
+        "statement_hash": compute_statement_hash(statement),
+        "original": statement,
+        "enriched": enrichment["enriched"],
+        "metrics": enrichment["metrics"],
+        "category": category,
+        "subcategory": subcategory
+    })
+
+def start_progressive_generation(sample_statements, persona_results, remaining_indices, context, statement_index,
+                                 page_size, prefetch_window, cache_settings, generation_kwargs):
+    """
+    Starts the background pipeline and opens the quiz as soon as the first page is ready
+
+    With a prefetch window the pipeline only stays that many statements ahead of the
+    user, so statements the user never reaches are never generated.
+    """
+    if 'enriched_statements' not in st.session_state:
+        st.session_state.enriched_statements = []
+    
+    # Persona statements are ready right away and go first
+    for index in sorted(persona_results):
+        append_enriched_statement(sample_statements[index], persona_results[index], statement_index)
+    
+    # Waves use the full concurrency, so the first page is ready after about one generation
+    max_concurrency = generation_kwargs["max_concurrency"]
+    pipeline = GenerationPipeline(
+        [sample_statements[index] for index in remaining_indices],
+        context,
+        wave_size=max(page_size, max_concurrency),
+        prefetch_window=prefetch_window,
+        cache_settings=cache_settings,
+        **generation_kwargs
+    ).start()
+    st.session_state.quiz_pipeline = pipeline
+    st.session_state.quiz_statement_index = statement_index
+    st.session_state.quiz_page_size = page_size
+    # Pipeline statements follow the persona statements in the quiz queue
+    st.session_state.quiz_pipeline_offset = len(st.session_state.enriched_statements)
+    
+    with st.spinner("Preparing the first statements of your self-assessment..."):
+        while len(st.session_state.enriched_statements) < page_size and pipeline.has_pending():
+            pipeline.wait()
+            collect_pipeline_statements(pipeline)
+    
     st.rerun()
 
+def collect_pipeline_statements(pipeline):
+    """Moves statements the pipeline has finished into the quiz queue"""
+    statement_index = st.session_state.get('quiz_statement_index')
+    for index, outcome in pipeline.take_ready():
+        append_enriched_statement(pipeline.statements[index], outcome["result"], statement_index)
+
+def report_quiz_position(pipeline):
+    """Tells the pipeline how far the user has got; also keeps it alive (heartbeat)"""
+    reached = len(set(st.session_state.get('quiz_shown_indices', [])) | set(st.session_state.get('current_statements', [])))
+    pipeline.heartbeat(max(0, reached - st.session_state.get('quiz_pipeline_offset', 0)))
+
+def is_generation_pending():
+    """True while the background pipeline may still add statements to the quiz"""
+    pipeline = st.session_state.get('quiz_pipeline')
+    return pipeline is not None and pipeline.has_pending()
+
 # Removed get_max_statements_setting() - no longer needed
 # Now using all available statements
 
@@ -118,12 +247,26 @@ def display_quiz_interface():
     
     # Use all available statements - no limit
     total_statements = len(st.session_state.enriched_statements)
+    pipeline = st.session_state.get('quiz_pipeline')
     
     # If all statements have been shown, move to results
     if len(st.session_state.quiz_shown_indices) >= total_statements:
+        if is_generation_pending():
+            # The user caught up with the background generation; wait for its next statements
+            with st.spinner("Preparing the next statements..."):
+                report_quiz_position(pipeline)
+                pipeline.wait()
+            st.rerun()
         st.session_state.flow_step = 3
         st.rerun()
     
+    if pipeline is not None:
+        if pipeline.has_pending():
+            st.caption(f"{len(st.session_state.quiz_shown_indices)} statements answered, "
+                       f"{total_statements - len(st.session_state.quiz_shown_indices) + pipeline.remaining} to go.")
+        elif pipeline.failed:
+            st.warning(f"{pipeline.failed} statements could not be generated and were skipped.")
+    
     # Create a unique key for this quiz iteration
     if 'current_quiz_iteration' not in st.session_state:
         st.session_state.current_quiz_iteration = 0
@@ -141,12 +284,18 @@ def display_quiz_interface():
         available_indices = [i for i in range(len(st.session_state.enriched_statements)) 
                              if i not in st.session_state.quiz_shown_indices]
         
-        # Select statements to show in this quiz
-        statements_to_show = available_indices[:total_statements - len(st.session_state.quiz_shown_indices)]
+        # Select statements to show in this quiz; progressive quizzes are shown page by page
+        if pipeline is not None:
+            statements_to_show = available_indices[:st.session_state.get('quiz_page_size', len(available_indices))]
+        else:
+            statements_to_show = available_indices[:total_statements - len(st.session_state.quiz_shown_indices)]
         
         # Store the statements being shown in this quiz
         if 'current_statements' not in st.session_state:
             st.session_state.current_statements = statements_to_show
+            if pipeline is not None:
+                # Prefetch the statements after this page while the user answers it
+                report_quiz_position(pipeline)
         
         # Display each statement pair with its own set of questions
         for i, statement_idx in enumerate(st.session_state.current_statements):
@@ -332,7 +481,7 @@ def display_quiz_interface():
         st.session_state.pop('current_statements', None)
         
         # Check if we've completed all statements
-        if len(st.session_state.quiz_shown_indices) >= total_statements:
+        if len(st.session_state.quiz_shown_indices) >= total_statements and not is_generation_pending():
             st.session_state.flow_step = 3
         
         st.rerun()
@@ -417,7 +566,8 @@ def handle_quiz_submission(statement_idx, responses, first_is_original):
             "competency": responses.get("competency"),  # Сохраняем только полный текст ответа
             "category": responses.get("category"),
             "subcategory": responses.get("subcategory"),
-            "statement": st.session_state.enriched_statements[statement_idx]["original"]
+            "statement": st.session_state.enriched_statements[statement_idx]["original"],
+            "statement_hash": compute_statement_hash(st.session_state.enriched_statements[statement_idx]["original"])
         }
         
         st.session_state.competency_results.append(competency_data)
@@ -427,6 +577,20 @@ def handle_quiz_submission(statement_idx, responses, first_is_original):
     preference_scores = [preference_mapping[responses[key]] for key in meta_keys if key in responses]
     average_score = sum(preference_scores) / len(preference_scores) if preference_scores else 0
     
+    # Keep the rated pair itself (positive = enriched preferred) as training data for the learned evaluator
+    if preference_scores:
+        statement_pair = st.session_state.enriched_statements[statement_idx]
+        save_statement_preference(
+            st.session_state.user["id"],
+            st.session_state.get("quiz_session_id"),
+            statement_pair.get("statement_hash") or compute_statement_hash(statement_pair["original"]),
+            statement_pair["original"],
+            statement_pair["enriched"],
+            statement_pair.get("metrics"),
+            {key: -preference_mapping[responses[key]] for key in meta_keys if key in responses},
+            -average_score
+        )
+    
     if 'statement_preferences' not in st.session_state:
         st.session_state.statement_preferences = []
     
@@ -443,7 +607,7 @@ def handle_quiz_submission(statement_idx, responses, first_is_original):
     if statement_idx not in st.session_state.quiz_shown_indices:
         st.session_state.quiz_shown_indices.append(statement_idx)
     
-    is_final = len(st.session_state.quiz_shown_indices) >= len(st.session_state.enriched_statements)
+    is_final = len(st.session_state.quiz_shown_indices) >= len(st.session_state.enriched_statements) and not is_generation_pending()
     
     original_count = st.session_state.statement_preferences.count("original")
     enriched_count = st.session_state.statement_preferences.count("enriched")
@@ -465,6 +629,7 @@ def handle_quiz_submission(statement_idx, responses, first_is_original):
         
         # Убедимся, что competency_results имеет правильную структуру перед сохранением
         competency_results_to_save = st.session_state.competency_results
+        framework_id, framework_version = st.session_state.get("quiz_framework_version") or (None, None)
         
         save_quiz_results(
             st.session_state.user["id"],
@@ -473,7 +638,10 @@ def handle_quiz_submission(statement_idx, responses, first_is_original):
             neither_count,
             st.session_state.detailed_quiz_results,
             competency_results=competency_results_to_save,
-            is_final=is_final
+            is_final=is_final,
+            framework_id=framework_id,
+            framework_version=framework_version,
+            quiz_session_id=st.session_state.get("quiz_session_id")
         )
         from services.db.crud._quiz import get_quiz_results_list
         st.session_state.previous_quiz_results = get_quiz_results_list(st.session_state.user["id"])
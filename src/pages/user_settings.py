@@ -7,12 +7,37 @@ from services.statement_service import (get_all_statements, get_all_categories,
                                       CURRENT_STATEMENTS, get_category_for_statement, get_available_frameworks,
                                       get_active_framework, get_all_framework_statements,
                                       get_statements_by_category_from_framework, get_statements_by_subcategory_from_framework,
+                                      get_selected_statement_indices, get_statement_hashes, build_statement_index,
                                       DIGCOMP_FRAMEWORK)
 from services.db.crud._settings import get_global_settings, save_global_settings
-from services.db.crud._prompts import get_user_prompts, get_all_prompts
+from services.db.crud._prompts import get_user_prompts, get_prompt_summaries, get_prompt_content
 from services.db.crud._frameworks import get_framework
-from components.framework_builder import display_framework_builder, display_framework_list
-from services.enrichment_service import DEFAULT_PROMPT, BASIC_PROMPT, DIGCOMP_FEW_SHOT_PROMPT, GENERAL_FEW_SHOT_PROMPT
+from components.framework_builder import display_framework_builder, display_framework_list, display_framework_import
+from services.enrichment_service import (DEFAULT_PROMPT, BASIC_PROMPT, DIGCOMP_FEW_SHOT_PROMPT, GENERAL_FEW_SHOT_PROMPT, MAX_MULTI_CHUNK_SIZE,
+                                        split_prompt_template, get_token_usage_stats)
+from services.generation_service import (DEFAULT_MAX_CONCURRENCY, MAX_CONCURRENCY_LIMIT, DEFAULT_TIMEOUT_SECONDS, DEFAULT_MULTI_STATEMENT_CHUNK_SIZE,
+                                        DEFAULT_PROGRESSIVE_GENERATION, DEFAULT_QUIZ_PAGE_SIZE, MAX_QUIZ_PAGE_SIZE,
+                                        DEFAULT_PREFETCH_WINDOW)
+from services.enrichment_cache_service import get_cache_settings, get_cache_stats, invalidate_prompt, invalidate_framework, clear_cache
+from services.persona_service import get_persona_settings
+from services.statement_evaluation_service import (DEFAULT_SPECULATIVE_CANDIDATES, MAX_SPECULATIVE_CANDIDATES, DEFAULT_SELF_ASSESSMENT_ENABLED,
+                                                   DEFAULT_CALIBRATION_RATE, get_self_assessment_calibration, get_evaluation_stats, RUBRIC_VERSION)
+from services.db.crud._evaluation_cache import get_evaluation_cache_summary, delete_outdated_evaluations
+from services.candidate_filter_service import DEFAULT_PREFILTER_ENABLED, DEFAULT_PREFILTER_MIN_SIMILARITY, get_prefilter_stats
+from services.learned_evaluator_service import (LEARNED_EVALUATOR_MODES, DEFAULT_LEARNED_EVALUATOR_MODE, DEFAULT_LEARNED_MIN_PROBABILITY,
+                                                get_learned_evaluator_stats)
+from services.db.crud._learned_evaluators import get_active_learned_evaluator
+from services.attempt_budget_service import DEFAULT_ADAPTIVE_ATTEMPTS_ENABLED, DEFAULT_MIN_IMPROVEMENT_PROBABILITY, DEFAULT_MIN_OBSERVATIONS
+from services.db.crud._attempt_outcomes import get_attempt_savings
+from services.ai_service import (MODEL_TIERS, ROUTED_TASKS, DEFAULT_MODEL_ROUTING_ENABLED, DEFAULT_TASK_TIERS, DEFAULT_ESCALATE_AFTER,
+                                 DEFAULT_RATE_LIMITS,
+                                 get_routing_policy, get_routing_stats, get_llm_scheduler)
+from services.single_flight_service import get_single_flight_stats
+from services.db.crud._personas import get_persona_summaries, delete_personas
+
+CACHE_SETTING_KEYS = ("enrichment_cache_enabled", "enrichment_cache_ttl_days", "enrichment_cache_max_entries", "enrichment_cache_variants",
+                      "semantic_cache_enabled", "semantic_cache_threshold")
+PERSONA_SETTING_KEYS = ("persona_serving_enabled", "persona_min_similarity", "persona_refinement_enabled")
 
 def display_user_settings():
     st.title("Global Settings")
@@ -87,6 +112,11 @@ def display_framework_management(global_settings):
     
     st.markdown("---")
     
+    # Bulk import from file
+    display_framework_import()
+    
+    st.markdown("---")
+    
     # Existing frameworks management component
     available_frameworks = get_available_frameworks()
     display_framework_list(available_frameworks)
@@ -158,6 +188,7 @@ def display_statement_configuration(global_settings):
         global_settings["selected_categories"] = []
         global_settings["selected_subcategories"] = {}
         global_settings["selected_statements"] = []
+        global_settings["selected_statement_hashes"] = []
         
         # Update settings
         global_settings["statement_source"] = new_source
@@ -171,6 +202,7 @@ def display_statement_configuration(global_settings):
             st.session_state.original_settings["selected_categories"] = []
             st.session_state.original_settings["selected_subcategories"] = {}
             st.session_state.original_settings["selected_statements"] = []
+            st.session_state.original_settings["selected_statement_hashes"] = []
             
             # Show success message for framework change
             st.success(f"✓ Framework changed to: **{selected_framework_name}**. Previous selections cleared.")
@@ -257,6 +289,7 @@ def display_statement_configuration(global_settings):
             if save_global_settings("user_settings", global_settings):
                 # Update original settings for this section
                 st.session_state.original_settings["selected_statements"] = copy.deepcopy(global_settings.get("selected_statements", []))
+                st.session_state.original_settings["selected_statement_hashes"] = copy.deepcopy(global_settings.get("selected_statement_hashes", []))
                 st.session_state.original_settings["selected_categories"] = copy.deepcopy(global_settings.get("selected_categories", []))
                 st.session_state.original_settings["selected_subcategories"] = copy.deepcopy(global_settings.get("selected_subcategories", {}))
                 st.session_state.original_settings["custom_statements"] = copy.deepcopy(global_settings.get("custom_statements", []))
@@ -272,7 +305,7 @@ def display_framework_selection(global_settings, framework):
     all_available_statements = get_all_framework_statements(framework)
     selected_categories = global_settings.get("selected_categories", [])
     selected_subcategories = global_settings.get("selected_subcategories", {})
-    selected_statements = global_settings.get("selected_statements", [])
+    selected_statements = get_selected_statement_indices(global_settings, all_available_statements)
     
     col1, col2 = st.columns(2)
     
@@ -377,12 +410,13 @@ def display_framework_selection(global_settings, framework):
         st.markdown("#### Select Individual Statements")
         
         statement_filter = st.text_input("Filter statements:", key="statement_filter")
+        framework_index = build_statement_index(framework)
         
         for i, statement in enumerate(all_available_statements):
             if statement_filter and statement_filter.lower() not in statement.lower():
                 continue
             
-            category, subcategory = get_category_for_statement(statement, framework)
+            category, subcategory = get_category_for_statement(statement, statement_index=framework_index)
             is_selected_by_category = category in selected_categories
             is_selected_by_subcategory = category in selected_subcategories and subcategory in selected_subcategories[category]
             
@@ -409,10 +443,12 @@ def display_framework_selection(global_settings, framework):
                     selected_statements.remove(i)
     
     global_settings["selected_statements"] = selected_statements
+    global_settings["selected_statement_hashes"] = get_statement_hashes([all_available_statements[i] for i in selected_statements])
     
     # Clear selections button
     if st.button("Clear All Selections", key="clear_all_selections_btn"):
         global_settings["selected_statements"] = []
+        global_settings["selected_statement_hashes"] = []
         global_settings["selected_categories"] = []
         global_settings["selected_subcategories"] = {}
         save_global_settings("user_settings", global_settings)
@@ -423,7 +459,7 @@ def display_digcomp_selection(global_settings):
     all_available_statements = get_all_digcomp_statements()
     selected_categories = global_settings.get("selected_categories", [])
     selected_subcategories = global_settings.get("selected_subcategories", {})
-    selected_statements = global_settings.get("selected_statements", [])
+    selected_statements = get_selected_statement_indices(global_settings, all_available_statements)
     
     col1, col2 = st.columns(2)
     
@@ -528,12 +564,13 @@ def display_digcomp_selection(global_settings):
         st.markdown("#### Select Individual Statements")
         
         statement_filter = st.text_input("Filter statements:", key="statement_filter")
+        framework_index = build_statement_index(DIGCOMP_FRAMEWORK)
         
         for i, statement in enumerate(all_available_statements):
             if statement_filter and statement_filter.lower() not in statement.lower():
                 continue
             
-            category, subcategory = get_category_for_statement(statement, DIGCOMP_FRAMEWORK)
+            category, subcategory = get_category_for_statement(statement, statement_index=framework_index)
             is_selected_by_category = category in selected_categories
             is_selected_by_subcategory = category in selected_subcategories and subcategory in selected_subcategories[category]
             
@@ -560,10 +597,12 @@ def display_digcomp_selection(global_settings):
                     selected_statements.remove(i)
     
     global_settings["selected_statements"] = selected_statements
+    global_settings["selected_statement_hashes"] = get_statement_hashes([all_available_statements[i] for i in selected_statements])
     
     # Clear selections button
     if st.button("Clear All Selections", key="clear_all_selections_btn"):
         global_settings["selected_statements"] = []
+        global_settings["selected_statement_hashes"] = []
         global_settings["selected_categories"] = []
         global_settings["selected_subcategories"] = {}
         save_global_settings("user_settings", global_settings)
@@ -572,7 +611,7 @@ def display_digcomp_selection(global_settings):
 def display_default_selection(global_settings):
     """Display default statement selection interface"""
     all_available_statements = CURRENT_STATEMENTS
-    selected_statements = global_settings.get("selected_statements", [])
+    selected_statements = get_selected_statement_indices(global_settings, all_available_statements)
     
     st.info("The default statement set does not have categories. Select individual statements below.")
     
@@ -595,6 +634,7 @@ def display_default_selection(global_settings):
             selected_statements.remove(i)
     
     global_settings["selected_statements"] = selected_statements
+    global_settings["selected_statement_hashes"] = get_statement_hashes([all_available_statements[i] for i in selected_statements])
 
 def display_custom_statements(global_settings):
     """Display custom statements management"""
@@ -667,10 +707,328 @@ def display_ai_configuration(global_settings):
             help="Maximum attempts to generate a statement that meets quality thresholds."
         )
         global_settings["evaluation_max_attempts"] = max_attempts
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            speculative_candidates = st.slider(
+                "Parallel Candidates per Round",
+                min_value=1,
+                max_value=MAX_SPECULATIVE_CANDIDATES,
+                value=min(int(global_settings.get("speculative_candidates", DEFAULT_SPECULATIVE_CANDIDATES)), MAX_SPECULATIVE_CANDIDATES),
+                help="Generate and evaluate several versions at once and keep the first one that meets the thresholds. "
+                     "Uses more tokens but makes slow statements faster. 1 generates one version at a time."
+            )
+            global_settings["speculative_candidates"] = speculative_candidates
+        with col2:
+            if speculative_candidates > 1:
+                speculative_rounds = st.number_input(
+                    "Maximum Rounds",
+                    min_value=0,
+                    max_value=10,
+                    value=int(global_settings.get("speculative_rounds", 0) or 0),
+                    help="How many rounds of parallel candidates to try. 0 keeps the total number of versions at the maximum attempts."
+                )
+                global_settings["speculative_rounds"] = speculative_rounds
+        
+        self_assessment_enabled = st.toggle(
+            "Score Statements While Generating",
+            value=global_settings.get("self_assessment_enabled", DEFAULT_SELF_ASSESSMENT_ENABLED),
+            help="The model rates its own statement in the same request instead of a separate evaluation request, "
+                 "halving the requests per attempt."
+        )
+        global_settings["self_assessment_enabled"] = self_assessment_enabled
+        
+        if self_assessment_enabled:
+            calibration_rate = st.slider(
+                "Independent Evaluation Sample (%)",
+                min_value=0,
+                max_value=100,
+                value=int(round(float(global_settings.get("self_assessment_calibration_rate", DEFAULT_CALIBRATION_RATE)) * 100)),
+                help="Share of statements that are still evaluated separately, to check how well the self-assessment agrees."
+            )
+            global_settings["self_assessment_calibration_rate"] = calibration_rate / 100
+            
+            calibration = get_self_assessment_calibration()
+            if calibration["samples"]:
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Calibration Samples", calibration["samples"])
+                col2.metric("Same Accept/Reject Decision", f"{calibration['threshold_agreement']:.0%}")
+                col3.metric("Mean Score Difference", f"{sum(calibration['mean_absolute_error'].values()) / len(calibration['mean_absolute_error']):.2f}")
+                st.caption("Self-assessed minus independent score: " + ", ".join(
+                    f"{key.replace('_', ' ')} {bias:+.2f}" for key, bias in calibration["bias"].items()
+                ))
+        
+        prefilter_enabled = st.toggle(
+            "Check Statements Locally Before Evaluation",
+            value=global_settings.get("prefilter_enabled", DEFAULT_PREFILTER_ENABLED),
+            help="Fixes overlong statements and 'As a ...' openings, and rejects statements that mention the proficiency "
+                 "level or drift too far from the original, without an evaluation request."
+        )
+        global_settings["prefilter_enabled"] = prefilter_enabled
+        
+        if prefilter_enabled:
+            prefilter_min_similarity = st.slider(
+                "Minimum Similarity to the Original",
+                min_value=0.0,
+                max_value=1.0,
+                value=float(global_settings.get("prefilter_min_similarity", DEFAULT_PREFILTER_MIN_SIMILARITY)),
+                step=0.05,
+                help="Statements whose embedding similarity to the original is lower are regenerated without evaluation."
+            )
+            global_settings["prefilter_min_similarity"] = prefilter_min_similarity
+            
+            prefilter_stats = get_prefilter_stats()
+            if prefilter_stats["checked"]:
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Statements Checked", prefilter_stats["checked"])
+                col2.metric("Repaired", prefilter_stats["repaired"])
+                col3.metric("Evaluations Saved", prefilter_stats["evaluations_saved"])
+                if prefilter_stats["rejections"]:
+                    st.caption("Rejections: " + ", ".join(
+                        f"{stage.replace('_', ' ')} {count}" for stage, count in prefilter_stats["rejections"].items()
+                    ))
+        
+        learned_labels = {"off": "Off", "gate": "Gate (reject before evaluation)", "replace": "Replace the evaluation"}
+        learned_mode = global_settings.get("learned_evaluator_mode", DEFAULT_LEARNED_EVALUATOR_MODE)
+        learned_mode = st.selectbox(
+            "Learned Evaluator",
+            options=LEARNED_EVALUATOR_MODES,
+            index=LEARNED_EVALUATOR_MODES.index(learned_mode) if learned_mode in LEARNED_EVALUATOR_MODES else 0,
+            format_func=lambda mode: learned_labels[mode],
+            help="A model trained on quiz preferences (python src/manage.py train-evaluator) predicts whether users "
+                 "prefer a statement. Gate skips the evaluation of unlikely candidates; Replace skips it entirely."
+        )
+        global_settings["learned_evaluator_mode"] = learned_mode
+        
+        if learned_mode != "off":
+            learned_min_probability = st.slider(
+                "Minimum Predicted Preference",
+                min_value=0.0,
+                max_value=1.0,
+                value=float(global_settings.get("learned_min_probability", DEFAULT_LEARNED_MIN_PROBABILITY)),
+                step=0.05,
+                help="Candidates with a lower predicted probability that users prefer them are regenerated."
+            )
+            global_settings["learned_min_probability"] = learned_min_probability
+            
+            learned_evaluator = get_active_learned_evaluator()
+            if learned_evaluator is None:
+                st.warning("No learned evaluator is trained yet; candidates are evaluated by the LLM as usual.")
+            else:
+                report = learned_evaluator["report"] or {}
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Training Pairs", learned_evaluator["sample_count"])
+                col2.metric("Held-out Accuracy", f"{report.get('accuracy', 0):.0%}",
+                            help=f"Always predicting the majority preference: {report.get('baseline_accuracy', 0):.0%}")
+                col3.metric("Brier Score", f"{report.get('brier_score', 0):.3f}", help="Lower is better calibrated")
+                if report.get("calibration"):
+                    st.caption("Calibration (predicted vs observed preference): " + ", ".join(
+                        f"{row['predicted']:.2f}/{row['observed']:.2f} (n={row['count']})" for row in report["calibration"]
+                    ))
+                
+                learned_stats = get_learned_evaluator_stats()
+                if learned_stats["scored"]:
+                    agreement = learned_stats["agreement"]
+                    st.caption(
+                        f"This session: {learned_stats['scored']} candidates scored, {learned_stats['rejected']} rejected"
+                        + (f", {agreement:.0%} agreement with the LLM evaluator" if agreement is not None else "")
+                    )
+        
+        adaptive_attempts = st.toggle(
+            "Stop Early When Another Attempt Is Unlikely to Help",
+            value=global_settings.get("adaptive_attempts_enabled", DEFAULT_ADAPTIVE_ATTEMPTS_ENABLED),
+            help="Uses the recorded attempts for the same prompt, proficiency level and statement to estimate whether "
+                 "another attempt would score higher, and stops before the maximum when it probably wouldn't."
+        )
+        global_settings["adaptive_attempts_enabled"] = adaptive_attempts
+        
+        if adaptive_attempts:
+            col1, col2 = st.columns(2)
+            with col1:
+                adaptive_min_probability = st.slider(
+                    "Minimum Improvement Probability",
+                    min_value=0.0,
+                    max_value=0.5,
+                    value=float(global_settings.get("adaptive_min_improvement_probability", DEFAULT_MIN_IMPROVEMENT_PROBABILITY)),
+                    step=0.01,
+                    help="Another attempt is made only if the estimated chance that it improves the best score is at least this."
+                )
+                global_settings["adaptive_min_improvement_probability"] = adaptive_min_probability
+            with col2:
+                adaptive_min_observations = st.number_input(
+                    "Minimum Recorded Runs",
+                    min_value=1,
+                    max_value=1000,
+                    value=int(global_settings.get("adaptive_min_observations", DEFAULT_MIN_OBSERVATIONS)),
+                    help="Runs at a proficiency level that must have reached an attempt before it can be skipped."
+                )
+                global_settings["adaptive_min_observations"] = adaptive_min_observations
+        
+        savings = get_attempt_savings()
+        if savings["adaptive"]["runs"] or savings["fixed"]["runs"]:
+            col1, col2, col3 = st.columns(3)
+            for col, label, runs in ((col1, "Adaptive", savings["adaptive"]), (col2, "Fixed", savings["fixed"])):
+                if runs["runs"]:
+                    col.metric(f"Mean Attempts ({label})", f"{runs['mean_attempts']:.2f}",
+                               help=f"{runs['runs']} runs, {runs['pass_rate']:.0%} met the thresholds")
+            col3.metric("Attempts Saved", savings["adaptive"]["attempts_saved"],
+                        help=f"{savings['adaptive']['stopped_early']} runs stopped before the maximum")
         st.info("The system will generate multiple versions and select the best one.")
     else:
         global_settings["evaluation_max_attempts"] = 1
         st.info("The system will generate a single version without evaluation.")
+        
+        multi_statement_chunk_size = st.slider(
+            "Statements per Request",
+            min_value=1,
+            max_value=MAX_MULTI_CHUNK_SIZE,
+            value=global_settings.get("multi_statement_chunk_size", DEFAULT_MULTI_STATEMENT_CHUNK_SIZE),
+            help="Enrich several statements in one request so the prompt and context are sent once per group. "
+                 "Statements the model doesn't answer properly are retried individually."
+        )
+        global_settings["multi_statement_chunk_size"] = multi_statement_chunk_size
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        generation_max_concurrency = st.slider(
+            "Parallel Generations",
+            min_value=1,
+            max_value=MAX_CONCURRENCY_LIMIT,
+            value=global_settings.get("generation_max_concurrency", DEFAULT_MAX_CONCURRENCY),
+            help="How many statements are generated at the same time. Higher values are faster but may hit API rate limits."
+        )
+        global_settings["generation_max_concurrency"] = generation_max_concurrency
+    with col2:
+        generation_timeout_seconds = st.number_input(
+            "Generation Timeout (seconds)",
+            min_value=10,
+            max_value=600,
+            value=int(global_settings.get("generation_timeout_seconds", DEFAULT_TIMEOUT_SECONDS)),
+            help="Statements that take longer than this to generate are skipped."
+        )
+        global_settings["generation_timeout_seconds"] = generation_timeout_seconds
+    
+    progressive_generation_enabled = st.toggle(
+        "Start Self-Assessment Before All Statements Are Ready",
+        value=global_settings.get("progressive_generation_enabled", DEFAULT_PROGRESSIVE_GENERATION),
+        help="Statements are generated in the background and shown page by page, "
+             "so users can start as soon as the first page is ready."
+    )
+    global_settings["progressive_generation_enabled"] = progressive_generation_enabled
+    
+    if progressive_generation_enabled:
+        quiz_page_size = st.slider(
+            "Statements per Page",
+            min_value=1,
+            max_value=MAX_QUIZ_PAGE_SIZE,
+            value=min(int(global_settings.get("quiz_page_size", DEFAULT_QUIZ_PAGE_SIZE)), MAX_QUIZ_PAGE_SIZE),
+            help="How many statements users answer at a time. The self-assessment starts once this many are ready."
+        )
+        global_settings["quiz_page_size"] = quiz_page_size
+        
+        quiz_prefetch_window = st.number_input(
+            "Statements Prefetched Ahead",
+            min_value=0,
+            max_value=200,
+            value=int(global_settings.get("quiz_prefetch_window", DEFAULT_PREFETCH_WINDOW)),
+            help="How many statements are generated ahead of the user while they answer the current page. "
+                 "Statements users never reach are not generated. 0 generates all statements in the background."
+        )
+        global_settings["quiz_prefetch_window"] = quiz_prefetch_window
+    
+    model_routing_enabled = st.toggle(
+        "Route Tasks to Smaller Models First",
+        value=global_settings.get("model_routing_enabled", DEFAULT_MODEL_ROUTING_ENABLED),
+        help="Each task starts on its model tier and moves to a stronger model only if the answer fails, "
+             "is invalid or doesn't meet the quality thresholds. Without routing every task uses the large model."
+    )
+    global_settings["model_routing_enabled"] = model_routing_enabled
+    
+    if model_routing_enabled:
+        task_labels = {"enrich": "Enrichment", "evaluate": "Evaluation", "chat": "Chat", "profile_eval": "Profile Review"}
+        tiers = list(MODEL_TIERS)
+        model_routing_tiers = dict(global_settings.get("model_routing_tiers") or DEFAULT_TASK_TIERS)
+        for col, task in zip(st.columns(len(ROUTED_TASKS)), ROUTED_TASKS):
+            with col:
+                current_tier = model_routing_tiers.get(task, DEFAULT_TASK_TIERS[task])
+                model_routing_tiers[task] = st.selectbox(
+                    task_labels[task],
+                    options=tiers,
+                    index=tiers.index(current_tier) if current_tier in tiers else len(tiers) - 1,
+                    format_func=lambda tier: f"{tier.title()} ({MODEL_TIERS[tier]})",
+                    key=f"model_tier_{task}"
+                )
+        global_settings["model_routing_tiers"] = model_routing_tiers
+        
+        model_routing_escalate_after = st.number_input(
+            "Enrichment Attempts per Tier",
+            min_value=1,
+            max_value=10,
+            value=int(global_settings.get("model_routing_escalate_after", DEFAULT_ESCALATE_AFTER)),
+            help="Enrichment attempts that miss the thresholds before the next attempt uses a stronger model."
+        )
+        global_settings["model_routing_escalate_after"] = model_routing_escalate_after
+    
+    routing_stats = get_routing_stats()
+    if routing_stats:
+        with st.expander("Latency and Quality per Model Tier"):
+            st.dataframe([{
+                "Task": row["task"],
+                "Tier": row["tier"],
+                "Calls": row["calls"],
+                "Failed / Rejected": row["failures"],
+                "Escalated": row["escalations"],
+                "p50 (ms)": round(row["p50_ms"]) if row["p50_ms"] is not None else None,
+                "p95 (ms)": round(row["p95_ms"]) if row["p95_ms"] is not None else None,
+                "Mean Score": round(row["mean_quality"], 2) if row["mean_quality"] is not None else None
+            } for row in routing_stats], hide_index=True, use_container_width=True)
+            st.caption("Since the app started. Mean score is the enrichment's summed evaluation score.")
+    
+    with st.expander("API Rate Limits"):
+        st.caption("Requests from all users are queued so each model stays under the limits set here, e.g. your OpenAI "
+                   "usage tier's (0 means no limit); quiz generation goes ahead of background work and prompt experiments.")
+        llm_rate_limits = {model: dict(limits) for model, limits in
+                           {**DEFAULT_RATE_LIMITS, **(global_settings.get("llm_rate_limits") or {})}.items()}
+        for model_name in MODEL_TIERS.values():
+            limits = llm_rate_limits.setdefault(model_name, {})
+            col1, col2 = st.columns(2)
+            with col1:
+                limits["rpm"] = st.number_input(
+                    f"{model_name} Requests per Minute",
+                    min_value=0,
+                    max_value=100000,
+                    value=int(limits.get("rpm") or 0),
+                    key=f"rate_limit_rpm_{model_name}"
+                )
+            with col2:
+                limits["tpm"] = st.number_input(
+                    f"{model_name} Tokens per Minute",
+                    min_value=0,
+                    max_value=100000000,
+                    value=int(limits.get("tpm") or 0),
+                    step=1000,
+                    key=f"rate_limit_tpm_{model_name}"
+                )
+        global_settings["llm_rate_limits"] = llm_rate_limits
+        
+        scheduler_stats = get_llm_scheduler().get_stats()
+        if any(stats["requests"] for stats in scheduler_stats["priorities"].values()):
+            st.dataframe([{
+                "Priority": priority.title(),
+                "Requests": stats["requests"],
+                "Mean Wait (ms)": round(stats["mean_wait_ms"]) if stats["mean_wait_ms"] is not None else None,
+                "p95 Wait (ms)": round(stats["p95_wait_ms"]) if stats["p95_wait_ms"] is not None else None,
+                "Max Wait (ms)": round(stats["max_wait_ms"]) if stats["max_wait_ms"] is not None else None
+            } for priority, stats in scheduler_stats["priorities"].items()], hide_index=True, use_container_width=True)
+            st.caption(f"Waiting now: {scheduler_stats['queued']}, rate limit responses: {scheduler_stats['rate_limited']}, "
+                       f"retries: {scheduler_stats['retries']} (since the app started)")
+        
+        # Identical requests in flight at the same time (e.g. a workshop with the same profile) are sent once
+        flight_stats = get_single_flight_stats()
+        if any(stats["shared"] for stats in flight_stats.values()):
+            st.caption("Identical concurrent requests served by a single request: " + ", ".join(
+                f"{name} {stats['shared']} of {stats['shared'] + stats['executed']}" for name, stats in flight_stats.items()
+            ))
     
     st.markdown("---")
 
@@ -695,19 +1053,82 @@ def display_ai_configuration(global_settings):
     original_profile_eval = st.session_state.original_settings.get("profile_evaluation_enabled", True)
     original_evaluation = st.session_state.original_settings.get("evaluation_enabled", True)
     original_max_attempts = st.session_state.original_settings.get("evaluation_max_attempts", 5)
+    original_candidates = st.session_state.original_settings.get("speculative_candidates", DEFAULT_SPECULATIVE_CANDIDATES)
+    original_rounds = st.session_state.original_settings.get("speculative_rounds", 0)
+    original_self_assessment = st.session_state.original_settings.get("self_assessment_enabled", DEFAULT_SELF_ASSESSMENT_ENABLED)
+    original_calibration_rate = st.session_state.original_settings.get("self_assessment_calibration_rate", DEFAULT_CALIBRATION_RATE)
+    original_prefilter = st.session_state.original_settings.get("prefilter_enabled", DEFAULT_PREFILTER_ENABLED)
+    original_prefilter_similarity = st.session_state.original_settings.get("prefilter_min_similarity", DEFAULT_PREFILTER_MIN_SIMILARITY)
+    original_learned_mode = st.session_state.original_settings.get("learned_evaluator_mode", DEFAULT_LEARNED_EVALUATOR_MODE)
+    original_learned_probability = st.session_state.original_settings.get("learned_min_probability", DEFAULT_LEARNED_MIN_PROBABILITY)
+    original_adaptive = st.session_state.original_settings.get("adaptive_attempts_enabled", DEFAULT_ADAPTIVE_ATTEMPTS_ENABLED)
+    original_adaptive_probability = st.session_state.original_settings.get("adaptive_min_improvement_probability", DEFAULT_MIN_IMPROVEMENT_PROBABILITY)
+    original_adaptive_observations = st.session_state.original_settings.get("adaptive_min_observations", DEFAULT_MIN_OBSERVATIONS)
+    original_routing = st.session_state.original_settings.get("model_routing_enabled", DEFAULT_MODEL_ROUTING_ENABLED)
+    original_routing_tiers = st.session_state.original_settings.get("model_routing_tiers", DEFAULT_TASK_TIERS)
+    original_escalate_after = st.session_state.original_settings.get("model_routing_escalate_after", DEFAULT_ESCALATE_AFTER)
+    original_rate_limits = st.session_state.original_settings.get("llm_rate_limits", DEFAULT_RATE_LIMITS)
     original_competency = st.session_state.original_settings.get("competency_questions_enabled", True)
+    original_concurrency = st.session_state.original_settings.get("generation_max_concurrency", DEFAULT_MAX_CONCURRENCY)
+    original_timeout = st.session_state.original_settings.get("generation_timeout_seconds", DEFAULT_TIMEOUT_SECONDS)
+    original_chunk_size = st.session_state.original_settings.get("multi_statement_chunk_size", DEFAULT_MULTI_STATEMENT_CHUNK_SIZE)
+    original_progressive = st.session_state.original_settings.get("progressive_generation_enabled", DEFAULT_PROGRESSIVE_GENERATION)
+    original_page_size = st.session_state.original_settings.get("quiz_page_size", DEFAULT_QUIZ_PAGE_SIZE)
+    original_prefetch_window = st.session_state.original_settings.get("quiz_prefetch_window", DEFAULT_PREFETCH_WINDOW)
     
     # Current settings
     current_profile_eval = global_settings.get("profile_evaluation_enabled", True)
     current_evaluation = global_settings.get("evaluation_enabled", True)
     current_max_attempts = global_settings.get("evaluation_max_attempts", 5)
+    current_candidates = global_settings.get("speculative_candidates", DEFAULT_SPECULATIVE_CANDIDATES)
+    current_rounds = global_settings.get("speculative_rounds", 0)
+    current_self_assessment = global_settings.get("self_assessment_enabled", DEFAULT_SELF_ASSESSMENT_ENABLED)
+    current_calibration_rate = global_settings.get("self_assessment_calibration_rate", DEFAULT_CALIBRATION_RATE)
+    current_prefilter = global_settings.get("prefilter_enabled", DEFAULT_PREFILTER_ENABLED)
+    current_prefilter_similarity = global_settings.get("prefilter_min_similarity", DEFAULT_PREFILTER_MIN_SIMILARITY)
+    current_learned_mode = global_settings.get("learned_evaluator_mode", DEFAULT_LEARNED_EVALUATOR_MODE)
+    current_learned_probability = global_settings.get("learned_min_probability", DEFAULT_LEARNED_MIN_PROBABILITY)
+    current_adaptive = global_settings.get("adaptive_attempts_enabled", DEFAULT_ADAPTIVE_ATTEMPTS_ENABLED)
+    current_adaptive_probability = global_settings.get("adaptive_min_improvement_probability", DEFAULT_MIN_IMPROVEMENT_PROBABILITY)
+    current_adaptive_observations = global_settings.get("adaptive_min_observations", DEFAULT_MIN_OBSERVATIONS)
+    current_routing = global_settings.get("model_routing_enabled", DEFAULT_MODEL_ROUTING_ENABLED)
+    current_routing_tiers = global_settings.get("model_routing_tiers", DEFAULT_TASK_TIERS)
+    current_escalate_after = global_settings.get("model_routing_escalate_after", DEFAULT_ESCALATE_AFTER)
+    current_rate_limits = global_settings.get("llm_rate_limits", DEFAULT_RATE_LIMITS)
     current_competency = global_settings.get("competency_questions_enabled", True)
+    current_concurrency = global_settings.get("generation_max_concurrency", DEFAULT_MAX_CONCURRENCY)
+    current_timeout = global_settings.get("generation_timeout_seconds", DEFAULT_TIMEOUT_SECONDS)
+    current_chunk_size = global_settings.get("multi_statement_chunk_size", DEFAULT_MULTI_STATEMENT_CHUNK_SIZE)
+    current_progressive = global_settings.get("progressive_generation_enabled", DEFAULT_PROGRESSIVE_GENERATION)
+    current_page_size = global_settings.get("quiz_page_size", DEFAULT_QUIZ_PAGE_SIZE)
+    current_prefetch_window = global_settings.get("quiz_prefetch_window", DEFAULT_PREFETCH_WINDOW)
     
     ai_changed = (
         original_profile_eval != current_profile_eval or
         original_evaluation != current_evaluation or
         original_max_attempts != current_max_attempts or
-        original_competency != current_competency
+        original_candidates != current_candidates or
+        original_rounds != current_rounds or
+        original_self_assessment != current_self_assessment or
+        original_calibration_rate != current_calibration_rate or
+        original_prefilter != current_prefilter or
+        original_prefilter_similarity != current_prefilter_similarity or
+        original_learned_mode != current_learned_mode or
+        original_learned_probability != current_learned_probability or
+        original_adaptive != current_adaptive or
+        original_adaptive_probability != current_adaptive_probability or
+        original_adaptive_observations != current_adaptive_observations or
+        original_routing != current_routing or
+        original_routing_tiers != current_routing_tiers or
+        original_escalate_after != current_escalate_after or
+        original_rate_limits != current_rate_limits or
+        original_competency != current_competency or
+        original_concurrency != current_concurrency or
+        original_timeout != current_timeout or
+        original_chunk_size != current_chunk_size or
+        original_progressive != current_progressive or
+        original_page_size != current_page_size or
+        original_prefetch_window != current_prefetch_window
     )
     
     if ai_changed:
@@ -721,7 +1142,32 @@ def display_ai_configuration(global_settings):
                 st.session_state.original_settings["profile_evaluation_enabled"] = global_settings.get("profile_evaluation_enabled", True)
                 st.session_state.original_settings["evaluation_enabled"] = global_settings.get("evaluation_enabled", True)
                 st.session_state.original_settings["evaluation_max_attempts"] = global_settings.get("evaluation_max_attempts", 5)
+                st.session_state.original_settings["speculative_candidates"] = global_settings.get("speculative_candidates", DEFAULT_SPECULATIVE_CANDIDATES)
+                st.session_state.original_settings["speculative_rounds"] = global_settings.get("speculative_rounds", 0)
+                st.session_state.original_settings["self_assessment_enabled"] = global_settings.get("self_assessment_enabled", DEFAULT_SELF_ASSESSMENT_ENABLED)
+                st.session_state.original_settings["self_assessment_calibration_rate"] = global_settings.get("self_assessment_calibration_rate", DEFAULT_CALIBRATION_RATE)
+                st.session_state.original_settings["prefilter_enabled"] = global_settings.get("prefilter_enabled", DEFAULT_PREFILTER_ENABLED)
+                st.session_state.original_settings["prefilter_min_similarity"] = global_settings.get("prefilter_min_similarity", DEFAULT_PREFILTER_MIN_SIMILARITY)
+                st.session_state.original_settings["learned_evaluator_mode"] = global_settings.get("learned_evaluator_mode", DEFAULT_LEARNED_EVALUATOR_MODE)
+                st.session_state.original_settings["learned_min_probability"] = global_settings.get("learned_min_probability", DEFAULT_LEARNED_MIN_PROBABILITY)
+                st.session_state.original_settings["adaptive_attempts_enabled"] = global_settings.get("adaptive_attempts_enabled", DEFAULT_ADAPTIVE_ATTEMPTS_ENABLED)
+                st.session_state.original_settings["adaptive_min_improvement_probability"] = global_settings.get("adaptive_min_improvement_probability", DEFAULT_MIN_IMPROVEMENT_PROBABILITY)
+                st.session_state.original_settings["adaptive_min_observations"] = global_settings.get("adaptive_min_observations", DEFAULT_MIN_OBSERVATIONS)
+                st.session_state.original_settings["model_routing_enabled"] = global_settings.get("model_routing_enabled", DEFAULT_MODEL_ROUTING_ENABLED)
+                st.session_state.original_settings["model_routing_tiers"] = dict(global_settings.get("model_routing_tiers", DEFAULT_TASK_TIERS))
+                st.session_state.original_settings["model_routing_escalate_after"] = global_settings.get("model_routing_escalate_after", DEFAULT_ESCALATE_AFTER)
+                st.session_state.original_settings["llm_rate_limits"] = {
+                    model: dict(limits) for model, limits in global_settings.get("llm_rate_limits", DEFAULT_RATE_LIMITS).items()
+                }
                 st.session_state.original_settings["competency_questions_enabled"] = global_settings.get("competency_questions_enabled", True)
+                st.session_state.original_settings["generation_max_concurrency"] = global_settings.get("generation_max_concurrency", DEFAULT_MAX_CONCURRENCY)
+                st.session_state.original_settings["generation_timeout_seconds"] = global_settings.get("generation_timeout_seconds", DEFAULT_TIMEOUT_SECONDS)
+                st.session_state.original_settings["multi_statement_chunk_size"] = global_settings.get("multi_statement_chunk_size", DEFAULT_MULTI_STATEMENT_CHUNK_SIZE)
+                st.session_state.original_settings["progressive_generation_enabled"] = global_settings.get("progressive_generation_enabled", DEFAULT_PROGRESSIVE_GENERATION)
+                st.session_state.original_settings["quiz_page_size"] = global_settings.get("quiz_page_size", DEFAULT_QUIZ_PAGE_SIZE)
+                st.session_state.original_settings["quiz_prefetch_window"] = global_settings.get("quiz_prefetch_window", DEFAULT_PREFETCH_WINDOW)
+                # Apply the routing policy and rate limits now rather than after their refresh interval
+                get_routing_policy(refresh=True)
                 st.success("AI settings saved successfully!")
                 st.rerun()
             else:
@@ -736,8 +1182,8 @@ def display_system_configuration(global_settings):
     st.markdown("#### Prompt Template Selection")
     st.markdown("Select the prompt template used for statement enrichment.")
     
-    # Get all prompts
-    all_prompts = get_all_prompts()
+    # Get prompt names only; content is loaded for the selected prompt below
+    all_prompts = get_prompt_summaries()
     
     if not all_prompts:
         all_prompts = []
@@ -775,7 +1221,7 @@ def display_system_configuration(global_settings):
     selected_prompt_content = ""
     for p in all_prompts:
         if p["id"] == selected_prompt_id:
-            selected_prompt_content = p["content"]
+            selected_prompt_content = p["content"] if "content" in p else (get_prompt_content(selected_prompt_id) or "")
             break
     
     st.text_area(
@@ -786,9 +1232,40 @@ def display_system_configuration(global_settings):
         help="Preview of the selected prompt template"
     )
     
+    # Static prefix sent as the system message; providers cache repeated prefixes
+    static_prefix, _ = split_prompt_template(selected_prompt_content)
+    if not static_prefix:
+        st.warning("This template starts with a variable, so no part of it can be served from the provider's prompt cache. "
+                   "Put static instructions and examples before the first {placeholder}.")
+    
+    token_usage = get_token_usage_stats(selected_prompt_content)
+    usage_cols = st.columns(4)
+    with usage_cols[0]:
+        st.metric("Static Prefix", f"{len(static_prefix)} chars")
+    with usage_cols[1]:
+        st.metric("Requests (this process)", token_usage["requests"])
+    with usage_cols[2]:
+        st.metric("Input Tokens", token_usage["input_tokens"])
+    with usage_cols[3]:
+        st.metric("Prompt Cache Hit Rate", f"{token_usage['cache_hit_rate']:.0%}",
+                  help="Share of input tokens served from the provider's prompt cache.")
+    
     # Update settings
     global_settings["selected_prompt_id"] = selected_prompt_id
     
+    st.markdown("---")
+    
+    # Enrichment cache
+    display_enrichment_cache_configuration(global_settings, selected_prompt_content)
+    
+    # Evaluation cache
+    display_evaluation_cache_status()
+    
+    st.markdown("---")
+    
+    # Precomputed personas
+    display_persona_configuration(global_settings)
+    
     # Save button for system configuration
     st.markdown("---")
     
@@ -796,7 +1273,11 @@ def display_system_configuration(global_settings):
     original_prompt_id = st.session_state.original_settings.get("selected_prompt_id", 0)
     current_prompt_id = global_settings.get("selected_prompt_id", 0)
     
-    system_changed = original_prompt_id != current_prompt_id
+    system_changed = (
+        original_prompt_id != current_prompt_id or
+        get_cache_settings(st.session_state.original_settings) != get_cache_settings(global_settings) or
+        get_persona_settings(st.session_state.original_settings) != get_persona_settings(global_settings)
+    )
     
     if system_changed:
         st.warning("⚠️ You have unsaved changes in system configuration.")
@@ -807,11 +1288,171 @@ def display_system_configuration(global_settings):
             if save_global_settings("user_settings", global_settings):
                 # Update original settings for this section
                 st.session_state.original_settings["selected_prompt_id"] = global_settings.get("selected_prompt_id", 0)
+                for key in CACHE_SETTING_KEYS + PERSONA_SETTING_KEYS:
+                    st.session_state.original_settings[key] = global_settings.get(key)
                 st.success("System settings saved successfully!")
                 st.rerun()
             else:
                 st.error("Failed to save system settings. Please try again.")
 
+def display_enrichment_cache_configuration(global_settings, selected_prompt_content):
+    """Display enrichment cache settings, statistics and invalidation controls"""
+    st.markdown("#### Enrichment Cache")
+    st.markdown("Identical enrichment requests (prompt, profile context, statement, length, model and evaluation settings) are served from the cache.")
+    
+    cache_settings = get_cache_settings(global_settings)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        global_settings["enrichment_cache_enabled"] = st.toggle(
+            "Enable Enrichment Cache",
+            value=cache_settings["enabled"]
+        )
+        global_settings["enrichment_cache_variants"] = st.number_input(
+            "Variants per Request",
+            min_value=1,
+            max_value=10,
+            value=cache_settings["variants"],
+            help="Number of different enrichments collected for the same request before serving them at random from the cache."
+        )
+    with col2:
+        global_settings["enrichment_cache_ttl_days"] = st.number_input(
+            "Entry Lifetime (days, 0 = never expire)",
+            min_value=0,
+            max_value=365,
+            value=cache_settings["ttl_days"]
+        )
+        global_settings["enrichment_cache_max_entries"] = st.number_input(
+            "Maximum Entries",
+            min_value=100,
+            max_value=1000000,
+            step=1000,
+            value=cache_settings["max_entries"],
+            help="Least recently used entries are evicted above this size."
+        )
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        global_settings["semantic_cache_enabled"] = st.toggle(
+            "Reuse Enrichments for Similar Profiles",
+            value=cache_settings["semantic_enabled"],
+            help="On an exact cache miss, serve the enrichment generated for the most similar cached profile context."
+        )
+    with col2:
+        global_settings["semantic_cache_threshold"] = st.slider(
+            "Profile Similarity Threshold",
+            min_value=0.80,
+            max_value=1.0,
+            value=max(0.80, cache_settings["semantic_threshold"]),
+            step=0.01,
+            help="Minimum cosine similarity between the profile context embeddings.",
+            disabled=not global_settings["semantic_cache_enabled"]
+        )
+    
+    stats = get_cache_stats()
+    metric_cols = st.columns(4)
+    with metric_cols[0]:
+        st.metric("Cached Entries", stats.get("entries", 0))
+    with metric_cols[1]:
+        st.metric("Total Hits", stats.get("total_hits", 0))
+    with metric_cols[2]:
+        st.metric("Hit Rate (this process)", f"{stats['hit_rate']:.0%}")
+    with metric_cols[3]:
+        st.metric("Lookups (this process)", stats["hits"] + stats["misses"])
+    
+    if cache_settings["semantic_enabled"] or stats["semantic_hits"] + stats["semantic_misses"]:
+        metric_cols = st.columns(4)
+        with metric_cols[0]:
+            st.metric("Cached Profiles", stats.get("contexts", 0))
+        with metric_cols[1]:
+            st.metric("Similar-Profile Hits (this process)", stats["semantic_hits"])
+        with metric_cols[2]:
+            st.metric("Similar-Profile Hit Rate", f"{stats['semantic_hit_rate']:.0%}",
+                      help="Share of exact cache misses served from a similar profile.")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("Invalidate Selected Prompt", key="invalidate_prompt_cache", use_container_width=True):
+            st.success(f"Removed {invalidate_prompt(selected_prompt_content)} cached entries.")
+    with col2:
+        framework_id = global_settings.get("selected_framework_id")
+        if st.button("Invalidate Selected Framework", key="invalidate_framework_cache", use_container_width=True,
+                     disabled=not framework_id):
+            st.success(f"Removed {invalidate_framework(framework_id)} cached entries.")
+    with col3:
+        if st.button("Clear Cache", key="clear_enrichment_cache", use_container_width=True):
+            st.success(f"Removed {clear_cache()} cached entries.")
+
+def display_evaluation_cache_status():
+    """Display the evaluation cache counters"""
+    st.markdown("#### Evaluation Cache")
+    st.markdown(f"Evaluations of identical statement pairs are reused as long as the evaluation rubric is unchanged "
+                f"(current rubric version: {RUBRIC_VERSION}).")
+    
+    summary = get_evaluation_cache_summary()
+    stats = get_evaluation_stats()
+    metric_cols = st.columns(4)
+    with metric_cols[0]:
+        st.metric("Cached Evaluations", summary["entries"])
+    with metric_cols[1]:
+        st.metric("Total Hits", summary["hits"])
+    with metric_cols[2]:
+        st.metric("Hit Rate (this process)", f"{stats['hit_rate']:.0%}")
+    with metric_cols[3]:
+        st.metric("Malformed Answers (this process)", stats["parse_retries"] + stats["parse_failures"],
+                  help=f"{stats['parse_failures']} of them were still invalid after a retry.")
+    
+    if st.button("Delete Evaluations of Older Rubrics", key="delete_outdated_evaluations"):
+        st.success(f"Removed {delete_outdated_evaluations(RUBRIC_VERSION)} cached evaluations.")
+
+def display_persona_configuration(global_settings):
+    """Display persona serving settings and the active personas"""
+    st.markdown("#### Persona Pre-Enrichment")
+    st.markdown("Profiles are clustered into personas offline (`python src/manage.py build-personas`) and every statement "
+                "is pre-enriched per persona. Users whose profile is close to a persona start the quiz without waiting for generation.")
+    
+    persona_settings = get_persona_settings(global_settings)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        global_settings["persona_serving_enabled"] = st.toggle(
+            "Serve Persona Enrichments",
+            value=persona_settings["enabled"]
+        )
+        global_settings["persona_refinement_enabled"] = st.toggle(
+            "Personalize in Background",
+            value=persona_settings["refinement_enabled"],
+            help="Generate personalized enrichments after the quiz starts and store them in the enrichment cache for the next quiz.",
+            disabled=not global_settings["persona_serving_enabled"]
+        )
+    with col2:
+        global_settings["persona_min_similarity"] = st.slider(
+            "Minimum Profile Similarity",
+            min_value=0.50,
+            max_value=1.0,
+            value=min(1.0, max(0.50, persona_settings["min_similarity"])),
+            step=0.01,
+            help="Profiles less similar than this to every persona are generated individually.",
+            disabled=not global_settings["persona_serving_enabled"]
+        )
+    
+    personas = get_persona_summaries()
+    if personas:
+        st.dataframe(pd.DataFrame([{
+            "Persona": persona["label"],
+            "Proficiency": persona["proficiency"],
+            "Profiles": persona["profile_count"],
+            "Enrichments": persona["enrichment_count"],
+            "Built": persona["created_at"]
+        } for persona in personas]), hide_index=True, use_container_width=True)
+        
+        if st.button("Delete Personas", key="delete_personas"):
+            delete_personas()
+            st.success("Personas deleted.")
+            st.rerun()
+    else:
+        st.info("No personas have been built yet.")
+
 def display_settings_overview(global_settings):
     """Display detailed settings overview"""
     st.subheader("Settings Overview")
@@ -1,11 +1,24 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
 import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from functools import lru_cache
+from functools import lru_cache, partial
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Awaitable, Callable, List, Tuple, TypeVar
 
+import openai
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
+from services.telemetry_service import get_telemetry_callback
+from services.single_flight_service import SingleFlight, make_flight_key
+
 # Load environment variables
 load_dotenv()
 
@@ -18,6 +31,52 @@ DEFAULT_CHAT_MODEL = "gpt-4o"
 DEFAULT_CHAT_TEMPERATURE = 0.7
 DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
 
+# Model tiers from cheapest to strongest; a routed task starts at its tier and escalates upwards
+MODEL_TIERS = OrderedDict([
+    ("small", "gpt-4o-mini"),
+    ("large", DEFAULT_CHAT_MODEL)
+])
+ROUTED_TASKS = ("enrich", "evaluate", "chat", "profile_eval")
+
+# Defaults for the model_routing_* global settings; without routing every task uses DEFAULT_CHAT_MODEL
+DEFAULT_MODEL_ROUTING_ENABLED = False
+DEFAULT_TASK_TIERS = {"enrich": "small", "evaluate": "small", "chat": "small", "profile_eval": "small"}
+DEFAULT_ESCALATE_AFTER = 1  # Failed or low-scoring enrichment attempts per tier before moving up
+
+# Routing policy and rate limits are read from the settings at most this often
+ROUTING_SETTINGS_TTL_SECONDS = 30.0
+# Latencies kept per task and tier for the percentiles
+ROUTING_LATENCY_SAMPLES = 500
+
+# Scheduler priority classes, most urgent first; calls outside an llm_priority block are interactive
+PRIORITY_CLASSES = ("interactive", "background", "admin")
+DEFAULT_LLM_PRIORITY = "interactive"
+
+# Per-model requests and tokens per minute (llm_rate_limits setting); models without one aren't paced
+DEFAULT_RATE_LIMITS: Dict[str, Dict[str, int]] = {}
+
+# Reserved for the answer when the model has no max_tokens; corrected by the actual usage afterwards
+DEFAULT_OUTPUT_TOKEN_ESTIMATE = 400
+SCHEDULER_MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+# Queue waits kept per priority class for the percentiles
+SCHEDULER_WAIT_SAMPLES = 1000
+
+# APITimeoutError is an APIConnectionError but isn't retried: the request already took the
+# whole timeout, and retrying would hold its place several timeouts long
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+T = TypeVar("T")
+
+_llm_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=DEFAULT_LLM_PRIORITY)
+
+_ai_settings: Dict[str, Any] = {"settings": None, "loaded_at": 0.0}
+_settings_lock = threading.Lock()
+_routing_policy: Dict[str, Any] = {"policy": None, "settings": None}
+_routing_stats: Dict[tuple, Dict[str, Any]] = {}
+_routing_lock = threading.Lock()
+
 @lru_cache(maxsize=10)
 def get_openai_api_key() -> str:
     """Get OpenAI API key from environment variables with caching"""
@@ -48,13 +107,32 @@ def get_chat_model(
         "model": model_name,
         "temperature": temperature,
         "api_key": get_openai_api_key(),
+        # Token usage and latency of every call go to the llm_calls table
+        "callbacks": [get_telemetry_callback()],
+        # Retries go through the shared scheduler instead of each client's own backoff
+        "max_retries": 0,
         **kwargs
     }
     
     if max_tokens is not None:
         model_params["max_tokens"] = max_tokens
         
-    return ChatOpenAI(**model_params)
+    return ScheduledChatOpenAI(**model_params)
+
+# Concurrent embeddings of the same text (e.g. a cohort of identical profiles) share one request
+_embedding_flight = SingleFlight("embedding")
+
+class CoalescingOpenAIEmbeddings(OpenAIEmbeddings):
+    """OpenAIEmbeddings whose concurrent embed_query calls for the same text share one request"""
+
+    def _flight_key(self, text: str) -> str:
+        return make_flight_key(self.model, self.dimensions, text)
+
+    def embed_query(self, text: str) -> List[float]:
+        return _embedding_flight.do(self._flight_key(text), partial(super().embed_query, text))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await _embedding_flight.ado(self._flight_key(text), partial(super().aembed_query, text))
 
 @lru_cache(maxsize=5)
 def get_embedding_model(
@@ -70,7 +148,7 @@ def get_embedding_model(
         **kwargs
     }
     
-    return OpenAIEmbeddings(**model_params) 
+    return CoalescingOpenAIEmbeddings(**model_params) 
 
 def get_llm_model(model_name: str = DEFAULT_CHAT_MODEL, temperature: float = DEFAULT_CHAT_TEMPERATURE, **kwargs) -> ChatOpenAI:
     """Get a configured ChatOpenAI model instance with caching for efficiency"""
@@ -80,8 +158,518 @@ def get_llm_model(model_name: str = DEFAULT_CHAT_MODEL, temperature: float = DEF
         "model": model_name,
         "temperature": temperature,
         "api_key": get_openai_api_key(),
+        # Token usage and latency of every call go to the llm_calls table
+        "callbacks": [get_telemetry_callback()],
+        # Retries go through the shared scheduler instead of each client's own backoff
+        "max_retries": 0,
         **kwargs
     }
     
-    return ChatOpenAI(**model_params)
-    
\ No newline at end of file
+    return ScheduledChatOpenAI(**model_params)
+
+def get_ai_settings(refresh: bool = False) -> Dict[str, Any]:
+    """Returns the global settings, re-read at most every ROUTING_SETTINGS_TTL_SECONDS"""
+    with _settings_lock:
+        settings = _ai_settings["settings"]
+        if settings is not None and not refresh and time.monotonic() - _ai_settings["loaded_at"] < ROUTING_SETTINGS_TTL_SECONDS:
+            return settings
+
+    from services.db.crud._settings import get_global_settings
+
+    settings = get_global_settings("user_settings") or {}
+    with _settings_lock:
+        _ai_settings["settings"] = settings
+        _ai_settings["loaded_at"] = time.monotonic()
+    return settings
+
+def get_routing_policy(refresh: bool = False) -> Dict[str, Any]:
+    """
+    Returns the model routing policy from the global settings
+
+    Returns:
+        Dictionary with enabled, tiers (task -> tier) and escalate_after
+    """
+    global_settings = get_ai_settings(refresh)
+    with _routing_lock:
+        if _routing_policy["settings"] is global_settings:
+            return _routing_policy["policy"]
+
+    tiers = {**DEFAULT_TASK_TIERS, **(global_settings.get("model_routing_tiers") or {})}
+    policy = {
+        "enabled": bool(global_settings.get("model_routing_enabled", DEFAULT_MODEL_ROUTING_ENABLED)),
+        "tiers": {task: tier if tier in MODEL_TIERS else "large" for task, tier in tiers.items()},
+        "escalate_after": max(1, int(global_settings.get("model_routing_escalate_after", DEFAULT_ESCALATE_AFTER)))
+    }
+    with _routing_lock:
+        _routing_policy["policy"] = policy
+        _routing_policy["settings"] = global_settings
+    return policy
+
+def get_task_tier(task: str, escalation: int = 0) -> Optional[str]:
+    """Returns the tier of a task after the given number of escalations, or None without routing"""
+    policy = get_routing_policy()
+    if not policy["enabled"]:
+        return None
+    tiers = list(MODEL_TIERS)
+    start = tiers.index(policy["tiers"].get(task, "large"))
+    return tiers[min(start + escalation, len(tiers) - 1)]
+
+def get_task_model(task: str, escalation: int = 0) -> str:
+    """
+    Returns the model for a task (see ROUTED_TASKS)
+
+    Args:
+        task: Task name
+        escalation: How many tiers above the task's tier to go (capped at the strongest)
+    """
+    tier = get_task_tier(task, escalation)
+    return MODEL_TIERS[tier] if tier else DEFAULT_CHAT_MODEL
+
+def can_escalate(task: str, escalation: int) -> bool:
+    """Returns whether the task can still move to a stronger tier"""
+    tier = get_task_tier(task, escalation)
+    return tier is not None and tier != list(MODEL_TIERS)[-1]
+
+def get_model_tier(model_name: str) -> str:
+    """Returns the tier of a model, or the model name for models outside the tiers"""
+    return next((tier for tier, name in MODEL_TIERS.items() if name == model_name), model_name)
+
+def record_tier_outcome(
+    task: str,
+    model_name: str,
+    latency: float,
+    success: bool,
+    quality: Optional[float] = None,
+    escalated: bool = False
+) -> None:
+    """
+    Records one routed call for get_routing_stats
+
+    Args:
+        task: Task name
+        model_name: Model that served the call
+        latency: Seconds the call took
+        success: Whether the result was good enough (no error, valid output, or passing scores)
+        quality: Task-specific quality of the result, e.g. the enrichment's score_sum
+        escalated: Whether the task moved to a stronger tier afterwards
+    """
+    with _routing_lock:
+        stats = _routing_stats.setdefault((task, get_model_tier(model_name)), {
+            "model_name": model_name, "calls": 0, "failures": 0, "escalations": 0,
+            "quality_sum": 0.0, "quality_count": 0, "latencies": deque(maxlen=ROUTING_LATENCY_SAMPLES)
+        })
+        stats["calls"] += 1
+        stats["failures"] += int(not success)
+        stats["escalations"] += int(escalated)
+        stats["latencies"].append(latency)
+        if quality is not None:
+            stats["quality_sum"] += quality
+            stats["quality_count"] += 1
+
+def get_routing_stats() -> List[Dict[str, Any]]:
+    """
+    Returns per task and tier: calls, failures, escalations, p50/p95 latency (ms) and mean quality
+    """
+    with _routing_lock:
+        snapshot = [(key, dict(stats, latencies=sorted(stats["latencies"]))) for key, stats in _routing_stats.items()]
+
+    def percentile(values, p):
+        return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] * 1000 if values else None
+
+    return [{
+        "task": task,
+        "tier": tier,
+        "model_name": stats["model_name"],
+        "calls": stats["calls"],
+        "failures": stats["failures"],
+        "escalations": stats["escalations"],
+        "p50_ms": percentile(stats["latencies"], 50),
+        "p95_ms": percentile(stats["latencies"], 95),
+        "mean_quality": stats["quality_sum"] / stats["quality_count"] if stats["quality_count"] else None
+    } for (task, tier), stats in sorted(snapshot)]
+
+def call_with_escalation(
+    task: str,
+    call: Callable[[str], T],
+    accept: Optional[Callable[[T], bool]] = None,
+    model_name: Optional[str] = None
+) -> T:
+    """
+    Runs a task on its routed model, moving to a stronger tier on errors or rejected results
+
+    Args:
+        task: Task name (see ROUTED_TASKS)
+        call: Function taking the model name and returning the result
+        accept: Returns whether a result is good enough; None accepts every result
+        model_name: Pins the model (no routing or escalation)
+
+    Returns:
+        The first accepted result, or the strongest tier's result
+
+    Raises:
+        The strongest tier's exception if it fails as well
+    """
+    escalation = 0
+    while True:
+        model = model_name or get_task_model(task, escalation)
+        escalate = model_name is None and can_escalate(task, escalation)
+        start = time.monotonic()
+        try:
+            result = call(model)
+        except Exception as e:
+            record_tier_outcome(task, model, time.monotonic() - start, False, escalated=escalate)
+            if not escalate:
+                raise
+            logger.warning(f"{task} failed on {model}, escalating: {str(e)}")
+            escalation += 1
+            continue
+
+        accepted = accept is None or accept(result)
+        record_tier_outcome(task, model, time.monotonic() - start, accepted, escalated=escalate and not accepted)
+        if accepted or not escalate:
+            return result
+        logger.info(f"{task} result from {model} not accepted, escalating")
+        escalation += 1
+
+async def acall_with_escalation(
+    task: str,
+    call: Callable[[str], Awaitable[T]],
+    accept: Optional[Callable[[T], bool]] = None,
+    model_name: Optional[str] = None
+) -> T:
+    """Async version of call_with_escalation; call takes the model name and returns an awaitable"""
+    escalation = 0
+    while True:
+        model = model_name or get_task_model(task, escalation)
+        escalate = model_name is None and can_escalate(task, escalation)
+        start = time.monotonic()
+        try:
+            result = await call(model)
+        except Exception as e:
+            record_tier_outcome(task, model, time.monotonic() - start, False, escalated=escalate)
+            if not escalate:
+                raise
+            logger.warning(f"{task} failed on {model}, escalating: {str(e)}")
+            escalation += 1
+            continue
+
+        accepted = accept is None or accept(result)
+        record_tier_outcome(task, model, time.monotonic() - start, accepted, escalated=escalate and not accepted)
+        if accepted or not escalate:
+            return result
+        logger.info(f"{task} result from {model} not accepted, escalating")
+        escalation += 1
+
+@contextmanager
+def llm_priority(priority: str):
+    """
+    Runs the LLM calls inside the block in a scheduler priority class (see PRIORITY_CLASSES)
+
+    Like llm_call_context, threads only inherit the class if they copy the context.
+    """
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown LLM priority '{priority}'")
+    token = _llm_priority.set(priority)
+    try:
+        yield
+    finally:
+        _llm_priority.reset(token)
+
+def get_rate_limits(model_name: str) -> Tuple[Optional[int], Optional[int]]:
+    """Returns the (requests, tokens) per minute configured for a model, None (or 0 in the settings) meaning no limit"""
+    limits = {**DEFAULT_RATE_LIMITS, **(get_ai_settings().get("llm_rate_limits") or {})}.get(model_name) or {}
+    return tuple(int(limits[key]) if limits.get(key) else None for key in ("rpm", "tpm"))
+
+def estimate_request_tokens(messages: List[Any], max_tokens: Optional[int]) -> int:
+    """Rough token count of a request (about 4 characters per token) plus the expected answer"""
+    characters = sum(len(message.content) if isinstance(message.content, str) else len(str(message.content)) for message in messages)
+    return characters // 4 + (max_tokens or DEFAULT_OUTPUT_TOKEN_ESTIMATE)
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Returns the server's Retry-After delay in seconds, if the error carries one"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # Retry-After may also be an HTTP date; fall back to the exponential backoff
+        pass
+    return None
+
+class TokenBucket:
+    """Refills continuously at its per-minute rate; may go into debt when usage exceeds the estimate"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def set_rate(self, per_minute: int) -> None:
+        self.capacity = float(per_minute)
+        self.level = min(self.level, self.capacity)
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount (capped at the capacity) is available"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) * 60 / self.capacity
+
+    def consume(self, amount: float) -> None:
+        self.level -= amount
+
+class LLMScheduler:
+    """
+    Admits chat model requests of the whole process against per-model RPM/TPM buckets
+
+    Only the limits the provider knows are paced; without any, requests go straight
+    through. Waiting requests of a model are admitted in priority order (then first
+    come, first served). A rate limit response pauses the model for every caller until
+    its Retry-After (or backoff) has passed, so sessions don't retry into the limit together.
+    """
+
+    def __init__(self, limits_provider: Callable[[str], Tuple[Optional[int], Optional[int]]] = get_rate_limits):
+        self.limits_provider = limits_provider
+        self._condition = threading.Condition()
+        self._waiting: Dict[str, List[Tuple[int, int]]] = {}
+        self._buckets: Dict[str, List[Optional[TokenBucket]]] = {}
+        self._cooldown_until: Dict[str, float] = {}
+        self._sequence = itertools.count()
+        # Async requests waiting in the queues, woken through their event loop when they move to the front
+        self._async_waiters: Dict[Tuple[int, int], Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+        self._stats = {
+            priority: {"requests": 0, "wait_total": 0.0, "waits": deque(maxlen=SCHEDULER_WAIT_SAMPLES)}
+            for priority in PRIORITY_CLASSES
+        }
+        self._counters = {"rate_limited": 0, "retries": 0}
+
+    def _get_buckets(self, model_name: str, rpm: Optional[int], tpm: Optional[int]) -> List[Optional[TokenBucket]]:
+        """Returns the model's request and token buckets, None for a limit that isn't set"""
+        buckets = self._buckets.setdefault(model_name, [None, None])
+        for index, per_minute in enumerate((rpm, tpm)):
+            if per_minute is None:
+                buckets[index] = None
+            elif buckets[index] is None:
+                buckets[index] = TokenBucket(per_minute)
+            elif buckets[index].capacity != per_minute:
+                buckets[index].set_rate(per_minute)
+        return buckets
+
+    def _enqueue(self, model_name: str, priority: str) -> Tuple[List[Tuple[int, int]], Tuple[int, int]]:
+        ticket = (PRIORITY_CLASSES.index(priority), next(self._sequence))
+        queue = self._waiting.setdefault(model_name, [])
+        heapq.heappush(queue, ticket)
+        return queue, ticket
+
+    def _dequeue(self, queue: List[Tuple[int, int]], ticket: Tuple[int, int]) -> None:
+        queue.remove(ticket)
+        heapq.heapify(queue)
+        self._notify(queue)
+
+    def _notify(self, queue: List[Tuple[int, int]]) -> None:
+        """Wakes the blocking waiters and, if it is async, the request first in line (caller holds the lock)"""
+        self._condition.notify_all()
+        if queue and queue[0] in self._async_waiters:
+            loop, event = self._async_waiters[queue[0]]
+            loop.call_soon_threadsafe(event.set)
+
+    def _try_admit(self, model_name: str, queue, ticket, rpm: Optional[int], tpm: Optional[int], tokens: int) -> Optional[float]:
+        """
+        Admits the ticket if it is first in line and the buckets allow it (caller holds the lock)
+
+        Returns:
+            0 when admitted, the seconds until the buckets allow it, or None if it isn't first in line
+        """
+        if queue[0] != ticket:
+            return None
+        now = time.monotonic()
+        paced = [(bucket, amount) for bucket, amount in zip(self._get_buckets(model_name, rpm, tpm), (1, tokens)) if bucket is not None]
+        delay = max([self._cooldown_until.get(model_name, 0.0) - now] + [bucket.wait_time(amount, now) for bucket, amount in paced])
+        if delay > 0:
+            return delay
+        for bucket, amount in paced:
+            bucket.consume(amount)
+        return 0.0
+
+    def _record_wait(self, priority: str, waited: float) -> None:
+        with self._condition:
+            stats = self._stats[priority]
+            stats["requests"] += 1
+            stats["wait_total"] += waited
+            stats["waits"].append(waited)
+
+    def acquire(self, model_name: str, tokens: int, priority: str = DEFAULT_LLM_PRIORITY) -> float:
+        """
+        Blocks until the request may be sent
+
+        Returns:
+            Seconds spent waiting
+        """
+        start = time.monotonic()
+        # Read outside the lock; the limits may come from the database
+        rpm, tpm = (None if limit is None else max(1, limit) for limit in self.limits_provider(model_name))
+        with self._condition:
+            queue, ticket = self._enqueue(model_name, priority)
+            try:
+                while True:
+                    delay = self._try_admit(model_name, queue, ticket, rpm, tpm, tokens)
+                    if delay == 0:
+                        break
+                    self._condition.wait(timeout=delay)
+            finally:
+                self._dequeue(queue, ticket)
+
+        waited = time.monotonic() - start
+        self._record_wait(priority, waited)
+        return waited
+
+    async def aacquire(self, model_name: str, tokens: int, priority: str = DEFAULT_LLM_PRIORITY) -> float:
+        """
+        Async version of acquire that waits without holding a thread
+
+        Async requests share the queues (and priority order) of the blocking ones.
+
+        Returns:
+            Seconds spent waiting
+        """
+        start = time.monotonic()
+        rpm, tpm = (None if limit is None else max(1, limit) for limit in self.limits_provider(model_name))
+        event = asyncio.Event()
+        with self._condition:
+            queue, ticket = self._enqueue(model_name, priority)
+            self._async_waiters[ticket] = (asyncio.get_running_loop(), event)
+        try:
+            while True:
+                with self._condition:
+                    # Cleared under the lock, so a wakeup for the next state can't be lost
+                    event.clear()
+                    delay = self._try_admit(model_name, queue, ticket, rpm, tpm, tokens)
+                if delay == 0:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                del self._async_waiters[ticket]
+                self._dequeue(queue, ticket)
+
+        waited = time.monotonic() - start
+        self._record_wait(priority, waited)
+        return waited
+
+    def settle(self, model_name: str, estimated: int, actual: Optional[int]) -> None:
+        """Corrects the token bucket once the actual usage of a request is known"""
+        if actual is None:
+            return
+        with self._condition:
+            token_bucket = self._buckets.get(model_name, [None, None])[1]
+            if token_bucket is not None:
+                token_bucket.consume(actual - estimated)
+            self._notify(self._waiting.get(model_name, []))
+
+    def backoff(self, model_name: str, retry: int, error: Exception) -> float:
+        """
+        Returns the delay before retrying a failed request
+
+        Uses the Retry-After header when present, else exponential backoff with jitter.
+        Rate limit errors also pause the model for all callers for that long, in which
+        case the returned delay is 0 (acquire does the waiting).
+        """
+        retry_after = get_retry_after(error)
+        if retry_after is None:
+            cap = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** retry)
+            retry_after = cap / 2 + random.uniform(0, cap / 2)
+        with self._condition:
+            self._counters["retries"] += 1
+            if isinstance(error, openai.RateLimitError):
+                self._counters["rate_limited"] += 1
+                self._cooldown_until[model_name] = max(self._cooldown_until.get(model_name, 0.0), time.monotonic() + retry_after)
+                return 0.0
+        return retry_after
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Returns queue waits per priority class (requests, mean/p50/p95/max in ms), the
+        number of waiting requests, rate limit responses and retries
+        """
+        with self._condition:
+            waits = {priority: (stats["requests"], stats["wait_total"], sorted(stats["waits"])) for priority, stats in self._stats.items()}
+            queued = sum(len(queue) for queue in self._waiting.values())
+            counters = dict(self._counters)
+
+        def percentile(values, p):
+            return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] * 1000 if values else None
+
+        return {
+            "priorities": {priority: {
+                "requests": requests,
+                "mean_wait_ms": total / requests * 1000 if requests else None,
+                "p50_wait_ms": percentile(samples, 50),
+                "p95_wait_ms": percentile(samples, 95),
+                "max_wait_ms": samples[-1] * 1000 if samples else None
+            } for priority, (requests, total, samples) in waits.items()},
+            "queued": queued,
+            **counters
+        }
+
+_scheduler = LLMScheduler()
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Returns the process-wide scheduler every chat model goes through"""
+    return _scheduler
+
+def _total_tokens(result: Any) -> Optional[int]:
+    token_usage = (getattr(result, "llm_output", None) or {}).get("token_usage") or {}
+    return token_usage.get("total_tokens")
+
+class ScheduledChatOpenAI(ChatOpenAI):
+    """ChatOpenAI whose requests wait for the shared LLMScheduler and retry through it"""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        scheduler = get_llm_scheduler()
+        estimate = estimate_request_tokens(messages, self.max_tokens)
+        for retry in range(SCHEDULER_MAX_RETRIES + 1):
+            waited = scheduler.acquire(self.model_name, estimate, _llm_priority.get())
+            if run_manager is not None:
+                get_telemetry_callback().add_queue_wait(run_manager.run_id, waited, retried=retry > 0)
+            try:
+                result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                # A rejected request used no tokens
+                scheduler.settle(self.model_name, estimate, 0)
+                if retry == SCHEDULER_MAX_RETRIES or isinstance(e, openai.APITimeoutError):
+                    raise
+                delay = scheduler.backoff(self.model_name, retry, e)
+                logger.warning(f"{type(e).__name__} from {self.model_name}, retry {retry + 1}/{SCHEDULER_MAX_RETRIES}")
+                time.sleep(delay)
+                continue
+            scheduler.settle(self.model_name, estimate, _total_tokens(result))
+            return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        scheduler = get_llm_scheduler()
+        estimate = estimate_request_tokens(messages, self.max_tokens)
+        for retry in range(SCHEDULER_MAX_RETRIES + 1):
+            waited = await scheduler.aacquire(self.model_name, estimate, _llm_priority.get())
+            if run_manager is not None:
+                get_telemetry_callback().add_queue_wait(run_manager.run_id, waited, retried=retry > 0)
+            try:
+                result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                scheduler.settle(self.model_name, estimate, 0)
+                if retry == SCHEDULER_MAX_RETRIES or isinstance(e, openai.APITimeoutError):
+                    raise
+                delay = scheduler.backoff(self.model_name, retry, e)
+                logger.warning(f"{type(e).__name__} from {self.model_name}, retry {retry + 1}/{SCHEDULER_MAX_RETRIES}")
+                await asyncio.sleep(delay)
+                continue
+            scheduler.settle(self.model_name, estimate, _total_tokens(result))
+            return result
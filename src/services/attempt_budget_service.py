@@ -0,0 +1,159 @@
+import logging
+import random
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.db.crud._attempt_outcomes import save_attempt_outcomes, get_attempt_statistics
+from services.db.crud._statement_catalog import compute_statement_hash
+from services.enrichment_cache_service import compute_prompt_hash
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Defaults for the adaptive_attempts_* global settings
+DEFAULT_ADAPTIVE_ATTEMPTS_ENABLED = False
+DEFAULT_MIN_IMPROVEMENT_PROBABILITY = 0.1
+DEFAULT_MIN_OBSERVATIONS = 20
+
+# Pseudo-observations a finer level (prompt, then statement) needs before it outweighs the coarser estimate
+PRIOR_WEIGHT = 5.0
+
+# Share of runs that carry on past a stop decision, so attempts the rule stops before still get observed
+DEFAULT_EXPLORATION_RATE = 0.05
+
+def get_adaptive_attempt_settings(global_settings: Optional[Dict[str, Any]]) -> Tuple[bool, float, int]:
+    """
+    Returns the adaptive attempt budget settings
+
+    Returns:
+        Tuple of (enabled, min_improvement_probability, min_observations)
+    """
+    global_settings = global_settings or {}
+    enabled = bool(global_settings.get("adaptive_attempts_enabled", DEFAULT_ADAPTIVE_ATTEMPTS_ENABLED))
+    min_probability = float(global_settings.get("adaptive_min_improvement_probability", DEFAULT_MIN_IMPROVEMENT_PROBABILITY))
+    min_observations = int(global_settings.get("adaptive_min_observations", DEFAULT_MIN_OBSERVATIONS))
+    return enabled, min_probability, min_observations
+
+def estimate_improvement_probability(
+    statistics: Dict[str, Dict[int, Tuple[int, int]]],
+    attempt: int,
+    min_observations: int = DEFAULT_MIN_OBSERVATIONS,
+    prior_weight: float = PRIOR_WEIGHT
+) -> Optional[float]:
+    """
+    Estimates the probability that the given attempt beats the best score_sum so far
+
+    Starts from the rate of all runs at the proficiency level and shrinks the rates of
+    the prompt and then the statement towards it, so a statement with a handful of runs
+    only moves the estimate as far as its evidence allows.
+
+    Args:
+        statistics: Output of get_attempt_statistics
+        attempt: Attempt number (2 or higher)
+
+    Returns:
+        Probability, or None if the proficiency level has fewer than min_observations
+        runs that reached this attempt
+    """
+    improved, total = statistics.get("proficiency", {}).get(attempt, (0, 0))
+    if total < min_observations:
+        return None
+    probability = improved / total
+    for level in ("prompt", "statement"):
+        improved, total = statistics.get(level, {}).get(attempt, (0, 0))
+        probability = (improved + prior_weight * probability) / (total + prior_weight)
+    return probability
+
+class AttemptBudget:
+    """
+    Decides whether another attempt of a regeneration run is worth making, and records
+    the run's attempts for later estimates
+
+    Attempts are recorded whether or not the budget is adaptive, so the statistics
+    build up before early stopping is turned on. A random exploration_rate share of the
+    runs ignores the first stop decision and runs to the maximum. Without them, an
+    attempt number the rule stops before would never be recorded again, and its
+    estimate could not recover. Their attempts are recorded as explored.
+    """
+
+    def __init__(
+        self,
+        prompt_template: str,
+        proficiency: str,
+        original_statement: str,
+        max_attempts: int,
+        adaptive: bool = False,
+        min_probability: float = DEFAULT_MIN_IMPROVEMENT_PROBABILITY,
+        min_observations: int = DEFAULT_MIN_OBSERVATIONS,
+        exploration_rate: float = DEFAULT_EXPLORATION_RATE
+    ):
+        self.prompt_hash = compute_prompt_hash(prompt_template)
+        self.proficiency = proficiency
+        self.statement_hash = compute_statement_hash(original_statement)
+        self.max_attempts = max_attempts
+        self.adaptive = adaptive
+        self.min_probability = min_probability
+        self.min_observations = min_observations
+        self.exploration_rate = exploration_rate
+        self.stopped_early = False
+        self.explored = False
+        self._statistics: Optional[Dict[str, Dict[int, Tuple[int, int]]]] = None
+
+    def should_continue(self, next_attempt: int) -> bool:
+        """Returns False (and marks the run as stopped early) when the next attempt is unlikely to improve"""
+        if not self.adaptive or self.explored or next_attempt < 2:
+            return True
+        if self._statistics is None:
+            self._statistics = get_attempt_statistics(self.prompt_hash, self.proficiency, self.statement_hash)
+        probability = estimate_improvement_probability(self._statistics, next_attempt, self.min_observations)
+        if probability is None or probability >= self.min_probability:
+            return True
+        if random.random() < self.exploration_rate:
+            logger.info(f"Exploring past attempt {next_attempt - 1} despite improvement probability {probability:.2f}")
+            self.explored = True
+            return True
+        logger.info(f"Stopping before attempt {next_attempt}: improvement probability {probability:.2f} "
+                    f"below {self.min_probability:.2f}")
+        self.stopped_early = True
+        return False
+
+    def record(self, history: List[Dict[str, Any]], accepted: Callable[[Dict[str, Any]], bool]) -> None:
+        """
+        Stores the run's attempts by attempt number
+
+        An attempt counts as improved if it beats the best score_sum of the attempts
+        before it, or is the first one to meet the thresholds. Failed attempts have no
+        history entry, so the numbers can have gaps.
+
+        Args:
+            history: History entries of the run
+            accepted: Returns whether an entry met the thresholds
+        """
+        run_id = str(uuid.uuid4())
+        best = None
+        any_accepted = False
+        records = []
+        for entry in sorted(history, key=lambda entry: entry["attempt"]):
+            # Candidates the learned evaluator decided on have no rubric score_sum
+            if "learned_accepted" in entry:
+                continue
+            passed = accepted(entry)
+            improved = best is None or entry["score_sum"] > best or (passed and not any_accepted)
+            best = entry["score_sum"] if best is None else max(best, entry["score_sum"])
+            any_accepted = any_accepted or passed
+            records.append({
+                "run_id": run_id,
+                "prompt_hash": self.prompt_hash,
+                "proficiency": self.proficiency,
+                "statement_hash": self.statement_hash,
+                "attempt": entry["attempt"],
+                "score_sum": entry["score_sum"],
+                "improved": improved,
+                "passed": passed,
+                "max_attempts": self.max_attempts,
+                "adaptive": self.adaptive,
+                "stopped_early": self.stopped_early,
+                "explored": self.explored
+            })
+        save_attempt_outcomes(records)
@@ -0,0 +1,195 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.generation_service import PROFICIENCY_LEVELS
+from services.metrics_service import calculate_quality_metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Defaults for the prefilter_enabled / prefilter_min_similarity settings
+DEFAULT_PREFILTER_ENABLED = False
+DEFAULT_PREFILTER_MIN_SIMILARITY = 0.7
+
+# Labels the model puts in front of the statement (e.g. copied from few-shot examples)
+LABEL_PREFIX_PATTERN = re.compile(
+    r"^\s*(?:\*\*)?(?:revised|enriched|personalized|problematic)?\s*(?:enrichment|statement|version)\s*:(?:\*\*)?\s*",
+    re.IGNORECASE
+)
+
+# "As a data analyst, ..." - the prompts ask the model not to open with the job profile
+ROLE_PREFIX_PATTERN = re.compile(r"^\s*as an? [^,]{1,80},\s*", re.IGNORECASE)
+
+# Mentions of a digital proficiency level, e.g. "(intermediate level)" or "as an advanced user"
+PROFICIENCY_PATTERN = re.compile(
+    r"\b(?:" + "|".join(label.lower() for label in PROFICIENCY_LEVELS.values()) +
+    r")[\s-]+(?:level|user|proficiency)\b|\bproficiency level\b",
+    re.IGNORECASE
+)
+
+SENTENCE_END_PATTERN = re.compile(r"[.!?](?=\s|$)")
+
+class CandidateContext:
+    """What the stages know about a candidate: its text, the original and the limits, plus metrics once computed"""
+
+    def __init__(self, original: str, text: str, max_length: int, proficiency: str, min_similarity: float):
+        self.original = original
+        self.text = text
+        self.max_length = max_length
+        self.proficiency = proficiency
+        self.min_similarity = min_similarity
+        self.metrics: Optional[Dict[str, Any]] = None
+        self.repairs: List[str] = []
+
+# A stage may repair candidate.text in place (recording it in candidate.repairs) and
+# returns a rejection reason, or None to pass the candidate on
+CandidateStage = Callable[[CandidateContext], Optional[str]]
+
+def strip_prefixes(candidate: CandidateContext) -> Optional[str]:
+    """Removes labels such as 'Revised Enrichment:' and an opening 'As a <role>,' clause"""
+    text = LABEL_PREFIX_PATTERN.sub("", candidate.text, count=1)
+    text = ROLE_PREFIX_PATTERN.sub("", text, count=1).strip().strip('"').strip()
+    if text != candidate.text:
+        if not text:
+            return "nothing left after removing the prefix"
+        candidate.text = text[0].upper() + text[1:]
+        candidate.repairs.append("prefix")
+    if re.match(r"^\s*as an? ", candidate.text, re.IGNORECASE):
+        return "opens with the job profile"
+    return None
+
+def truncate_to_length(candidate: CandidateContext) -> Optional[str]:
+    """Cuts an overlong candidate after its last complete sentence within the limit"""
+    if len(candidate.text) <= candidate.max_length:
+        return None
+    ends = [match.end() for match in SENTENCE_END_PATTERN.finditer(candidate.text) if match.end() <= candidate.max_length]
+    if not ends:
+        return f"longer than {candidate.max_length} characters without a sentence that fits"
+    candidate.text = candidate.text[:ends[-1]].strip()
+    candidate.repairs.append("truncated")
+    return None
+
+def reject_proficiency_mentions(candidate: CandidateContext) -> Optional[str]:
+    """Rejects candidates that mention a proficiency level the original doesn't"""
+    match = PROFICIENCY_PATTERN.search(candidate.text)
+    if match and not PROFICIENCY_PATTERN.search(candidate.original):
+        return f"mentions the proficiency level ('{match.group(0)}')"
+    return None
+
+def similarity_gate(candidate: CandidateContext) -> Optional[str]:
+    """
+    Rejects candidates whose embedding similarity to the original is too low
+
+    Computes the candidate's quality metrics, which the caller reuses instead of
+    embedding the statements again.
+    """
+    candidate.metrics = calculate_quality_metrics(candidate.original, candidate.text)
+    similarity = candidate.metrics["cosine_embedding"]
+    if similarity < candidate.min_similarity:
+        return f"embedding similarity {similarity:.2f} below {candidate.min_similarity:.2f}"
+    return None
+
+# Stages in the order they run; cheap text checks before the embedding gate
+CANDIDATE_STAGES: "OrderedDict[str, CandidateStage]" = OrderedDict([
+    ("strip_prefixes", strip_prefixes),
+    ("truncate_to_length", truncate_to_length),
+    ("reject_proficiency_mentions", reject_proficiency_mentions),
+    ("similarity_gate", similarity_gate)
+])
+
+_stats = {"checked": 0, "repaired": 0, "rejected": 0, "evaluations_saved": 0}
+_rejections: Dict[str, int] = {}
+_stats_lock = threading.Lock()
+
+def register_candidate_stage(name: str, stage: CandidateStage, before: Optional[str] = "similarity_gate") -> None:
+    """
+    Adds (or replaces) a pre-filter stage
+
+    Args:
+        name: Stage name, reported with its rejections
+        stage: Function taking a CandidateContext and returning a rejection reason or None
+        before: Name of the stage to run it before (None appends it at the end)
+    """
+    CANDIDATE_STAGES.pop(name, None)
+    items = list(CANDIDATE_STAGES.items())
+    position = next((index for index, (key, _) in enumerate(items) if key == before), len(items))
+    items.insert(position, (name, stage))
+    CANDIDATE_STAGES.clear()
+    CANDIDATE_STAGES.update(items)
+
+def get_prefilter_settings(global_settings: Optional[Dict[str, Any]]) -> Tuple[bool, float]:
+    """
+    Returns whether candidates are checked locally before evaluation, and the similarity gate
+
+    Returns:
+        Tuple of (enabled, min_similarity)
+    """
+    global_settings = global_settings or {}
+    enabled = bool(global_settings.get("prefilter_enabled", DEFAULT_PREFILTER_ENABLED))
+    min_similarity = float(global_settings.get("prefilter_min_similarity", DEFAULT_PREFILTER_MIN_SIMILARITY))
+    return enabled, min_similarity
+
+def prefilter_candidate(
+    original: str,
+    enriched: str,
+    max_length: int,
+    proficiency: str = "Intermediate",
+    min_similarity: float = DEFAULT_PREFILTER_MIN_SIMILARITY,
+    saves_evaluation: bool = True
+) -> Dict[str, Any]:
+    """
+    Runs a candidate through CANDIDATE_STAGES until one rejects it
+
+    Args:
+        original: The original statement
+        enriched: The generated candidate
+        max_length: Maximum length in characters (the prompt's {length})
+        proficiency: The user's proficiency label
+        min_similarity: Minimum embedding similarity to the original
+        saves_evaluation: Whether a rejection saves an evaluator call (False when the
+            candidate was already scored, e.g. by self-assessment)
+
+    Returns:
+        Dictionary with text (possibly repaired), rejected (reason or None), stage
+        (the rejecting stage), repairs and metrics (None unless the similarity gate ran)
+    """
+    candidate = CandidateContext(original, enriched.strip(), max_length, proficiency, min_similarity)
+    rejected, rejecting_stage = None, None
+    for name, stage in list(CANDIDATE_STAGES.items()):
+        rejected = stage(candidate)
+        if rejected:
+            rejecting_stage = name
+            break
+
+    with _stats_lock:
+        _stats["checked"] += 1
+        if candidate.repairs:
+            _stats["repaired"] += 1
+        if rejected:
+            _stats["rejected"] += 1
+            _stats["evaluations_saved"] += int(saves_evaluation)
+            _rejections[rejecting_stage] = _rejections.get(rejecting_stage, 0) + 1
+
+    if rejected:
+        logger.info(f"Pre-filter rejected candidate ({rejecting_stage}): {rejected}")
+    return {
+        "text": candidate.text,
+        "rejected": rejected,
+        "stage": rejecting_stage,
+        "repairs": candidate.repairs,
+        "metrics": candidate.metrics
+    }
+
+def get_prefilter_stats() -> Dict[str, Any]:
+    """
+    Returns pre-filter counters since process start
+
+    Returns:
+        Dictionary with checked, repaired, rejected, evaluations_saved and rejections (per stage)
+    """
+    with _stats_lock:
+        return {**_stats, "rejections": dict(_rejections)}
@@ -5,7 +5,8 @@ from typing import Dict, Optional, Any
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
-from services.ai_service import get_chat_model
+from services.ai_service import get_chat_model, get_task_model, call_with_escalation
+from services.telemetry_service import llm_call_context
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -23,7 +24,7 @@ def load_llm(max_tokens: Optional[int] = None):
     """
     logger.info("Loading LLM model")
     try:
-        model = get_chat_model(max_tokens=max_tokens)
+        model = get_chat_model(get_task_model("chat"), max_tokens=max_tokens)
         logger.info("LLM model loaded successfully")
         return model
     except Exception as e:
@@ -49,12 +50,13 @@ def generate_chat_response(query: str, persona_context: Dict[str, Any], max_toke
             HumanMessagePromptTemplate.from_template("{query}")
         ])
 
-        # Get chat model with appropriate settings
-        llm = get_chat_model(max_tokens=max_tokens)
-            
-        # Create and run chain
-        chain = prompt | llm | StrOutputParser()
-        response = chain.invoke({"query": query})
+        # Create and run chain on the routed model, escalating if it fails or answers with nothing
+        def respond(model_name):
+            chain = prompt | get_chat_model(model_name, max_tokens=max_tokens) | StrOutputParser()
+            return chain.invoke({"query": query})
+        
+        with llm_call_context(operation="chat"):
+            response = call_with_escalation("chat", respond, accept=lambda text: bool(text.strip()))
 
         return response.strip()
     except Exception as e:
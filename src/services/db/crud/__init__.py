@@ -8,4 +8,14 @@ from ._analytics import *
 from ._chat import *
 from ._prompts import *
 from ._frameworks import *
-from ._prompt_history import * 
\ No newline at end of file
+from ._prompt_history import *
+from ._statement_catalog import *
+from ._framework_items import *
+from ._framework_versions import *
+from ._enrichment_cache import *
+from ._personas import *
+from ._llm_calls import * 
+from ._evaluation_cache import *
+from ._statement_preferences import *
+from ._learned_evaluators import *
+from ._attempt_outcomes import *
\ No newline at end of file
@@ -0,0 +1,114 @@
+from sqlalchemy import func, case
+from ..models import AttemptOutcome
+from ..connection import get_database_connection
+
+def save_attempt_outcomes(records):
+    """
+    Store the attempts of a regeneration run
+
+    Args:
+        records: List of dictionaries with the AttemptOutcome columns
+
+    Returns:
+        Number of records stored
+    """
+    if not records:
+        return 0
+
+    db = get_database_connection()
+    if not db:
+        return 0
+
+    session = db["Session"]()
+
+    try:
+        session.add_all([AttemptOutcome(**record) for record in records])
+        session.commit()
+        return len(records)
+    except Exception as e:
+        session.rollback()
+        print(f"Error saving attempt outcomes: {e}")
+        return 0
+    finally:
+        session.close()
+
+def get_attempt_statistics(prompt_hash, proficiency, statement_hash):
+    """
+    Count improved attempts per attempt number at three levels of detail
+
+    Returns:
+        Dictionary with "proficiency", "prompt" and "statement" levels, each mapping
+        attempt number -> (improved, total)
+    """
+    levels = {"proficiency": {}, "prompt": {}, "statement": {}}
+    db = get_database_connection()
+    if not db:
+        return levels
+
+    session = db["Session"]()
+
+    try:
+        filters = {
+            "proficiency": [AttemptOutcome.proficiency == proficiency],
+            "prompt": [AttemptOutcome.proficiency == proficiency, AttemptOutcome.prompt_hash == prompt_hash],
+            "statement": [AttemptOutcome.proficiency == proficiency, AttemptOutcome.prompt_hash == prompt_hash,
+                          AttemptOutcome.statement_hash == statement_hash]
+        }
+        for level, conditions in filters.items():
+            rows = session.query(
+                AttemptOutcome.attempt,
+                func.sum(case((AttemptOutcome.improved.is_(True), 1), else_=0)),
+                func.count(AttemptOutcome.id)
+            ).filter(*conditions).group_by(AttemptOutcome.attempt).all()
+            levels[level] = {attempt: (int(improved or 0), total) for attempt, improved, total in rows}
+        return levels
+    except Exception as e:
+        print(f"Error getting attempt statistics: {e}")
+        return levels
+    finally:
+        session.close()
+
+def get_attempt_savings():
+    """
+    Compare runs with and without the adaptive attempt budget
+
+    Returns:
+        Dictionary with "adaptive" and "fixed", each holding runs, mean_attempts,
+        pass_rate, stopped_early and attempts_saved (unused attempts of early-stopped runs)
+    """
+    empty = {"runs": 0, "mean_attempts": None, "pass_rate": None, "stopped_early": 0, "attempts_saved": 0}
+    db = get_database_connection()
+    if not db:
+        return {"adaptive": dict(empty), "fixed": dict(empty)}
+
+    session = db["Session"]()
+
+    try:
+        runs = session.query(
+            func.max(case((AttemptOutcome.adaptive.is_(True), 1), else_=0)).label("adaptive"),
+            func.count(AttemptOutcome.id).label("attempts"),
+            func.max(case((AttemptOutcome.passed.is_(True), 1), else_=0)).label("passed"),
+            func.max(case((AttemptOutcome.stopped_early.is_(True), 1), else_=0)).label("stopped_early"),
+            func.max(AttemptOutcome.max_attempts).label("max_attempts")
+        ).group_by(AttemptOutcome.run_id).all()
+
+        summary = {}
+        for name, flag in (("adaptive", 1), ("fixed", 0)):
+            group = [run for run in runs if run.adaptive == flag]
+            if not group:
+                summary[name] = dict(empty)
+                continue
+            stopped = [run for run in group if run.stopped_early]
+            summary[name] = {
+                "runs": len(group),
+                "mean_attempts": sum(run.attempts for run in group) / len(group),
+                "pass_rate": sum(run.passed for run in group) / len(group),
+                "stopped_early": len(stopped),
+                "attempts_saved": sum(max(0, (run.max_attempts or 0) - run.attempts) for run in stopped)
+            }
+        return summary
+    except Exception as e:
+        print(f"Error getting attempt savings: {e}")
+        return {"adaptive": dict(empty), "fixed": dict(empty)}
+    finally:
+        session.close()
@@ -0,0 +1,359 @@
+import datetime
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from ..models import EnrichmentCache, EnrichmentContext
+from ..connection import get_database_connection
+
+def _not_expired(now):
+    return or_(EnrichmentCache.expires_at.is_(None), EnrichmentCache.expires_at > now)
+
+def get_enrichment_cache_entries(cache_keys):
+    """
+    Get unexpired cache entries for a list of keys
+
+    Returns:
+        Dictionary mapping each found cache key to its list of variant entries
+    """
+    cache_keys = list(set(cache_keys or []))
+    if not cache_keys:
+        return {}
+
+    db = get_database_connection()
+    if not db:
+        return {}
+
+    session = db["Session"]()
+
+    try:
+        now = datetime.datetime.utcnow()
+        entries = session.query(EnrichmentCache).filter(
+            EnrichmentCache.cache_key.in_(cache_keys),
+            _not_expired(now)
+        ).order_by(EnrichmentCache.variant).all()
+
+        result = {}
+        for entry in entries:
+            result.setdefault(entry.cache_key, []).append({
+                "id": entry.id,
+                "cache_key": entry.cache_key,
+                "variant": entry.variant,
+                "statement_hash": entry.statement_hash,
+                "original": entry.original,
+                "enriched": entry.enriched,
+                "metrics": entry.metrics
+            })
+        return result
+    except Exception as e:
+        print(f"Error getting enrichment cache entries: {e}")
+        return {}
+    finally:
+        session.close()
+
+def touch_enrichment_cache_entries(entry_ids):
+    """Record a hit on cache entries (hit count and LRU timestamp)"""
+    entry_ids = list(entry_ids or [])
+    if not entry_ids:
+        return False
+
+    db = get_database_connection()
+    if not db:
+        return False
+
+    session = db["Session"]()
+
+    try:
+        session.query(EnrichmentCache).filter(EnrichmentCache.id.in_(entry_ids)).update({
+            EnrichmentCache.hit_count: EnrichmentCache.hit_count + 1,
+            EnrichmentCache.last_accessed_at: datetime.datetime.utcnow()
+        }, synchronize_session=False)
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"Error touching enrichment cache entries: {e}")
+        return False
+    finally:
+        session.close()
+
+def save_enrichment_cache_entries(entries, ttl_days=None):
+    """
+    Store generated enrichments as new cache variants
+
+    Args:
+        entries: List of dictionaries with cache_key, statement_hash, prompt_hash, original,
+            enriched, metrics, model_name, temperature and statement_length, and optionally
+            semantic_key and context_hash
+        ttl_days: Days until the entries expire (None or 0 for no expiry)
+
+    Returns:
+        Number of entries stored
+    """
+    if not entries:
+        return 0
+
+    db = get_database_connection()
+    if not db:
+        return 0
+
+    session = db["Session"]()
+
+    try:
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(days=ttl_days) if ttl_days else None
+
+        # Each new entry becomes the next variant of its key
+        keys = list({entry["cache_key"] for entry in entries})
+        next_variants = dict(session.query(
+            EnrichmentCache.cache_key, func.max(EnrichmentCache.variant) + 1
+        ).filter(EnrichmentCache.cache_key.in_(keys)).group_by(EnrichmentCache.cache_key).all())
+
+        for entry in entries:
+            variant = next_variants.get(entry["cache_key"], 0)
+            next_variants[entry["cache_key"]] = variant + 1
+            session.add(EnrichmentCache(
+                cache_key=entry["cache_key"],
+                variant=variant,
+                semantic_key=entry.get("semantic_key"),
+                context_hash=entry.get("context_hash"),
+                statement_hash=entry["statement_hash"],
+                prompt_hash=entry["prompt_hash"],
+                original=entry["original"],
+                enriched=entry["enriched"],
+                metrics=entry.get("metrics"),
+                model_name=entry.get("model_name"),
+                temperature=entry.get("temperature"),
+                statement_length=entry.get("statement_length"),
+                created_at=now,
+                last_accessed_at=now,
+                expires_at=expires_at
+            ))
+
+        session.commit()
+        return len(entries)
+    except IntegrityError:
+        # Another session stored the same variants concurrently; their entries are as good as ours
+        session.rollback()
+        return 0
+    except Exception as e:
+        session.rollback()
+        print(f"Error saving enrichment cache entries: {e}")
+        return 0
+    finally:
+        session.close()
+
+def evict_enrichment_cache(max_entries=None):
+    """
+    Delete expired entries and, above max_entries, the least recently used ones
+
+    Returns:
+        Number of entries deleted
+    """
+    db = get_database_connection()
+    if not db:
+        return 0
+
+    session = db["Session"]()
+
+    try:
+        now = datetime.datetime.utcnow()
+        deleted = session.query(EnrichmentCache).filter(
+            EnrichmentCache.expires_at.isnot(None),
+            EnrichmentCache.expires_at <= now
+        ).delete(synchronize_session=False)
+
+        if max_entries:
+            excess = session.query(func.count(EnrichmentCache.id)).scalar() - max_entries
+            if excess > 0:
+                stale_ids = [row.id for row in session.query(EnrichmentCache.id).order_by(
+                    EnrichmentCache.last_accessed_at, EnrichmentCache.id
+                ).limit(excess).all()]
+                deleted += session.query(EnrichmentCache).filter(
+                    EnrichmentCache.id.in_(stale_ids)
+                ).delete(synchronize_session=False)
+
+        if deleted:
+            _delete_orphaned_contexts(session)
+        session.commit()
+        return deleted
+    except Exception as e:
+        session.rollback()
+        print(f"Error evicting enrichment cache: {e}")
+        return 0
+    finally:
+        session.close()
+
+def delete_enrichment_cache_entries(prompt_hash=None, statement_hashes=None):
+    """
+    Delete cache entries for a prompt and/or a set of statements
+
+    Returns:
+        Number of entries deleted
+    """
+    if prompt_hash is None and statement_hashes is None:
+        return 0
+
+    db = get_database_connection()
+    if not db:
+        return 0
+
+    session = db["Session"]()
+
+    try:
+        query = session.query(EnrichmentCache)
+        if prompt_hash is not None:
+            query = query.filter(EnrichmentCache.prompt_hash == prompt_hash)
+        if statement_hashes is not None:
+            statement_hashes = list(statement_hashes)
+            if not statement_hashes:
+                return 0
+            query = query.filter(EnrichmentCache.statement_hash.in_(statement_hashes))
+
+        deleted = query.delete(synchronize_session=False)
+        if deleted:
+            _delete_orphaned_contexts(session)
+        session.commit()
+        return deleted
+    except Exception as e:
+        session.rollback()
+        print(f"Error deleting enrichment cache entries: {e}")
+        return 0
+    finally:
+        session.close()
+
+def clear_enrichment_cache():
+    """Delete all cache entries"""
+    db = get_database_connection()
+    if not db:
+        return 0
+
+    session = db["Session"]()
+
+    try:
+        deleted = session.query(EnrichmentCache).delete(synchronize_session=False)
+        session.query(EnrichmentContext).delete(synchronize_session=False)
+        session.commit()
+        return deleted
+    except Exception as e:
+        session.rollback()
+        print(f"Error clearing enrichment cache: {e}")
+        return 0
+    finally:
+        session.close()
+
+def _delete_orphaned_contexts(session):
+    """Delete stored contexts that no cache entry references any more"""
+    referenced = session.query(EnrichmentCache.context_hash).filter(EnrichmentCache.context_hash.isnot(None))
+    return session.query(EnrichmentContext).filter(
+        EnrichmentContext.context_hash.notin_(referenced)
+    ).delete(synchronize_session=False)
+
+def save_enrichment_context(context_hash, context, embedding):
+    """Store a profile context and its embedding unless it is already stored"""
+    db = get_database_connection()
+    if not db:
+        return False
+
+    session = db["Session"]()
+
+    try:
+        if session.query(EnrichmentContext.id).filter_by(context_hash=context_hash).first():
+            return True
+        session.add(EnrichmentContext(context_hash=context_hash, context=context, embedding=embedding))
+        session.commit()
+        return True
+    except IntegrityError:
+        # Stored concurrently by another session
+        session.rollback()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"Error saving enrichment context: {e}")
+        return False
+    finally:
+        session.close()
+
+def get_semantic_cache_candidates(semantic_keys):
+    """
+    Get unexpired cache entries that can be reused for other profile contexts
+
+    Returns:
+        Tuple of (entries, embeddings): entries is a list of dictionaries with id, semantic_key,
+        context_hash, enriched and metrics; embeddings maps each context hash to its embedding
+    """
+    semantic_keys = list(set(semantic_keys or []))
+    if not semantic_keys:
+        return [], {}
+
+    db = get_database_connection()
+    if not db:
+        return [], {}
+
+    session = db["Session"]()
+
+    try:
+        now = datetime.datetime.utcnow()
+        entries = session.query(
+            EnrichmentCache.id,
+            EnrichmentCache.semantic_key,
+            EnrichmentCache.context_hash,
+            EnrichmentCache.enriched,
+            EnrichmentCache.metrics
+        ).filter(
+            EnrichmentCache.semantic_key.in_(semantic_keys),
+            EnrichmentCache.context_hash.isnot(None),
+            _not_expired(now)
+        ).all()
+
+        context_hashes = list({entry.context_hash for entry in entries})
+        embeddings = {}
+        if context_hashes:
+            embeddings = dict(session.query(EnrichmentContext.context_hash, EnrichmentContext.embedding).filter(
+                EnrichmentContext.context_hash.in_(context_hashes),
+                EnrichmentContext.embedding.isnot(None)
+            ).all())
+
+        return [{
+            "id": entry.id,
+            "semantic_key": entry.semantic_key,
+            "context_hash": entry.context_hash,
+            "enriched": entry.enriched,
+            "metrics": entry.metrics
+        } for entry in entries if entry.context_hash in embeddings], embeddings
+    except Exception as e:
+        print(f"Error getting semantic cache candidates: {e}")
+        return [], {}
+    finally:
+        session.close()
+
+def get_enrichment_cache_summary():
+    """Get entry counts and accumulated hits of the enrichment cache"""
+    db = get_database_connection()
+    if not db:
+        return None
+
+    session = db["Session"]()
+
+    try:
+        now = datetime.datetime.utcnow()
+        entries, keys, total_hits = session.query(
+            func.count(EnrichmentCache.id),
+            func.count(func.distinct(EnrichmentCache.cache_key)),
+            func.coalesce(func.sum(EnrichmentCache.hit_count), 0)
+        ).one()
+        expired = session.query(func.count(EnrichmentCache.id)).filter(
+            EnrichmentCache.expires_at.isnot(None),
+            EnrichmentCache.expires_at <= now
+        ).scalar()
+        contexts = session.query(func.count(EnrichmentContext.id)).scalar()
+        return {
+            "entries": entries,
+            "keys": keys,
+            "total_hits": int(total_hits),
+            "expired": expired,
+            "contexts": contexts
+        }
+    except Exception as e:
+        print(f"Error getting enrichment cache summary: {e}")
+        return None
+    finally:
+        session.close()
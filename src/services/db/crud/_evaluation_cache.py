@@ -0,0 +1,98 @@
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from ..models import EvaluationCache
+from ..connection import get_database_connection
+
+def get_cached_evaluation(eval_key):
+    """
+    Get a stored evaluation and record the hit
+
+    Returns:
+        Dictionary with scores and explanation, or None if the pair was never evaluated
+    """
+    db = get_database_connection()
+    if not db:
+        return None
+
+    session = db["Session"]()
+
+    try:
+        entry = session.query(EvaluationCache).filter_by(eval_key=eval_key).first()
+        if not entry:
+            return None
+
+        entry.hit_count = (entry.hit_count or 0) + 1
+        session.commit()
+        return {"scores": entry.scores, "explanation": entry.explanation}
+    except Exception as e:
+        session.rollback()
+        print(f"Error getting cached evaluation: {e}")
+        return None
+    finally:
+        session.close()
+
+def save_cached_evaluation(eval_key, rubric_version, model_name, scores, explanation):
+    """Store an evaluation; a concurrent insert of the same key is not an error"""
+    db = get_database_connection()
+    if not db:
+        return False
+
+    session = db["Session"]()
+
+    try:
+        session.add(EvaluationCache(
+            eval_key=eval_key,
+            rubric_version=rubric_version,
+            model_name=model_name,
+            scores=scores,
+            explanation=explanation
+        ))
+        session.commit()
+        return True
+    except IntegrityError:
+        session.rollback()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"Error saving cached evaluation: {e}")
+        return False
+    finally:
+        session.close()
+
+def delete_outdated_evaluations(rubric_version):
+    """Delete evaluations made with other rubric versions; returns the number deleted"""
+    db = get_database_connection()
+    if not db:
+        return 0
+
+    session = db["Session"]()
+
+    try:
+        deleted = session.query(EvaluationCache).filter(
+            EvaluationCache.rubric_version != rubric_version
+        ).delete(synchronize_session=False)
+        session.commit()
+        return deleted
+    except Exception as e:
+        session.rollback()
+        print(f"Error deleting outdated evaluations: {e}")
+        return 0
+    finally:
+        session.close()
+
+def get_evaluation_cache_summary():
+    """Returns the number of stored evaluations and their total hits"""
+    db = get_database_connection()
+    if not db:
+        return {"entries": 0, "hits": 0}
+
+    session = db["Session"]()
+
+    try:
+        entries, hits = session.query(func.count(EvaluationCache.id), func.coalesce(func.sum(EvaluationCache.hit_count), 0)).one()
+        return {"entries": entries, "hits": int(hits)}
+    except Exception as e:
+        print(f"Error getting evaluation cache summary: {e}")
+        return {"entries": 0, "hits": 0}
+    finally:
+        session.close()
@@ -0,0 +1,603 @@
+import datetime
+from sqlalchemy import func
+from ..models import Framework, FrameworkCategory, FrameworkSubcategory, FrameworkStatement
+from ..connection import get_database_connection
+from ._statement_catalog import _register_statements, compute_statement_hash
+from ._framework_versions import _record_framework_version
+
+def _sync_framework_items(session, framework):
+    """Rebuild the normalized rows of a framework from its JSON structure"""
+    session.query(FrameworkStatement).filter_by(framework_id=framework.id).delete(synchronize_session=False)
+    session.query(FrameworkSubcategory).filter_by(framework_id=framework.id).delete(synchronize_session=False)
+    session.query(FrameworkCategory).filter_by(framework_id=framework.id).delete(synchronize_session=False)
+
+    for category_position, (category_name, subcategories) in enumerate((framework.structure or {}).items()):
+        session.add(FrameworkCategory(
+            framework_id=framework.id,
+            name=category_name,
+            position=category_position,
+            subcategories=[
+                FrameworkSubcategory(
+                    framework_id=framework.id,
+                    name=subcategory_name,
+                    position=subcategory_position,
+                    statements=[
+                        FrameworkStatement(
+                            framework_id=framework.id,
+                            statement_hash=compute_statement_hash(text),
+                            text=text,
+                            position=statement_position
+                        )
+                        for statement_position, text in enumerate(statements)
+                    ]
+                )
+                for subcategory_position, (subcategory_name, statements) in enumerate(subcategories.items())
+            ]
+        ))
+
+def _refresh_materialized_structure(session, framework, created_by=None):
+    """Rebuild Framework.structure and its statement count from the normalized rows and record a new version"""
+    session.flush()
+
+    rows = session.query(
+        FrameworkCategory.name.label("category"),
+        FrameworkSubcategory.name.label("subcategory"),
+        FrameworkStatement.text.label("text")
+    ).select_from(FrameworkCategory).outerjoin(
+        FrameworkSubcategory, FrameworkSubcategory.category_id == FrameworkCategory.id
+    ).outerjoin(
+        FrameworkStatement, FrameworkStatement.subcategory_id == FrameworkSubcategory.id
+    ).filter(
+        FrameworkCategory.framework_id == framework.id
+    ).order_by(
+        FrameworkCategory.position, FrameworkSubcategory.position, FrameworkStatement.position
+    ).all()
+
+    structure = {}
+    statement_count = 0
+    for row in rows:
+        category = structure.setdefault(row.category, {})
+        if row.subcategory is None:
+            continue
+        statements = category.setdefault(row.subcategory, [])
+        if row.text is not None:
+            statements.append(row.text)
+            statement_count += 1
+
+    framework.structure = structure
+    framework.statement_count = statement_count
+    framework.updated_at = datetime.datetime.utcnow()
+    _record_framework_version(session, framework, created_by)
+
+def _find_category(session, framework_id, category_name):
+    return session.query(FrameworkCategory).filter_by(framework_id=framework_id, name=category_name).first()
+
+def _find_subcategory(session, framework_id, category_name, subcategory_name):
+    return session.query(FrameworkSubcategory).join(
+        FrameworkCategory, FrameworkSubcategory.category_id == FrameworkCategory.id
+    ).filter(
+        FrameworkSubcategory.framework_id == framework_id,
+        FrameworkCategory.name == category_name,
+        FrameworkSubcategory.name == subcategory_name
+    ).first()
+
+def _get_subcategory_statement_rows(session, subcategory_id):
+    return session.query(FrameworkStatement).filter_by(subcategory_id=subcategory_id).order_by(FrameworkStatement.position).all()
+
+def _renumber(items):
+    """Assign consecutive positions following the list order"""
+    for position, item in enumerate(items):
+        item.position = position
+
+def _edit_framework(framework_id, operation, action, created_by=None):
+    """
+    Apply an incremental edit to a framework's normalized rows
+
+    Args:
+        framework_id: ID of the framework to edit
+        operation: Callable (session, framework) returning True when the edit was applied
+        action: Description used in error messages
+        created_by: User recorded on the new version
+
+    Returns:
+        True if the edit was applied and the materialized structure refreshed
+    """
+    db = get_database_connection()
+    if not db:
+        return False
+
+    session = db["Session"]()
+
+    try:
+        framework = session.query(Framework).filter_by(id=framework_id).first()
+        if not framework:
+            return False
+
+        if not operation(session, framework):
+            session.rollback()
+            return False
+
+        _refresh_materialized_structure(session, framework, created_by)
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"Error {action}: {e}")
+        return False
+    finally:
+        session.close()
+
+def _append_framework_statements(session, framework_id, rows):
+    """Insert (category, subcategory, text) rows after the existing items, creating missing categories and subcategories"""
+    categories = {
+        category.name: category
+        for category in session.query(FrameworkCategory).filter_by(framework_id=framework_id).all()
+    }
+    subcategories = {
+        (category_name, subcategory.name): subcategory
+        for category_name, subcategory in session.query(FrameworkCategory.name, FrameworkSubcategory).join(
+            FrameworkSubcategory, FrameworkSubcategory.category_id == FrameworkCategory.id
+        ).filter(FrameworkCategory.framework_id == framework_id).all()
+    }
+
+    touched_ids = {subcategories[(c, s)].id for c, s, _ in rows if (c, s) in subcategories}
+    next_positions = {}
+    existing_hashes = set()
+    if touched_ids:
+        next_positions = dict(session.query(
+            FrameworkStatement.subcategory_id, func.max(FrameworkStatement.position) + 1
+        ).filter(FrameworkStatement.subcategory_id.in_(touched_ids)).group_by(FrameworkStatement.subcategory_id).all())
+        existing_hashes = set(session.query(
+            FrameworkStatement.subcategory_id, FrameworkStatement.statement_hash
+        ).filter(FrameworkStatement.subcategory_id.in_(touched_ids)).all())
+
+    inserted = []
+    duplicates = []
+    for index, (category_name, subcategory_name, text) in enumerate(rows):
+        category = categories.get(category_name)
+        if category is None:
+            category = FrameworkCategory(framework_id=framework_id, name=category_name, position=len(categories))
+            session.add(category)
+            categories[category_name] = category
+
+        subcategory = subcategories.get((category_name, subcategory_name))
+        if subcategory is None:
+            sibling_count = sum(1 for key in subcategories if key[0] == category_name)
+            subcategory = FrameworkSubcategory(framework_id=framework_id, name=subcategory_name, position=sibling_count)
+            category.subcategories.append(subcategory)
+            session.flush()
+            subcategories[(category_name, subcategory_name)] = subcategory
+
+        statement_hash = compute_statement_hash(text)
+        if (subcategory.id, statement_hash) in existing_hashes:
+            duplicates.append(index)
+            continue
+        existing_hashes.add((subcategory.id, statement_hash))
+
+        position = next_positions.get(subcategory.id, 0)
+        next_positions[subcategory.id] = position + 1
+        session.add(FrameworkStatement(
+            framework_id=framework_id,
+            subcategory_id=subcategory.id,
+            statement_hash=statement_hash,
+            text=text,
+            position=position
+        ))
+        inserted.append(text)
+
+    _register_statements(session, inserted)
+    return {"inserted": len(inserted), "duplicates": duplicates}
+
+def append_framework_statements(framework_id, rows, refresh=True):
+    """
+    Bulk-append statements to a framework
+
+    Args:
+        framework_id: ID of the framework
+        rows: List of (category, subcategory, statement text) tuples
+        refresh: Whether to rebuild the materialized structure now; bulk imports
+            pass False for every batch and call refresh_framework_structure once
+
+    Returns:
+        Dictionary with the number of inserted rows and the indices of duplicate rows skipped,
+        or None on error
+    """
+    db = get_database_connection()
+    if not db:
+        return None
+
+    session = db["Session"]()
+
+    try:
+        if not session.query(Framework.id).filter_by(id=framework_id).first():
+            return None
+
+        result = _append_framework_statements(session, framework_id, rows)
+        if refresh:
+            _refresh_materialized_structure(session, session.query(Framework).filter_by(id=framework_id).first())
+        session.commit()
+        return result
+    except Exception as e:
+        session.rollback()
+        print(f"Error appending framework statements: {e}")
+        return None
+    finally:
+        session.close()
+
+def refresh_framework_structure(framework_id, created_by=None):
+    """Rebuild a framework's materialized structure and statement count from its normalized rows"""
+    return _edit_framework(framework_id, lambda session, framework: True, "refreshing framework structure", created_by)
+
+def iter_framework_statement_rows(framework_id, batch_size=1000):
+    """
+    Stream a framework's statements in order without materializing the whole framework
+
+    Yields:
+        (category, subcategory, statement text) tuples; empty categories and subcategories are skipped
+    """
+    db = get_database_connection()
+    if not db:
+        return
+
+    session = db["Session"]()
+
+    try:
+        query = session.query(
+            FrameworkCategory.name,
+            FrameworkSubcategory.name,
+            FrameworkStatement.text
+        ).select_from(FrameworkStatement).join(
+            FrameworkSubcategory, FrameworkStatement.subcategory_id == FrameworkSubcategory.id
+        ).join(
+            FrameworkCategory, FrameworkSubcategory.category_id == FrameworkCategory.id
+        ).filter(
+            FrameworkStatement.framework_id == framework_id
+        ).order_by(
+            FrameworkCategory.position, FrameworkSubcategory.position, FrameworkStatement.position
+        ).yield_per(batch_size)
+        for category_name, subcategory_name, text in query:
+            yield category_name, subcategory_name, text
+    finally:
+        session.close()
+
+def get_framework_statement_hashes(framework_id):
+    """Get the set of statement hashes used in a framework"""
+    db = get_database_connection()
+    if not db:
+        return set()
+
+    session = db["Session"]()
+
+    try:
+        rows = session.query(FrameworkStatement.statement_hash).filter_by(framework_id=framework_id).distinct().all()
+        return {row.statement_hash for row in rows}
+    except Exception as e:
+        print(f"Error getting framework statement hashes: {e}")
+        return set()
+    finally:
+        session.close()
+
+# Partial-load queries
+
+def get_framework_categories(framework_id):
+    """Get the categories of a framework in order, with subcategory counts"""
+    db = get_database_connection()
+    if not db:
+        return []
+
+    session = db["Session"]()
+
+    try:
+        rows = session.query(
+            FrameworkCategory.id,
+            FrameworkCategory.name,
+            FrameworkCategory.position,
+            func.count(FrameworkSubcategory.id).label("subcategory_count")
+        ).outerjoin(
+            FrameworkSubcategory, FrameworkSubcategory.category_id == FrameworkCategory.id
+        ).filter(
+            FrameworkCategory.framework_id == framework_id
+        ).group_by(
+            FrameworkCategory.id, FrameworkCategory.name, FrameworkCategory.position
+        ).order_by(FrameworkCategory.position).all()
+        return [{
+            "id": row.id,
+            "name": row.name,
+            "position": row.position,
+            "subcategory_count": row.subcategory_count
+        } for row in rows]
+    except Exception as e:
+        print(f"Error getting framework categories: {e}")
+        return []
+    finally:
+        session.close()
+
+def get_framework_subcategories(framework_id, category_name):
+    """Get the subcategories of one framework category in order, with statement counts"""
+    db = get_database_connection()
+    if not db:
+        return []
+
+    session = db["Session"]()
+
+    try:
+        rows = session.query(
+            FrameworkSubcategory.id,
+            FrameworkSubcategory.name,
+            FrameworkSubcategory.position,
+            func.count(FrameworkStatement.id).label("statement_count")
+        ).join(
+            FrameworkCategory, FrameworkSubcategory.category_id == FrameworkCategory.id
+        ).outerjoin(
+            FrameworkStatement, FrameworkStatement.subcategory_id == FrameworkSubcategory.id
+        ).filter(
+            FrameworkSubcategory.framework_id == framework_id,
+            FrameworkCategory.name == category_name
+        ).group_by(
+            FrameworkSubcategory.id, FrameworkSubcategory.name, FrameworkSubcategory.position
+        ).order_by(FrameworkSubcategory.position).all()
+        return [{
+            "id": row.id,
+            "name": row.name,
+            "position": row.position,
+            "statement_count": row.statement_count
+        } for row in rows]
+    except Exception as e:
+        print(f"Error getting framework subcategories: {e}")
+        return []
+    finally:
+        session.close()
+
+def get_subcategory_statements(framework_id, category_name, subcategory_name):
+    """Get the statements of a single subcategory in order"""
+    db = get_database_connection()
+    if not db:
+        return []
+
+    session = db["Session"]()
+
+    try:
+        rows = session.query(
+            FrameworkStatement.statement_hash,
+            FrameworkStatement.text,
+            FrameworkStatement.position
+        ).join(
+            FrameworkSubcategory, FrameworkStatement.subcategory_id == FrameworkSubcategory.id
+        ).join(
+            FrameworkCategory, FrameworkSubcategory.category_id == FrameworkCategory.id
+        ).filter(
+            FrameworkStatement.framework_id == framework_id,
+            FrameworkCategory.name == category_name,
+            FrameworkSubcategory.name == subcategory_name
+        ).order_by(FrameworkStatement.position).all()
+        return [{
+            "statement_hash": row.statement_hash,
+            "text": row.text,
+            "position": row.position
+        } for row in rows]
+    except Exception as e:
+        print(f"Error getting subcategory statements: {e}")
+        return []
+    finally:
+        session.close()
+
+def get_statements_for_selection(framework_id, category_names=None, subcategories=None):
+    """
+    Get statement texts for selected categories and subcategories without loading the whole framework
+
+    Args:
+        framework_id: ID of the framework
+        category_names: List of fully selected category names
+        subcategories: Dictionary of category name to selected subcategory names
+
+    Returns:
+        Ordered list of unique statement texts, or None if the framework has no normalized rows
+    """
+    db = get_database_connection()
+    if not db:
+        return None
+
+    session = db["Session"]()
+
+    try:
+        if not session.query(FrameworkCategory.id).filter_by(framework_id=framework_id).first():
+            return None
+
+        category_names = list(category_names or [])
+        subcategory_pairs = [
+            (category, subcategory)
+            for category, names in (subcategories or {}).items() if category not in category_names
+            for subcategory in names
+        ]
+        if not category_names and not subcategory_pairs:
+            return []
+
+        rows = session.query(
+            FrameworkCategory.name.label("category"),
+            FrameworkSubcategory.name.label("subcategory"),
+            FrameworkStatement.text
+        ).select_from(FrameworkStatement).join(
+            FrameworkSubcategory, FrameworkStatement.subcategory_id == FrameworkSubcategory.id
+        ).join(
+            FrameworkCategory, FrameworkSubcategory.category_id == FrameworkCategory.id
+        ).filter(
+            FrameworkStatement.framework_id == framework_id,
+            FrameworkCategory.name.in_(category_names + [category for category, _ in subcategory_pairs])
+        ).order_by(
+            FrameworkCategory.position, FrameworkSubcategory.position, FrameworkStatement.position
+        ).all()
+
+        selected_pairs = set(subcategory_pairs)
+        statements = []
+        seen = set()
+        for row in rows:
+            if row.category in category_names or (row.category, row.subcategory) in selected_pairs:
+                if row.text not in seen:
+                    seen.add(row.text)
+                    statements.append(row.text)
+        return statements
+    except Exception as e:
+        print(f"Error getting statements for selection: {e}")
+        return None
+    finally:
+        session.close()
+
+# Incremental edit operations
+
+def add_framework_category(framework_id, name):
+    """Append a new empty category to a framework"""
+    def operation(session, framework):
+        if not name or _find_category(session, framework_id, name):
+            return False
+        position = session.query(FrameworkCategory).filter_by(framework_id=framework_id).count()
+        session.add(FrameworkCategory(framework_id=framework_id, name=name, position=position))
+        return True
+
+    return _edit_framework(framework_id, operation, "adding framework category")
+
+def rename_framework_category(framework_id, name, new_name):
+    """Rename a framework category in place"""
+    def operation(session, framework):
+        category = _find_category(session, framework_id, name)
+        if not category or not new_name or _find_category(session, framework_id, new_name):
+            return False
+        category.name = new_name
+        return True
+
+    return _edit_framework(framework_id, operation, "renaming framework category")
+
+def delete_framework_category(framework_id, name):
+    """Delete a category together with its subcategories and statements"""
+    def operation(session, framework):
+        category = _find_category(session, framework_id, name)
+        if not category:
+            return False
+        session.delete(category)
+        session.flush()
+        _renumber(session.query(FrameworkCategory).filter_by(framework_id=framework_id).order_by(FrameworkCategory.position).all())
+        return True
+
+    return _edit_framework(framework_id, operation, "deleting framework category")
+
+def add_framework_subcategory(framework_id, category_name, name):
+    """Append a new empty subcategory to a framework category"""
+    def operation(session, framework):
+        category = _find_category(session, framework_id, category_name)
+        if not category or not name or _find_subcategory(session, framework_id, category_name, name):
+            return False
+        position = session.query(FrameworkSubcategory).filter_by(category_id=category.id).count()
+        session.add(FrameworkSubcategory(framework_id=framework_id, category_id=category.id, name=name, position=position))
+        return True
+
+    return _edit_framework(framework_id, operation, "adding framework subcategory")
+
+def rename_framework_subcategory(framework_id, category_name, name, new_name):
+    """Rename a subcategory in place"""
+    def operation(session, framework):
+        subcategory = _find_subcategory(session, framework_id, category_name, name)
+        if not subcategory or not new_name or _find_subcategory(session, framework_id, category_name, new_name):
+            return False
+        subcategory.name = new_name
+        return True
+
+    return _edit_framework(framework_id, operation, "renaming framework subcategory")
+
+def delete_framework_subcategory(framework_id, category_name, name):
+    """Delete a subcategory together with its statements"""
+    def operation(session, framework):
+        subcategory = _find_subcategory(session, framework_id, category_name, name)
+        if not subcategory:
+            return False
+        category_id = subcategory.category_id
+        session.delete(subcategory)
+        session.flush()
+        _renumber(session.query(FrameworkSubcategory).filter_by(category_id=category_id).order_by(FrameworkSubcategory.position).all())
+        return True
+
+    return _edit_framework(framework_id, operation, "deleting framework subcategory")
+
+def add_framework_statement(framework_id, category_name, subcategory_name, text, position=None):
+    """Insert a statement into a subcategory (appended when position is None)"""
+    def operation(session, framework):
+        subcategory = _find_subcategory(session, framework_id, category_name, subcategory_name)
+        if not subcategory or not text:
+            return False
+        rows = _get_subcategory_statement_rows(session, subcategory.id)
+        statement_hash = compute_statement_hash(text)
+        if any(row.statement_hash == statement_hash for row in rows):
+            return False
+        statement = FrameworkStatement(
+            framework_id=framework_id,
+            subcategory_id=subcategory.id,
+            statement_hash=statement_hash,
+            text=text
+        )
+        session.add(statement)
+        rows.insert(len(rows) if position is None else max(0, min(position, len(rows))), statement)
+        _renumber(rows)
+        _register_statements(session, [text])
+        return True
+
+    return _edit_framework(framework_id, operation, "adding framework statement")
+
+def update_framework_statement(framework_id, category_name, subcategory_name, position, text):
+    """Replace the text of the statement at a position (rejected if another statement of the subcategory has the same statement_hash)"""
+    def operation(session, framework):
+        subcategory = _find_subcategory(session, framework_id, category_name, subcategory_name)
+        if not subcategory or not text:
+            return False
+        rows = _get_subcategory_statement_rows(session, subcategory.id)
+        statement = next((row for row in rows if row.position == position), None)
+        if not statement:
+            return False
+        # Same duplicate rule as adding and importing statements
+        statement_hash = compute_statement_hash(text)
+        if any(row.statement_hash == statement_hash for row in rows if row is not statement):
+            return False
+        statement.text = text
+        statement.statement_hash = statement_hash
+        _register_statements(session, [text])
+        return True
+
+    return _edit_framework(framework_id, operation, "updating framework statement")
+
+def delete_framework_statement(framework_id, category_name, subcategory_name, position):
+    """Delete the statement at a position"""
+    def operation(session, framework):
+        subcategory = _find_subcategory(session, framework_id, category_name, subcategory_name)
+        if not subcategory:
+            return False
+        rows = _get_subcategory_statement_rows(session, subcategory.id)
+        statement = next((row for row in rows if row.position == position), None)
+        if not statement:
+            return False
+        rows.remove(statement)
+        session.delete(statement)
+        _renumber(rows)
+        return True
+
+    return _edit_framework(framework_id, operation, "deleting framework statement")
+
+def move_framework_statement(framework_id, category_name, subcategory_name, position,
+                             target_category_name, target_subcategory_name, target_position=None):
+    """Move a statement within or between subcategories (appended when target_position is None)"""
+    def operation(session, framework):
+        source = _find_subcategory(session, framework_id, category_name, subcategory_name)
+        target = _find_subcategory(session, framework_id, target_category_name, target_subcategory_name)
+        if not source or not target:
+            return False
+        source_rows = _get_subcategory_statement_rows(session, source.id)
+        statement = next((row for row in source_rows if row.position == position), None)
+        if not statement:
+            return False
+        source_rows.remove(statement)
+        target_rows = source_rows if target.id == source.id else _get_subcategory_statement_rows(session, target.id)
+        if target.id != source.id and any(row.statement_hash == statement.statement_hash for row in target_rows):
+            return False
+        statement.subcategory_id = target.id
+        target_rows.insert(len(target_rows) if target_position is None else max(0, min(target_position, len(target_rows))), statement)
+        _renumber(source_rows)
+        _renumber(target_rows)
+        return True
+
+    return _edit_framework(framework_id, operation, "moving framework statement")
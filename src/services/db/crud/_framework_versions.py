@@ -0,0 +1,190 @@
+import copy
+import json
+from ..models import Framework, FrameworkVersion
+from ..connection import get_database_connection
+from ._statement_catalog import compute_statement_hash
+
+def _record_framework_version(session, framework, created_by=None):
+    """Snapshot the framework structure as a new immutable version if it changed since the latest one"""
+    session.flush()
+
+    latest = session.query(FrameworkVersion).filter_by(framework_id=framework.id).order_by(FrameworkVersion.version.desc()).first()
+    if latest is None and not framework.structure:
+        # Nothing worth versioning yet (e.g. a framework created empty in the builder)
+        return 0
+
+    # Compare serialized JSON so reordering also counts as a change
+    if latest is not None and json.dumps(latest.structure) == json.dumps(framework.structure):
+        framework.current_version = latest.version
+        return latest.version
+
+    version = (latest.version if latest else 0) + 1
+    session.add(FrameworkVersion(
+        framework_id=framework.id,
+        version=version,
+        structure=copy.deepcopy(framework.structure),
+        statement_count=framework.statement_count,
+        created_by=created_by
+    ))
+    framework.current_version = version
+    return version
+
+def get_framework_versions(framework_id):
+    """Get the version history of a framework (newest first) without the structures"""
+    db = get_database_connection()
+    if not db:
+        return []
+
+    session = db["Session"]()
+
+    try:
+        rows = session.query(
+            FrameworkVersion.version,
+            FrameworkVersion.statement_count,
+            FrameworkVersion.created_by,
+            FrameworkVersion.created_at
+        ).filter_by(framework_id=framework_id).order_by(FrameworkVersion.version.desc()).all()
+        return [{
+            "version": row.version,
+            "statement_count": row.statement_count,
+            "created_by": row.created_by,
+            "created_at": row.created_at
+        } for row in rows]
+    except Exception as e:
+        print(f"Error getting framework versions: {e}")
+        return []
+    finally:
+        session.close()
+
+def get_framework_version(framework_id, version=None):
+    """Get a framework version including its structure (the current version if version is None)"""
+    db = get_database_connection()
+    if not db:
+        return None
+
+    session = db["Session"]()
+
+    try:
+        if version is None:
+            row = session.query(Framework.current_version).filter_by(id=framework_id).first()
+            if not row:
+                return None
+            version = row.current_version
+
+        framework_version = session.query(FrameworkVersion).filter_by(framework_id=framework_id, version=version).first()
+        if framework_version:
+            return {
+                "framework_id": framework_version.framework_id,
+                "version": framework_version.version,
+                "structure": framework_version.structure,
+                "statement_count": framework_version.statement_count,
+                "created_by": framework_version.created_by,
+                "created_at": framework_version.created_at
+            }
+        return None
+    except Exception as e:
+        print(f"Error getting framework version: {e}")
+        return None
+    finally:
+        session.close()
+
+def _statement_locations(structure):
+    """Map each statement hash to the list of places it occurs in a structure"""
+    locations = {}
+    for category, subcategories in (structure or {}).items():
+        for subcategory, statements in subcategories.items():
+            for position, text in enumerate(statements):
+                locations.setdefault(compute_statement_hash(text), []).append({
+                    "text": text,
+                    "category": category,
+                    "subcategory": subcategory,
+                    "position": position
+                })
+    return locations
+
+def diff_framework_structures(old_structure, new_structure):
+    """
+    Compare two framework structures by statement hash
+
+    A statement that stays in the same category/subcategory is unchanged even if its
+    position shifts; a statement whose text is edited shows up as removed and added.
+
+    Returns:
+        Dictionary with "added", "removed" and "moved" lists. Added/removed items carry
+        statement_hash, text, category, subcategory and position; moved items carry
+        statement_hash, text and "from"/"to" locations.
+    """
+    old_locations = _statement_locations(old_structure)
+    new_locations = _statement_locations(new_structure)
+
+    added, removed, moved = [], [], []
+    for statement_hash in dict.fromkeys(list(old_locations) + list(new_locations)):
+        old_items = list(old_locations.get(statement_hash, []))
+        new_items = []
+
+        for item in new_locations.get(statement_hash, []):
+            match = next((old for old in old_items if (old["category"], old["subcategory"]) == (item["category"], item["subcategory"])), None)
+            if match:
+                old_items.remove(match)
+            else:
+                new_items.append(item)
+
+        for old_item, new_item in zip(old_items, new_items):
+            moved.append({
+                "statement_hash": statement_hash,
+                "text": new_item["text"],
+                "from": {key: old_item[key] for key in ("category", "subcategory", "position")},
+                "to": {key: new_item[key] for key in ("category", "subcategory", "position")}
+            })
+
+        paired = min(len(old_items), len(new_items))
+        added.extend({"statement_hash": statement_hash, **item} for item in new_items[paired:])
+        removed.extend({"statement_hash": statement_hash, **item} for item in old_items[paired:])
+
+    return {"added": added, "removed": removed, "moved": moved}
+
+def diff_framework_versions(framework_id, from_version, to_version=None):
+    """
+    Diff two versions of a framework
+
+    Args:
+        framework_id: ID of the framework
+        from_version: Older version number (0 diffs against an empty framework)
+        to_version: Newer version number, defaults to the current version
+
+    Returns:
+        Dictionary with from_version, to_version, added, removed and moved, or None if a version doesn't exist
+    """
+    to_data = get_framework_version(framework_id, to_version)
+    if not to_data:
+        return None
+
+    if from_version:
+        from_data = get_framework_version(framework_id, from_version)
+        if not from_data:
+            return None
+        from_structure = from_data["structure"]
+    else:
+        from_structure = {}
+
+    diff = diff_framework_structures(from_structure, to_data["structure"])
+    return {"from_version": from_version, "to_version": to_data["version"], **diff}
+
+def get_changed_statement_hashes(framework_id, since_version, to_version=None, include_moved=False):
+    """
+    Get the hashes of statements that changed between two framework versions
+
+    Caches keyed on statement content can invalidate just these entries instead of
+    flushing everything for the framework.
+
+    Returns:
+        Set of statement hashes that were added or removed (and moved if include_moved), or None on error
+    """
+    diff = diff_framework_versions(framework_id, since_version, to_version)
+    if diff is None:
+        return None
+
+    changed = {item["statement_hash"] for item in diff["added"] + diff["removed"]}
+    if include_moved:
+        changed.update(item["statement_hash"] for item in diff["moved"])
+    return changed
@@ -2,9 +2,17 @@ import datetime
 from sqlalchemy.orm import sessionmaker
 from ..models import Framework
 from ..connection import get_database_connection
+from ._statement_catalog import _register_statements, get_structure_statements
+from ._framework_items import _sync_framework_items
+from ._framework_versions import _record_framework_version
 
-def save_framework(name, structure, description=None, is_default=False, created_by=None):
-    """Save a framework to the database"""
+def save_framework(name, structure, description=None, is_default=False, created_by=None, record_version=True):
+    """
+    Save a framework to the database
+
+    Bulk imports pass record_version=False and an empty structure; their first
+    version is recorded once all statements are in (refresh_framework_structure).
+    """
     db = get_database_connection()
     if not db:
         return None
@@ -12,14 +20,22 @@ def save_framework(name, structure, description=None, is_default=False, created_
     session = db["Session"]()
     
     try:
+        framework_statements = get_structure_statements(structure)
         framework = Framework(
             name=name,
             description=description,
             structure=structure,
+            statement_count=len(framework_statements),
             is_default=is_default,
             created_by=created_by
         )
         session.add(framework)
+        session.flush()
+        # Keep the statement catalog and normalized rows in sync with the structure
+        _register_statements(session, framework_statements)
+        _sync_framework_items(session, framework)
+        if record_version:
+            _record_framework_version(session, framework, created_by)
         session.commit()
         return framework.id
     except Exception as e:
@@ -45,6 +61,8 @@ def get_framework(framework_id):
                 "name": framework.name,
                 "description": framework.description,
                 "structure": framework.structure,
+                "statement_count": framework.statement_count,
+                "current_version": framework.current_version,
                 "is_default": framework.is_default,
                 "created_by": framework.created_by,
                 "created_at": framework.created_at,
@@ -74,6 +92,8 @@ def get_all_frameworks():
                 "name": framework.name,
                 "description": framework.description,
                 "structure": framework.structure,
+                "statement_count": framework.statement_count,
+                "current_version": framework.current_version,
                 "is_default": framework.is_default,
                 "created_by": framework.created_by,
                 "created_at": framework.created_at,
@@ -86,6 +106,64 @@ def get_all_frameworks():
     finally:
         session.close()
 
+def get_framework_summaries():
+    """Get a lightweight listing of all frameworks without loading their structure
+    
+    Returns:
+        List of dictionaries with id, name, description, statement count and timestamps
+    """
+    db = get_database_connection()
+    if not db:
+        return []
+    
+    session = db["Session"]()
+    
+    try:
+        rows = session.query(
+            Framework.id,
+            Framework.name,
+            Framework.description,
+            Framework.statement_count,
+            Framework.current_version,
+            Framework.is_default,
+            Framework.created_by,
+            Framework.created_at,
+            Framework.updated_at
+        ).order_by(Framework.is_default.desc(), Framework.name).all()
+        return [{
+            "id": row.id,
+            "name": row.name,
+            "description": row.description,
+            "statement_count": row.statement_count or 0,
+            "current_version": row.current_version,
+            "is_default": row.is_default,
+            "created_by": row.created_by,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at
+        } for row in rows]
+    except Exception as e:
+        print(f"Error getting framework summaries: {e}")
+        return []
+    finally:
+        session.close()
+
+def get_framework_structure(framework_id):
+    """Get only the structure of a framework"""
+    db = get_database_connection()
+    if not db:
+        return None
+    
+    session = db["Session"]()
+    
+    try:
+        row = session.query(Framework.structure).filter_by(id=framework_id).first()
+        return row.structure if row else None
+    except Exception as e:
+        print(f"Error getting framework structure: {e}")
+        return None
+    finally:
+        session.close()
+
 def update_framework(framework_id, name=None, description=None, structure=None):
     """Update a framework"""
     db = get_database_connection()
@@ -104,7 +182,12 @@ def update_framework(framework_id, name=None, description=None, structure=None):
         if description is not None:
             framework.description = description
         if structure is not None:
+            framework_statements = get_structure_statements(structure)
             framework.structure = structure
+            framework.statement_count = len(framework_statements)
+            _register_statements(session, framework_statements)
+            _sync_framework_items(session, framework)
+            _record_framework_version(session, framework)
         
         framework.updated_at = datetime.datetime.utcnow()
         session.commit()
@@ -159,6 +242,8 @@ def get_framework_by_name(name):
                 "name": framework.name,
                 "description": framework.description,
                 "structure": framework.structure,
+                "statement_count": framework.statement_count,
+                "current_version": framework.current_version,
                 "is_default": framework.is_default,
                 "created_by": framework.created_by,
                 "created_at": framework.created_at,
@@ -0,0 +1,84 @@
+from ..models import LearnedEvaluator
+from ..connection import get_database_connection
+
+def _to_dict(row):
+    return {
+        "id": row.id,
+        "feature_names": row.feature_names,
+        "parameters": row.parameters,
+        "report": row.report,
+        "sample_count": row.sample_count,
+        "is_active": row.is_active,
+        "created_at": row.created_at
+    }
+
+def save_learned_evaluator(feature_names, parameters, report, sample_count, activate=True):
+    """
+    Store a fitted evaluator, optionally making it the only active one
+
+    Returns:
+        ID of the new evaluator, or None on error
+    """
+    db = get_database_connection()
+    if not db:
+        return None
+
+    session = db["Session"]()
+
+    try:
+        if activate:
+            session.query(LearnedEvaluator).filter(LearnedEvaluator.is_active.is_(True)).update(
+                {LearnedEvaluator.is_active: False}, synchronize_session=False
+            )
+        row = LearnedEvaluator(
+            feature_names=feature_names,
+            parameters=parameters,
+            report=report,
+            sample_count=sample_count,
+            is_active=activate
+        )
+        session.add(row)
+        session.commit()
+        return row.id
+    except Exception as e:
+        session.rollback()
+        print(f"Error saving learned evaluator: {e}")
+        return None
+    finally:
+        session.close()
+
+def get_active_learned_evaluator():
+    """Returns the active evaluator as a dictionary, or None if none was trained"""
+    db = get_database_connection()
+    if not db:
+        return None
+
+    session = db["Session"]()
+
+    try:
+        row = session.query(LearnedEvaluator).filter(LearnedEvaluator.is_active.is_(True)).order_by(
+            LearnedEvaluator.created_at.desc()
+        ).first()
+        return _to_dict(row) if row else None
+    except Exception as e:
+        print(f"Error getting learned evaluator: {e}")
+        return None
+    finally:
+        session.close()
+
+def get_learned_evaluators(limit=10):
+    """Returns the most recently trained evaluators"""
+    db = get_database_connection()
+    if not db:
+        return []
+
+    session = db["Session"]()
+
+    try:
+        rows = session.query(LearnedEvaluator).order_by(LearnedEvaluator.created_at.desc()).limit(limit).all()
+        return [_to_dict(row) for row in rows]
+    except Exception as e:
+        print(f"Error getting learned evaluators: {e}")
+        return []
+    finally:
+        session.close()
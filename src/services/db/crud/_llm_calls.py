@@ -0,0 +1,163 @@
+import datetime
+from sqlalchemy import func, case
+from ..models import LLMCall, QuizResult
+from ..connection import get_database_connection
+
+# Columns the usage rollup can be grouped by
+LLM_CALL_GROUP_COLUMNS = ("operation", "model_name", "prompt_id", "prompt_hash", "attempt", "user_id")
+
+def save_llm_calls(records):
+    """
+    Store LLM call telemetry records
+
+    Args:
+        records: List of dictionaries with the LLMCall columns
+
+    Returns:
+        Number of records stored
+    """
+    if not records:
+        return 0
+
+    db = get_database_connection()
+    if not db:
+        return 0
+
+    session = db["Session"]()
+
+    try:
+        session.add_all([LLMCall(**record) for record in records])
+        session.commit()
+        return len(records)
+    except Exception as e:
+        session.rollback()
+        print(f"Error saving LLM calls: {e}")
+        return 0
+    finally:
+        session.close()
+
+def _filter_dates(query, start_date, end_date):
+    if start_date:
+        query = query.filter(LLMCall.created_at >= datetime.datetime.combine(start_date, datetime.time.min))
+    if end_date:
+        query = query.filter(LLMCall.created_at <= datetime.datetime.combine(end_date, datetime.time.max))
+    return query
+
+def _percentiles(latencies):
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    ordered = sorted(latencies)
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+    return {"p50_ms": percentile(50), "p95_ms": percentile(95), "p99_ms": percentile(99)}
+
+def get_llm_call_rollup(group_by="operation", start_date=None, end_date=None):
+    """
+    Aggregate LLM calls by one of LLM_CALL_GROUP_COLUMNS
+
+    Returns:
+        List of dictionaries with the group key, calls, failures, retries, input/output/cached
+        tokens, cost, mean queue wait and p50/p95/p99 latency, ordered by cost
+    """
+    if group_by not in LLM_CALL_GROUP_COLUMNS:
+        raise ValueError(f"Cannot group LLM calls by '{group_by}'")
+
+    db = get_database_connection()
+    if not db:
+        return []
+
+    session = db["Session"]()
+
+    try:
+        column = getattr(LLMCall, group_by)
+        rows = _filter_dates(session.query(
+            column.label("key"),
+            func.count(LLMCall.id).label("calls"),
+            func.sum(case((LLMCall.success.is_(False), 1), else_=0)).label("failures"),
+            func.coalesce(func.sum(LLMCall.retries), 0).label("retries"),
+            func.coalesce(func.sum(LLMCall.input_tokens), 0).label("input_tokens"),
+            func.coalesce(func.sum(LLMCall.output_tokens), 0).label("output_tokens"),
+            func.coalesce(func.sum(LLMCall.cached_tokens), 0).label("cached_tokens"),
+            func.coalesce(func.sum(LLMCall.cost), 0.0).label("cost"),
+            func.coalesce(func.avg(LLMCall.queue_wait_ms), 0.0).label("queue_wait_ms")
+        ), start_date, end_date).group_by(column).all()
+
+        # Percentiles aren't portable SQL aggregates; compute them from the latencies
+        latencies = {}
+        for key, latency in _filter_dates(session.query(column, LLMCall.latency_ms), start_date, end_date).filter(
+            LLMCall.latency_ms.isnot(None)
+        ).all():
+            latencies.setdefault(key, []).append(latency)
+
+        result = [{
+            group_by: row.key,
+            "calls": row.calls,
+            "failures": int(row.failures or 0),
+            "retries": int(row.retries),
+            "input_tokens": int(row.input_tokens),
+            "output_tokens": int(row.output_tokens),
+            "cached_tokens": int(row.cached_tokens),
+            "cost": float(row.cost),
+            "mean_queue_wait_ms": float(row.queue_wait_ms),
+            **_percentiles(latencies.get(row.key, []))
+        } for row in rows]
+        return sorted(result, key=lambda item: item["cost"], reverse=True)
+    except Exception as e:
+        print(f"Error getting LLM call rollup: {e}")
+        return []
+    finally:
+        session.close()
+
+def get_quiz_llm_usage(start_date=None, end_date=None, limit=100):
+    """
+    Aggregate LLM calls per quiz (quiz_session_id), newest first
+
+    Returns:
+        List of dictionaries with quiz_session_id, user_id, started_at, calls, failures,
+        input/output/cached tokens, cost, total latency and whether the quiz was completed
+    """
+    db = get_database_connection()
+    if not db:
+        return []
+
+    session = db["Session"]()
+
+    try:
+        rows = _filter_dates(session.query(
+            LLMCall.quiz_session_id,
+            func.min(LLMCall.user_id).label("user_id"),
+            func.min(LLMCall.created_at).label("started_at"),
+            func.count(LLMCall.id).label("calls"),
+            func.sum(case((LLMCall.success.is_(False), 1), else_=0)).label("failures"),
+            func.coalesce(func.sum(LLMCall.input_tokens), 0).label("input_tokens"),
+            func.coalesce(func.sum(LLMCall.output_tokens), 0).label("output_tokens"),
+            func.coalesce(func.sum(LLMCall.cached_tokens), 0).label("cached_tokens"),
+            func.coalesce(func.sum(LLMCall.cost), 0.0).label("cost"),
+            func.coalesce(func.sum(LLMCall.latency_ms), 0.0).label("latency_ms")
+        ).filter(LLMCall.quiz_session_id.isnot(None)), start_date, end_date).group_by(
+            LLMCall.quiz_session_id
+        ).order_by(func.min(LLMCall.created_at).desc()).limit(limit).all()
+
+        session_ids = [row.quiz_session_id for row in rows]
+        completed = {row.quiz_session_id for row in session.query(QuizResult.quiz_session_id).filter(
+            QuizResult.quiz_session_id.in_(session_ids)
+        ).all()} if session_ids else set()
+
+        return [{
+            "quiz_session_id": row.quiz_session_id,
+            "user_id": row.user_id,
+            "started_at": row.started_at,
+            "calls": row.calls,
+            "failures": int(row.failures or 0),
+            "input_tokens": int(row.input_tokens),
+            "output_tokens": int(row.output_tokens),
+            "cached_tokens": int(row.cached_tokens),
+            "cost": float(row.cost),
+            "latency_ms": float(row.latency_ms),
+            "completed": row.quiz_session_id in completed
+        } for row in rows]
+    except Exception as e:
+        print(f"Error getting quiz LLM usage: {e}")
+        return []
+    finally:
+        session.close()
@@ -0,0 +1,204 @@
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from ..models import Persona, PersonaEnrichment
+from ..connection import get_database_connection
+
+def create_personas(personas):
+    """
+    Store a new (inactive) set of personas
+
+    Args:
+        personas: List of dictionaries with label, context, proficiency, centroid,
+            profile_count, prompt_hash and statement_length
+
+    Returns:
+        List of the new persona IDs, or None on error
+    """
+    db = get_database_connection()
+    if not db:
+        return None
+
+    session = db["Session"]()
+
+    try:
+        rows = [Persona(is_active=False, **persona) for persona in personas]
+        session.add_all(rows)
+        session.commit()
+        return [row.id for row in rows]
+    except Exception as e:
+        session.rollback()
+        print(f"Error creating personas: {e}")
+        return None
+    finally:
+        session.close()
+
+def save_persona_enrichments(persona_id, enrichments):
+    """
+    Store precomputed enrichments of a persona, replacing earlier ones for the same statements
+
+    Args:
+        enrichments: List of dictionaries with statement_hash, original, enriched and metrics
+
+    Returns:
+        Number of enrichments stored
+    """
+    if not enrichments:
+        return 0
+
+    db = get_database_connection()
+    if not db:
+        return 0
+
+    session = db["Session"]()
+
+    try:
+        statement_hashes = [item["statement_hash"] for item in enrichments]
+        session.query(PersonaEnrichment).filter(
+            PersonaEnrichment.persona_id == persona_id,
+            PersonaEnrichment.statement_hash.in_(statement_hashes)
+        ).delete(synchronize_session=False)
+
+        # Deduplicate repeated statements within the batch
+        unique = {item["statement_hash"]: item for item in enrichments}
+        for item in unique.values():
+            session.add(PersonaEnrichment(
+                persona_id=persona_id,
+                statement_hash=item["statement_hash"],
+                original=item["original"],
+                enriched=item["enriched"],
+                metrics=item.get("metrics")
+            ))
+
+        session.commit()
+        return len(unique)
+    except IntegrityError:
+        session.rollback()
+        return 0
+    except Exception as e:
+        session.rollback()
+        print(f"Error saving persona enrichments: {e}")
+        return 0
+    finally:
+        session.close()
+
+def activate_personas(persona_ids):
+    """Make a finished set of personas active and delete all other personas"""
+    persona_ids = list(persona_ids or [])
+    db = get_database_connection()
+    if not db:
+        return False
+
+    session = db["Session"]()
+
+    try:
+        old_ids = [row.id for row in session.query(Persona.id).filter(Persona.id.notin_(persona_ids)).all()]
+        if old_ids:
+            session.query(PersonaEnrichment).filter(PersonaEnrichment.persona_id.in_(old_ids)).delete(synchronize_session=False)
+            session.query(Persona).filter(Persona.id.in_(old_ids)).delete(synchronize_session=False)
+        if persona_ids:
+            session.query(Persona).filter(Persona.id.in_(persona_ids)).update({Persona.is_active: True}, synchronize_session=False)
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"Error activating personas: {e}")
+        return False
+    finally:
+        session.close()
+
+def delete_personas():
+    """Delete all personas and their enrichments"""
+    return activate_personas([])
+
+def get_personas(prompt_hash=None):
+    """
+    Get the active personas including their centroids
+
+    Args:
+        prompt_hash: Only return personas generated with this prompt
+    """
+    db = get_database_connection()
+    if not db:
+        return []
+
+    session = db["Session"]()
+
+    try:
+        query = session.query(Persona).filter(Persona.is_active.is_(True))
+        if prompt_hash is not None:
+            query = query.filter(Persona.prompt_hash == prompt_hash)
+        return [{
+            "id": persona.id,
+            "label": persona.label,
+            "context": persona.context,
+            "proficiency": persona.proficiency,
+            "centroid": persona.centroid,
+            "profile_count": persona.profile_count,
+            "prompt_hash": persona.prompt_hash,
+            "statement_length": persona.statement_length
+        } for persona in query.order_by(Persona.id).all()]
+    except Exception as e:
+        print(f"Error getting personas: {e}")
+        return []
+    finally:
+        session.close()
+
+def get_persona_summaries():
+    """Get the active personas without centroids, with their enrichment counts"""
+    db = get_database_connection()
+    if not db:
+        return []
+
+    session = db["Session"]()
+
+    try:
+        rows = session.query(
+            Persona.id,
+            Persona.label,
+            Persona.proficiency,
+            Persona.profile_count,
+            Persona.created_at,
+            func.count(PersonaEnrichment.id).label("enrichment_count")
+        ).outerjoin(PersonaEnrichment).filter(Persona.is_active.is_(True)).group_by(Persona.id).order_by(Persona.id).all()
+        return [{
+            "id": row.id,
+            "label": row.label,
+            "proficiency": row.proficiency,
+            "profile_count": row.profile_count,
+            "enrichment_count": row.enrichment_count,
+            "created_at": row.created_at
+        } for row in rows]
+    except Exception as e:
+        print(f"Error getting persona summaries: {e}")
+        return []
+    finally:
+        session.close()
+
+def get_persona_enrichments(persona_id, statement_hashes):
+    """
+    Get precomputed enrichments of a persona
+
+    Returns:
+        Dictionary mapping statement hash to {"enriched", "metrics"}
+    """
+    statement_hashes = list(set(statement_hashes or []))
+    if not statement_hashes:
+        return {}
+
+    db = get_database_connection()
+    if not db:
+        return {}
+
+    session = db["Session"]()
+
+    try:
+        rows = session.query(PersonaEnrichment).filter(
+            PersonaEnrichment.persona_id == persona_id,
+            PersonaEnrichment.statement_hash.in_(statement_hashes)
+        ).all()
+        return {row.statement_hash: {"enriched": row.enriched, "metrics": row.metrics} for row in rows}
+    except Exception as e:
+        print(f"Error getting persona enrichments: {e}")
+        return {}
+    finally:
+        session.close()
@@ -131,6 +131,63 @@ def get_all_prompts():
     finally:
         session.close()
 
+def get_prompt_summaries():
+    """
+    Get a lightweight listing of all prompts without their content
+    
+    Returns:
+        List of dictionaries with prompt id, owner, name and timestamps
+    """
+    db = get_database_connection()
+    if not db:
+        return []
+    
+    session = db["Session"]()
+    try:
+        rows = session.query(
+            Prompt.id,
+            Prompt.user_id,
+            Prompt.name,
+            Prompt.created_at,
+            Prompt.updated_at
+        ).order_by(Prompt.name).all()
+        return [{
+            "id": row.id,
+            "user_id": row.user_id,
+            "name": row.name,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at
+        } for row in rows]
+    except Exception as e:
+        print(f"Error getting prompt summaries: {e}")
+        return []
+    finally:
+        session.close()
+
+def get_prompt_content(prompt_id):
+    """
+    Get the content of a single prompt
+    
+    Args:
+        prompt_id: ID of the prompt
+        
+    Returns:
+        Prompt content or None if not found
+    """
+    db = get_database_connection()
+    if not db:
+        return None
+    
+    session = db["Session"]()
+    try:
+        row = session.query(Prompt.content).filter_by(id=prompt_id).first()
+        return row.content if row else None
+    except Exception as e:
+        print(f"Error getting prompt content: {e}")
+        return None
+    finally:
+        session.close()
+
 def get_user_prompt_count(user_id):
     """
     Get the count of prompts for a specific user
@@ -6,7 +6,8 @@ from ..models import QuizResult
 from ..connection import get_database_connection
 from services.db.crud._settings import get_competency_questions_enabled
 
-def save_quiz_results(user_id, original_score, enriched_score, neither_score, detailed_results, competency_results=None, is_final=False):
+def save_quiz_results(user_id, original_score, enriched_score, neither_score, detailed_results, competency_results=None, is_final=False,
+                      framework_id=None, framework_version=None, quiz_session_id=None):
     """
     Save quiz results to the database
     
@@ -18,6 +19,9 @@ def save_quiz_results(user_id, original_score, enriched_score, neither_score, de
     - detailed_results: Detailed breakdown of results
     - competency_results: Results of competency assessment
     - is_final: Flag indicating if this is the final submission for this quiz attempt
+    - framework_id: ID of the framework the statements came from (None for built-in statements)
+    - framework_version: Version of that framework the quiz was taken against
+    - quiz_session_id: ID under which the quiz's LLM calls were recorded
     
     Returns:
     - True if successful, False otherwise
@@ -57,6 +61,9 @@ def save_quiz_results(user_id, original_score, enriched_score, neither_score, de
             neither_preference=neither_score,
             detailed_results=detailed_results,
             competency_results=competency_results or [],  # Make sure competency_results is a list, even if None
+            framework_id=framework_id,
+            framework_version=framework_version,
+            quiz_session_id=quiz_session_id,
             created_at=current_datetime,
             updated_at=current_datetime
         )
@@ -113,6 +120,9 @@ def get_quiz_results_all_users():
             "neither": result.neither_preference,
             "detailed_results": result.detailed_results,
             "competency_results": result.competency_results,
+            "framework_id": result.framework_id,
+            "framework_version": result.framework_version,
+            "quiz_session_id": result.quiz_session_id,
             "created_at": result.created_at,
             "updated_at": result.updated_at
         } for result in quiz_results]
@@ -138,6 +148,9 @@ def get_quiz_results_list(user_id):
             "neither": result.neither_preference,
             "detailed_results": result.detailed_results,
             "competency_results": result.competency_results,
+            "framework_id": result.framework_id,
+            "framework_version": result.framework_version,
+            "quiz_session_id": result.quiz_session_id,
             "created_at": result.created_at,
             "updated_at": result.updated_at
         } for result in quiz_results]
@@ -205,6 +218,9 @@ def get_quiz_results_by_date_range(start_date=None, end_date=None):
             "neither": result.neither_preference,
             "detailed_results": result.detailed_results,
             "competency_results": result.competency_results,
+            "framework_id": result.framework_id,
+            "framework_version": result.framework_version,
+            "quiz_session_id": result.quiz_session_id,
             "created_at": result.created_at,
             "updated_at": result.updated_at
         } for result in quiz_results]
@@ -74,8 +74,38 @@ def get_global_settings(key="user_settings"):
                 "custom_statements": [],
                 "evaluation_enabled": True,
                 "evaluation_max_attempts": 5,
+                "speculative_candidates": 1,
+                "speculative_rounds": 0,
+                "self_assessment_enabled": False,
+                "self_assessment_calibration_rate": 0.1,
+                "prefilter_enabled": False,
+                "prefilter_min_similarity": 0.7,
+                "learned_evaluator_mode": "off",
+                "learned_min_probability": 0.5,
+                "adaptive_attempts_enabled": False,
+                "adaptive_min_improvement_probability": 0.1,
+                "adaptive_min_observations": 20,
+                "model_routing_enabled": False,
+                "model_routing_tiers": {"enrich": "small", "evaluate": "small", "chat": "small", "profile_eval": "small"},
+                "model_routing_escalate_after": 1,
+                "llm_rate_limits": {},
                 "selected_prompt_id": 0,
-                "competency_questions_enabled": True
+                "competency_questions_enabled": True,
+                "generation_max_concurrency": 8,
+                "generation_timeout_seconds": 120,
+                "multi_statement_chunk_size": 1,
+                "progressive_generation_enabled": False,
+                "quiz_page_size": 5,
+                "quiz_prefetch_window": 10,
+                "enrichment_cache_enabled": True,
+                "enrichment_cache_ttl_days": 30,
+                "enrichment_cache_max_entries": 20000,
+                "enrichment_cache_variants": 1,
+                "semantic_cache_enabled": False,
+                "semantic_cache_threshold": 0.95,
+                "persona_serving_enabled": False,
+                "persona_min_similarity": 0.85,
+                "persona_refinement_enabled": True
             }
             
             # Create settings if they don't exist
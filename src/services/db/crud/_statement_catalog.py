@@ -0,0 +1,122 @@
+import hashlib
+from sqlalchemy.exc import IntegrityError
+from ..models import StatementCatalog
+from ..connection import get_database_connection
+
+# Number of hex characters kept from the SHA-256 digest (64 bits)
+STATEMENT_HASH_LENGTH = 16
+
+def normalize_statement_text(text):
+    """Normalize statement text so that whitespace differences don't change its hash"""
+    return " ".join((text or "").split())
+
+def compute_statement_hash(text):
+    """Compute the stable content hash used to identify a statement"""
+    normalized = normalize_statement_text(text)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:STATEMENT_HASH_LENGTH]
+
+def get_structure_statements(structure):
+    """Returns all statement texts from a framework structure"""
+    statements = []
+    for category in (structure or {}).values():
+        for subcategory in category.values():
+            statements.extend(subcategory)
+    return statements
+
+def _register_statements(session, statements):
+    """Add missing statements to the catalog within an existing session"""
+    hashes = {}
+    for statement in statements:
+        if statement:
+            hashes.setdefault(compute_statement_hash(statement), normalize_statement_text(statement))
+
+    if not hashes:
+        return {}
+
+    existing = {
+        row.statement_hash for row in
+        session.query(StatementCatalog.statement_hash).filter(StatementCatalog.statement_hash.in_(list(hashes))).all()
+    }
+
+    for statement_hash, text in hashes.items():
+        if statement_hash not in existing:
+            session.add(StatementCatalog(statement_hash=statement_hash, text=text))
+
+    return hashes
+
+def register_statements(statements):
+    """
+    Register statements in the global catalog
+
+    Args:
+        statements: Iterable of statement texts
+
+    Returns:
+        Dictionary mapping each statement text to its hash
+    """
+    statements = [s for s in statements if s]
+    result = {statement: compute_statement_hash(statement) for statement in statements}
+
+    db = get_database_connection()
+    if not db:
+        return result
+
+    session = db["Session"]()
+    try:
+        _register_statements(session, statements)
+        session.commit()
+    except IntegrityError:
+        # Another session registered the same statement concurrently
+        session.rollback()
+    except Exception as e:
+        session.rollback()
+        print(f"Error registering statements: {e}")
+    finally:
+        session.close()
+
+    return result
+
+def get_statement_by_hash(statement_hash):
+    """Get a catalog statement by its hash"""
+    db = get_database_connection()
+    if not db:
+        return None
+
+    session = db["Session"]()
+    try:
+        entry = session.query(StatementCatalog).filter_by(statement_hash=statement_hash).first()
+        if entry:
+            return {
+                "id": entry.id,
+                "statement_hash": entry.statement_hash,
+                "text": entry.text,
+                "created_at": entry.created_at
+            }
+        return None
+    except Exception as e:
+        print(f"Error getting statement by hash: {e}")
+        return None
+    finally:
+        session.close()
+
+def get_statements_by_hashes(statement_hashes):
+    """Get catalog texts for a list of hashes as a {hash: text} dictionary"""
+    statement_hashes = list(set(statement_hashes or []))
+    if not statement_hashes:
+        return {}
+
+    db = get_database_connection()
+    if not db:
+        return {}
+
+    session = db["Session"]()
+    try:
+        rows = session.query(StatementCatalog.statement_hash, StatementCatalog.text).filter(
+            StatementCatalog.statement_hash.in_(statement_hashes)
+        ).all()
+        return {row.statement_hash: row.text for row in rows}
+    except Exception as e:
+        print(f"Error getting statements by hashes: {e}")
+        return {}
+    finally:
+        session.close()
@@ -0,0 +1,73 @@
+from ..models import StatementPreference
+from ..connection import get_database_connection
+
+def save_statement_preference(user_id, quiz_session_id, statement_hash, original, enriched, metrics, criteria, score):
+    """
+    Store the user's rating of one statement pair
+
+    Args:
+        criteria: Dictionary of criterion -> -2..2, positive when the enriched statement is preferred
+        score: Mean of the criteria
+
+    Returns:
+        True if stored, False otherwise
+    """
+    db = get_database_connection()
+    if not db:
+        return False
+
+    session = db["Session"]()
+
+    try:
+        session.add(StatementPreference(
+            user_id=user_id,
+            quiz_session_id=quiz_session_id,
+            statement_hash=statement_hash,
+            original=original,
+            enriched=enriched,
+            metrics=metrics,
+            criteria=criteria,
+            score=score
+        ))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"Error saving statement preference: {e}")
+        return False
+    finally:
+        session.close()
+
+def get_statement_preferences(limit=None):
+    """
+    Get rated statement pairs, newest first
+
+    Returns:
+        List of dictionaries with original, enriched, metrics, criteria, score and created_at
+    """
+    db = get_database_connection()
+    if not db:
+        return []
+
+    session = db["Session"]()
+
+    try:
+        query = session.query(StatementPreference).order_by(StatementPreference.created_at.desc())
+        if limit:
+            query = query.limit(limit)
+        return [{
+            "id": row.id,
+            "user_id": row.user_id,
+            "statement_hash": row.statement_hash,
+            "original": row.original,
+            "enriched": row.enriched,
+            "metrics": row.metrics,
+            "criteria": row.criteria,
+            "score": row.score,
+            "created_at": row.created_at
+        } for row in query.all()]
+    except Exception as e:
+        print(f"Error getting statement preferences: {e}")
+        return []
+    finally:
+        session.close()
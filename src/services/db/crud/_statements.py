@@ -3,7 +3,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from ..models import Statement
 from ..connection import get_database_connection
-from services.statement_service import get_category_for_statement, get_active_framework
+from ._statement_catalog import _register_statements, compute_statement_hash
+from services.statement_service import get_category_for_statement, get_active_framework, build_statement_index
 
 def save_statement(user_id, original_text, enriched_text, metrics):
     """Save a statement to the database"""
@@ -18,9 +19,11 @@ def save_statement(user_id, original_text, enriched_text, metrics):
             user_id=user_id,
             original=original_text,
             enriched=enriched_text,
+            statement_hash=compute_statement_hash(original_text),
             metrics=metrics
         )
         session.add(statement)
+        _register_statements(session, [original_text])
         session.commit()
         return statement.id
     except Exception as e:
@@ -40,15 +43,16 @@ def get_statements(user_id):
         statements = session.query(Statement).filter_by(user_id=user_id).all()
         result = []
         
-        # Get active framework for category assignment
-        active_framework = get_active_framework()
+        # Index the active framework once for category assignment
+        statement_index = build_statement_index(get_active_framework())
         
         for stmt in statements:
             # Get category and subcategory for each statement using active framework
-            category, subcategory = get_category_for_statement(stmt.original, active_framework)
+            category, subcategory = get_category_for_statement(stmt.original, statement_index=statement_index)
             
             result.append({
                 "id": stmt.id,
+                "statement_hash": stmt.statement_hash or compute_statement_hash(stmt.original),
                 "original": stmt.original,
                 "enriched": stmt.enriched,
                 "metrics": stmt.metrics,
@@ -74,14 +78,15 @@ def get_user_statements(user_id):
         statements = session.query(Statement).filter_by(user_id=user_id).all()
         result = []
         
-        # Get active framework for category assignment
-        active_framework = get_active_framework()
+        # Index the active framework once for category assignment
+        statement_index = build_statement_index(get_active_framework())
         
         for stmt in statements:
             # Get category and subcategory for each statement using active framework
-            category, subcategory = get_category_for_statement(stmt.original, active_framework)
+            category, subcategory = get_category_for_statement(stmt.original, statement_index=statement_index)
             
             result.append({
+                "statement_hash": stmt.statement_hash or compute_statement_hash(stmt.original),
                 "original": stmt.original,
                 "enriched": stmt.enriched,
                 "metrics": stmt.metrics,
@@ -1,9 +1,62 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
-from .models import Base, User, GlobalSettings, Framework
+from .models import Base, User, GlobalSettings, Framework, FrameworkCategory, Statement
 import datetime
 from .connection import get_database_connection
+from .crud._statement_catalog import _register_statements, get_structure_statements, compute_statement_hash
+from .crud._framework_items import _sync_framework_items
+from .crud._framework_versions import _record_framework_version
+
+# Columns added to existing tables after their first release.
+# create_all() only creates missing tables, so existing databases get them here.
+SCHEMA_UPDATES = [
+    ("statements", "statement_hash", "VARCHAR(16)"),
+    ("frameworks", "statement_count", "INTEGER DEFAULT 0"),
+    ("frameworks", "current_version", "INTEGER DEFAULT 0"),
+    ("quiz_results", "framework_id", "INTEGER"),
+    ("quiz_results", "framework_version", "INTEGER"),
+    ("enrichment_cache", "semantic_key", "VARCHAR(64)"),
+    ("enrichment_cache", "context_hash", "VARCHAR(64)"),
+    ("quiz_results", "quiz_session_id", "VARCHAR(36)"),
+    ("llm_calls", "queue_wait_ms", "FLOAT DEFAULT 0"),
+    ("attempt_outcomes", "explored", "BOOLEAN DEFAULT FALSE"),
+]
+
+def apply_schema_updates(engine):
+    """Add columns introduced after the initial schema to existing tables"""
+    inspector = inspect(engine)
+    table_names = inspector.get_table_names()
+    
+    with engine.begin() as connection:
+        for table_name, column_name, column_type in SCHEMA_UPDATES:
+            if table_name not in table_names:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table_name)}
+            if column_name not in existing_columns:
+                connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+                print(f"DEBUG: Added column {table_name}.{column_name}")
+
+def backfill_statement_catalog(session):
+    """Register framework statements, fill precomputed counts, normalized rows and initial versions, and hash statements created before the catalog existed"""
+    for framework in session.query(Framework).all():
+        framework_statements = get_structure_statements(framework.structure)
+        _register_statements(session, framework_statements)
+        # Frameworks saved before statement counts were precomputed
+        if not framework.statement_count:
+            framework.statement_count = len(framework_statements)
+        # Frameworks saved before the normalized tables existed
+        if not session.query(FrameworkCategory.id).filter_by(framework_id=framework.id).first():
+            _sync_framework_items(session, framework)
+        # Frameworks saved before version history existed
+        if not framework.current_version:
+            _record_framework_version(session, framework)
+    
+    for statement in session.query(Statement).filter(Statement.statement_hash.is_(None)).all():
+        statement.statement_hash = compute_statement_hash(statement.original)
+        _register_statements(session, [statement.original])
+    
+    session.commit()
 
 def init_db():
     """Initialize database tables and default data"""
@@ -16,6 +69,7 @@ def init_db():
     try:
         # Create all tables
         Base.metadata.create_all(engine)
+        apply_schema_updates(engine)
         
         # Create session
         Session = db["Session"]
@@ -159,6 +213,8 @@ def init_db():
             session.add(digcomp_framework)
             session.commit()
             print("DEBUG: Created default DigiComp framework")
+        
+        backfill_statement_catalog(session)
             
         session.close()
         return True
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, JSON, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, JSON, DateTime, Text, Boolean, ForeignKey, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import datetime
@@ -59,12 +59,21 @@ class Statement(Base):
     user_id = Column(Integer, ForeignKey('users.id'))
     original = Column(Text, nullable=False)
     enriched = Column(Text, nullable=False)
+    statement_hash = Column(String(16), index=True)  # Catalog hash of the original statement
     metrics = Column(JSON)
     created_at = Column(DateTime, default=utc_now)
     
     # Relationship
     user = relationship("User", back_populates="statements")
 
+class StatementCatalog(Base):
+    __tablename__ = 'statement_catalog'
+    
+    id = Column(Integer, primary_key=True)
+    statement_hash = Column(String(16), unique=True, nullable=False, index=True)  # Content hash of the normalized text
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=utc_now)
+
 class QuizResult(Base):
     __tablename__ = 'quiz_results'
     
@@ -75,6 +84,10 @@ class QuizResult(Base):
     neither_preference = Column(Integer, default=0)
     detailed_results = Column(JSON, default={})
     competency_results = Column(JSON, default=[])
+    # Framework version the quiz was taken against (no FK so results outlive deleted frameworks)
+    framework_id = Column(Integer, index=True)
+    framework_version = Column(Integer)
+    quiz_session_id = Column(String(36), index=True)  # Links the quiz to its llm_calls
     created_at = Column(DateTime, default=utc_now)
     updated_at = Column(DateTime, default=utc_now)
     
@@ -135,6 +148,8 @@ class Framework(Base):
     name = Column(String(100), nullable=False)
     description = Column(Text)
     structure = Column(JSON, nullable=False)  # JSON field to store the framework structure
+    statement_count = Column(Integer, default=0)  # Precomputed at save time for lightweight listings
+    current_version = Column(Integer, default=0)  # Latest FrameworkVersion.version
     is_default = Column(Boolean, default=False)  # Flag for built-in frameworks
     created_by = Column(Integer, ForeignKey('users.id'))  # Optional: track who created it
     created_at = Column(DateTime, default=utc_now)
@@ -142,6 +157,67 @@ class Framework(Base):
     
     # Relationship
     creator = relationship("User")
+    categories = relationship("FrameworkCategory", back_populates="framework", cascade="all, delete-orphan",
+                              order_by="FrameworkCategory.position")
+    versions = relationship("FrameworkVersion", back_populates="framework", cascade="all, delete-orphan",
+                            order_by="FrameworkVersion.version")
+
+# Immutable snapshot of a framework structure, written whenever the structure changes
+class FrameworkVersion(Base):
+    __tablename__ = 'framework_versions'
+    __table_args__ = (UniqueConstraint('framework_id', 'version', name='uq_framework_version'),)
+    
+    id = Column(Integer, primary_key=True)
+    framework_id = Column(Integer, ForeignKey('frameworks.id'), nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    structure = Column(JSON, nullable=False)
+    statement_count = Column(Integer, default=0)
+    created_by = Column(Integer, ForeignKey('users.id'))
+    created_at = Column(DateTime, default=utc_now)
+    
+    # Relationship
+    framework = relationship("Framework", back_populates="versions")
+
+# Normalized framework storage; Framework.structure is kept as a materialized JSON view
+class FrameworkCategory(Base):
+    __tablename__ = 'framework_categories'
+    
+    id = Column(Integer, primary_key=True)
+    framework_id = Column(Integer, ForeignKey('frameworks.id'), nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    position = Column(Integer, nullable=False, default=0)
+    
+    # Relationships
+    framework = relationship("Framework", back_populates="categories")
+    subcategories = relationship("FrameworkSubcategory", back_populates="category", cascade="all, delete-orphan",
+                                 order_by="FrameworkSubcategory.position")
+
+class FrameworkSubcategory(Base):
+    __tablename__ = 'framework_subcategories'
+    
+    id = Column(Integer, primary_key=True)
+    framework_id = Column(Integer, ForeignKey('frameworks.id'), nullable=False, index=True)
+    category_id = Column(Integer, ForeignKey('framework_categories.id'), nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    position = Column(Integer, nullable=False, default=0)
+    
+    # Relationships
+    category = relationship("FrameworkCategory", back_populates="subcategories")
+    statements = relationship("FrameworkStatement", back_populates="subcategory", cascade="all, delete-orphan",
+                              order_by="FrameworkStatement.position")
+
+class FrameworkStatement(Base):
+    __tablename__ = 'framework_statements'
+    
+    id = Column(Integer, primary_key=True)
+    framework_id = Column(Integer, ForeignKey('frameworks.id'), nullable=False, index=True)
+    subcategory_id = Column(Integer, ForeignKey('framework_subcategories.id'), nullable=False, index=True)
+    statement_hash = Column(String(16), nullable=False, index=True)  # References statement_catalog.statement_hash
+    text = Column(Text, nullable=False)
+    position = Column(Integer, nullable=False, default=0)
+    
+    # Relationship
+    subcategory = relationship("FrameworkSubcategory", back_populates="statements")
 
 class PromptHistory(Base):
     __tablename__ = 'prompt_history'
@@ -159,4 +235,152 @@ class PromptHistory(Base):
     created_at = Column(DateTime, default=utc_now)
     
     # Relationship
-    user = relationship("User") 
\ No newline at end of file
+    user = relationship("User") 
+# Content-addressed cache of generated enrichments, keyed by a hash of every generation input
+class EnrichmentCache(Base):
+    __tablename__ = 'enrichment_cache'
+    __table_args__ = (UniqueConstraint('cache_key', 'variant', name='uq_enrichment_cache_variant'),)
+    
+    id = Column(Integer, primary_key=True)
+    cache_key = Column(String(64), nullable=False, index=True)
+    variant = Column(Integer, nullable=False, default=0)  # Several variants per key keep sampling diversity
+    semantic_key = Column(String(64), index=True)  # Same inputs except the profile context
+    context_hash = Column(String(64), index=True)  # References enrichment_contexts.context_hash
+    statement_hash = Column(String(16), nullable=False, index=True)
+    prompt_hash = Column(String(16), nullable=False, index=True)
+    original = Column(Text, nullable=False)
+    enriched = Column(Text, nullable=False)
+    metrics = Column(JSON)
+    model_name = Column(String(100))
+    temperature = Column(Float)
+    statement_length = Column(Integer)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=utc_now)
+    last_accessed_at = Column(DateTime, default=utc_now, index=True)
+    expires_at = Column(DateTime, index=True)  # None means no expiry
+
+# Profile contexts seen by the enrichment cache with their embeddings, for semantic lookups
+class EnrichmentContext(Base):
+    __tablename__ = 'enrichment_contexts'
+    
+    id = Column(Integer, primary_key=True)
+    context_hash = Column(String(64), unique=True, nullable=False, index=True)
+    context = Column(Text, nullable=False)
+    embedding = Column(JSON)  # List of floats from the embedding model
+    created_at = Column(DateTime, default=utc_now)
+
+# Profile clusters with enrichments precomputed offline for instant quiz starts
+class Persona(Base):
+    __tablename__ = 'personas'
+    
+    id = Column(Integer, primary_key=True)
+    label = Column(String(200))
+    context = Column(Text, nullable=False)  # Context of the profile closest to the cluster centre
+    proficiency = Column(String(50))
+    centroid = Column(JSON, nullable=False)  # Cluster centre in context embedding space
+    profile_count = Column(Integer, default=0)
+    prompt_hash = Column(String(16), index=True)  # Prompt the enrichments were generated with
+    statement_length = Column(Integer)
+    is_active = Column(Boolean, default=False)  # Set once all enrichments of a build are stored
+    created_at = Column(DateTime, default=utc_now)
+    
+    # Relationship
+    enrichments = relationship("PersonaEnrichment", back_populates="persona", cascade="all, delete-orphan")
+
+class PersonaEnrichment(Base):
+    __tablename__ = 'persona_enrichments'
+    __table_args__ = (UniqueConstraint('persona_id', 'statement_hash', name='uq_persona_statement'),)
+    
+    id = Column(Integer, primary_key=True)
+    persona_id = Column(Integer, ForeignKey('personas.id'), nullable=False, index=True)
+    statement_hash = Column(String(16), nullable=False)
+    original = Column(Text, nullable=False)
+    enriched = Column(Text, nullable=False)
+    metrics = Column(JSON)
+    created_at = Column(DateTime, default=utc_now)
+    
+    # Relationship
+    persona = relationship("Persona", back_populates="enrichments")
+
+# Telemetry of every chat model call
+class LLMCall(Base):
+    __tablename__ = 'llm_calls'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
+    quiz_session_id = Column(String(36), index=True)  # Matches quiz_results.quiz_session_id
+    operation = Column(String(50), index=True)  # e.g. enrichment, evaluation, chat, profile_evaluation
+    prompt_id = Column(Integer)
+    prompt_hash = Column(String(16))
+    model_name = Column(String(100))
+    attempt = Column(Integer)
+    input_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    cached_tokens = Column(Integer, default=0)
+    latency_ms = Column(Float)  # Includes queue_wait_ms
+    queue_wait_ms = Column(Float, default=0.0)  # Time spent waiting for the LLM scheduler
+    retries = Column(Integer, default=0)
+    success = Column(Boolean, default=True)
+    error = Column(Text)
+    cost = Column(Float)  # Estimated USD
+    created_at = Column(DateTime, default=utc_now, index=True)
+
+# LLM evaluations of (original, enriched) statement pairs, keyed by a hash that includes the rubric version
+class EvaluationCache(Base):
+    __tablename__ = 'evaluation_cache'
+    
+    id = Column(Integer, primary_key=True)
+    eval_key = Column(String(64), nullable=False, unique=True, index=True)
+    rubric_version = Column(Integer, nullable=False, index=True)
+    model_name = Column(String(100))
+    scores = Column(JSON, nullable=False)
+    explanation = Column(Text)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=utc_now)
+
+# One rated (original, enriched) pair from a quiz; training data for the learned evaluator
+class StatementPreference(Base):
+    __tablename__ = 'statement_preferences'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
+    quiz_session_id = Column(String(36), index=True)
+    statement_hash = Column(String(16), index=True)
+    original = Column(Text, nullable=False)
+    enriched = Column(Text, nullable=False)
+    metrics = Column(JSON)
+    criteria = Column(JSON)  # Criterion -> -2..2, positive when the enriched statement is preferred
+    score = Column(Float)  # Mean of the criteria
+    created_at = Column(DateTime, default=utc_now, index=True)
+
+# Fitted learned evaluators; the parameters are plain numbers so no pickles are stored
+class LearnedEvaluator(Base):
+    __tablename__ = 'learned_evaluators'
+    
+    id = Column(Integer, primary_key=True)
+    feature_names = Column(JSON, nullable=False)
+    parameters = Column(JSON, nullable=False)  # Scaler mean/scale, coefficients and intercept
+    report = Column(JSON)  # Held-out accuracy and calibration
+    sample_count = Column(Integer, default=0)
+    is_active = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=utc_now)
+
+# One attempt of a regenerate_until_threshold run; the basis of the adaptive attempt budget
+class AttemptOutcome(Base):
+    __tablename__ = 'attempt_outcomes'
+    
+    id = Column(Integer, primary_key=True)
+    run_id = Column(String(36), index=True)  # Groups the attempts of one run
+    prompt_hash = Column(String(16), index=True)
+    proficiency = Column(String(50), index=True)
+    statement_hash = Column(String(16), index=True)
+    attempt = Column(Integer, nullable=False)  # Attempt number within the run
+    score_sum = Column(Float)
+    improved = Column(Boolean, default=False)  # Beat the best score_sum of the earlier attempts
+    passed = Column(Boolean, default=False)
+    # Run-level fields, repeated on every attempt of the run
+    max_attempts = Column(Integer)
+    adaptive = Column(Boolean, default=False)
+    stopped_early = Column(Boolean, default=False)
+    explored = Column(Boolean, default=False)  # Ran past a stop decision to keep the statistics unbiased
+    created_at = Column(DateTime, default=utc_now, index=True)
@@ -0,0 +1,382 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.ai_service import get_embedding_model
+from services.db.crud._enrichment_cache import (
+    get_enrichment_cache_entries, touch_enrichment_cache_entries, save_enrichment_cache_entries,
+    evict_enrichment_cache, delete_enrichment_cache_entries, clear_enrichment_cache, get_enrichment_cache_summary,
+    save_enrichment_context, get_semantic_cache_candidates
+)
+from services.db.crud._framework_items import get_framework_statement_hashes
+from services.db.crud._statement_catalog import compute_statement_hash
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Bump when the key composition changes so old entries stop matching
+CACHE_KEY_VERSION = 2
+
+# Defaults for the enrichment_cache_* global settings
+DEFAULT_CACHE_ENABLED = True
+DEFAULT_CACHE_TTL_DAYS = 30
+DEFAULT_CACHE_MAX_ENTRIES = 20000
+DEFAULT_CACHE_VARIANTS = 1
+DEFAULT_SEMANTIC_CACHE_ENABLED = False
+DEFAULT_SEMANTIC_THRESHOLD = 0.95
+
+# Seconds before the in-process semantic index reloads a key from the database
+SEMANTIC_INDEX_REFRESH_SECONDS = 300
+
+# Counters since process start
+_stats = {"hits": 0, "misses": 0, "semantic_hits": 0, "semantic_misses": 0, "stores": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+def get_cache_settings(global_settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Returns the enrichment cache settings from global settings
+
+    Returns:
+        Dictionary with enabled, ttl_days, max_entries, variants, semantic_enabled and semantic_threshold
+    """
+    global_settings = global_settings or {}
+    return {
+        "enabled": bool(global_settings.get("enrichment_cache_enabled", DEFAULT_CACHE_ENABLED)),
+        "ttl_days": int(global_settings.get("enrichment_cache_ttl_days", DEFAULT_CACHE_TTL_DAYS)),
+        "max_entries": int(global_settings.get("enrichment_cache_max_entries", DEFAULT_CACHE_MAX_ENTRIES)),
+        "variants": max(1, int(global_settings.get("enrichment_cache_variants", DEFAULT_CACHE_VARIANTS))),
+        "semantic_enabled": bool(global_settings.get("semantic_cache_enabled", DEFAULT_SEMANTIC_CACHE_ENABLED)),
+        "semantic_threshold": min(1.0, max(0.0, float(global_settings.get("semantic_cache_threshold", DEFAULT_SEMANTIC_THRESHOLD))))
+    }
+
+def compute_prompt_hash(prompt_template: str) -> str:
+    """Hash identifying a prompt template in the cache"""
+    return hashlib.sha256((prompt_template or "").encode("utf-8")).hexdigest()[:16]
+
+def normalize_context(context: str) -> str:
+    """Normalize a profile context so that whitespace and case differences still match"""
+    return " ".join((context or "").split()).lower()
+
+def compute_context_hash(context: str) -> str:
+    """Hash identifying a normalized profile context"""
+    return hashlib.sha256(normalize_context(context).encode("utf-8")).hexdigest()
+
+def build_semantic_cache_key(
+    prompt_template: str,
+    statement: str,
+    statement_length: int,
+    model_name: str,
+    temperature: float,
+    evaluation_settings: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Builds the key shared by enrichments that differ only in their profile context
+
+    Semantic lookups only compare contexts of entries with the same key.
+    """
+    payload = json.dumps({
+        "version": CACHE_KEY_VERSION,
+        "prompt": compute_prompt_hash(prompt_template),
+        "statement": compute_statement_hash(statement),
+        "length": statement_length,
+        "model": model_name,
+        "temperature": temperature,
+        "evaluation": evaluation_settings or {}
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def build_enrichment_cache_key(
+    prompt_template: str,
+    context: str,
+    statement: str,
+    statement_length: int,
+    model_name: str,
+    temperature: float,
+    evaluation_settings: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Builds the content-addressed key of an enrichment
+
+    Every input that can change the generated text is part of the key.
+    """
+    semantic_key = build_semantic_cache_key(
+        prompt_template, statement, statement_length, model_name, temperature, evaluation_settings
+    )
+    return combine_cache_key(semantic_key, context)
+
+def combine_cache_key(semantic_key: str, context: str) -> str:
+    """Builds the exact cache key from a semantic key and the profile context"""
+    return hashlib.sha256(f"{semantic_key}:{compute_context_hash(context)}".encode("utf-8")).hexdigest()
+
+def lookup_enrichments(cache_keys: List[str], variants: int = DEFAULT_CACHE_VARIANTS) -> Dict[str, Dict[str, Any]]:
+    """
+    Looks up cached enrichments
+
+    A key only counts as a hit once it has the configured number of variants;
+    until then new generations are added to keep sampling diversity. With several
+    variants one is picked at random.
+
+    Args:
+        cache_keys: Keys built with build_enrichment_cache_key
+        variants: Number of variants to collect per key
+
+    Returns:
+        Dictionary mapping each hit key to {"enriched", "metrics"}
+    """
+    unique_keys = list(dict.fromkeys(cache_keys))
+    entries = get_enrichment_cache_entries(unique_keys)
+
+    hits = {}
+    touched = []
+    for key in unique_keys:
+        key_entries = entries.get(key, [])
+        if len(key_entries) >= variants:
+            entry = random.choice(key_entries)
+            hits[key] = {"enriched": entry["enriched"], "metrics": entry["metrics"]}
+            touched.append(entry["id"])
+
+    touch_enrichment_cache_entries(touched)
+    _count("hits", sum(1 for key in cache_keys if key in hits))
+    _count("misses", sum(1 for key in cache_keys if key not in hits))
+    return hits
+
+class SemanticContextIndex:
+    """
+    In-process index of cached profile context embeddings
+
+    Entries are grouped by semantic key and loaded lazily from the database, which
+    acts as the persisted vector store. Context vectors are normalized once and shared
+    between all keys that were generated for the same context.
+    """
+
+    def __init__(self, refresh_seconds: float = SEMANTIC_INDEX_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._keys: Dict[str, Dict[str, Any]] = {}
+
+    def _load(self, semantic_keys: List[str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            stale = [key for key in semantic_keys
+                     if key not in self._keys or now - self._keys[key]["loaded_at"] > self.refresh_seconds]
+        if not stale:
+            return
+
+        entries, embeddings = get_semantic_cache_candidates(stale)
+        with self._lock:
+            for context_hash, embedding in embeddings.items():
+                if context_hash not in self._vectors:
+                    self._vectors[context_hash] = _normalize_vector(embedding)
+            for key in stale:
+                self._keys[key] = {"loaded_at": now, "entries": []}
+            for entry in entries:
+                self._keys[entry["semantic_key"]]["entries"].append(entry)
+
+    def search(
+        self,
+        semantic_keys: List[str],
+        query_embedding: List[float],
+        threshold: float
+    ) -> Dict[str, Tuple[float, Dict[str, Any]]]:
+        """
+        Finds the most similar cached context for each semantic key
+
+        Returns:
+            Dictionary mapping each matched key to (similarity, entry)
+        """
+        semantic_keys = list(dict.fromkeys(semantic_keys))
+        self._load(semantic_keys)
+        query = _normalize_vector(query_embedding)
+
+        matches = {}
+        with self._lock:
+            for key in semantic_keys:
+                # Vectors from a different embedding model can't be compared
+                entries = [entry for entry in self._keys.get(key, {}).get("entries", [])
+                           if self._vectors[entry["context_hash"]].shape == query.shape]
+                if not entries:
+                    continue
+                matrix = np.stack([self._vectors[entry["context_hash"]] for entry in entries])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= threshold:
+                    matches[key] = (float(similarities[best]), entries[best])
+        return matches
+
+    def add(self, context_hash: str, embedding: List[float], entries: List[Dict[str, Any]]) -> None:
+        """Adds freshly stored entries of keys that are already loaded"""
+        with self._lock:
+            if context_hash not in self._vectors:
+                self._vectors[context_hash] = _normalize_vector(embedding)
+            for entry in entries:
+                if entry["semantic_key"] in self._keys:
+                    self._keys[entry["semantic_key"]]["entries"].append(entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors.clear()
+            self._keys.clear()
+
+def _normalize_vector(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+_semantic_index = SemanticContextIndex()
+
+def embed_context(context: str) -> Optional[List[float]]:
+    """
+    Embeds a profile context for semantic lookups
+
+    Returns:
+        The embedding, or None if the embedding model is unavailable
+    """
+    try:
+        return get_embedding_model().embed_query(" ".join((context or "").split()))
+    except Exception as e:
+        logger.error(f"Error embedding profile context: {str(e)}")
+        return None
+
+def lookup_semantic_enrichments(
+    semantic_keys: List[str],
+    context_embedding: List[float],
+    threshold: float = DEFAULT_SEMANTIC_THRESHOLD
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Looks up enrichments generated for a similar profile context
+
+    Args:
+        semantic_keys: Keys built with build_semantic_cache_key
+        context_embedding: Embedding of the current profile context
+        threshold: Minimum cosine similarity between the contexts
+
+    Returns:
+        Dictionary mapping each hit key to {"enriched", "metrics", "similarity"}
+    """
+    matches = _semantic_index.search(semantic_keys, context_embedding, threshold)
+    hits = {
+        key: {"enriched": entry["enriched"], "metrics": entry["metrics"], "similarity": similarity}
+        for key, (similarity, entry) in matches.items()
+    }
+
+    touch_enrichment_cache_entries([entry["id"] for _, entry in matches.values() if entry["id"] is not None])
+    _count("semantic_hits", sum(1 for key in semantic_keys if key in hits))
+    _count("semantic_misses", sum(1 for key in semantic_keys if key not in hits))
+    return hits
+
+def store_enrichments(
+    items: List[Dict[str, Any]],
+    prompt_template: str,
+    model_name: str,
+    temperature: float,
+    statement_length: int,
+    cache_settings: Dict[str, Any],
+    context: Optional[str] = None,
+    context_embedding: Optional[List[float]] = None
+) -> int:
+    """
+    Stores generated enrichments and applies TTL/LRU eviction
+
+    Args:
+        items: Dictionaries with cache_key, original, enriched and metrics, and optionally semantic_key
+        cache_settings: Settings from get_cache_settings
+        context: Profile context the items were generated for
+        context_embedding: Embedding of the context; when given the items become available to semantic lookups
+
+    Returns:
+        Number of entries stored
+    """
+    if not items:
+        return 0
+
+    context_hash = None
+    if context is not None and context_embedding is not None:
+        context_hash = compute_context_hash(context)
+        if not save_enrichment_context(context_hash, context, context_embedding):
+            context_hash = None
+
+    prompt_hash = compute_prompt_hash(prompt_template)
+    stored = save_enrichment_cache_entries([{
+        "cache_key": item["cache_key"],
+        "semantic_key": item.get("semantic_key"),
+        "context_hash": context_hash,
+        "statement_hash": compute_statement_hash(item["original"]),
+        "prompt_hash": prompt_hash,
+        "original": item["original"],
+        "enriched": item["enriched"],
+        "metrics": item.get("metrics"),
+        "model_name": model_name,
+        "temperature": temperature,
+        "statement_length": statement_length
+    } for item in items], ttl_days=cache_settings.get("ttl_days"))
+    _count("stores", stored)
+
+    if stored and context_hash:
+        # The new entries get their IDs on the next database load; until then they can't be touched
+        _semantic_index.add(context_hash, context_embedding, [{
+            "id": None,
+            "semantic_key": item["semantic_key"],
+            "context_hash": context_hash,
+            "enriched": item["enriched"],
+            "metrics": item.get("metrics")
+        } for item in items if item.get("semantic_key")])
+
+    if stored:
+        evicted = evict_enrichment_cache(cache_settings.get("max_entries"))
+        _count("evictions", evicted)
+        if evicted:
+            _semantic_index.clear()
+    return stored
+
+def invalidate_prompt(prompt_template: str) -> int:
+    """Deletes all cached enrichments generated with a prompt template"""
+    deleted = delete_enrichment_cache_entries(prompt_hash=compute_prompt_hash(prompt_template))
+    _semantic_index.clear()
+    logger.info(f"Invalidated {deleted} cached enrichments for prompt")
+    return deleted
+
+def invalidate_statements(statement_hashes: Iterable[str]) -> int:
+    """Deletes cached enrichments of specific statements (e.g. from get_changed_statement_hashes)"""
+    deleted = delete_enrichment_cache_entries(statement_hashes=set(statement_hashes))
+    _semantic_index.clear()
+    logger.info(f"Invalidated {deleted} cached enrichments for changed statements")
+    return deleted
+
+def invalidate_framework(framework_id: int) -> int:
+    """Deletes cached enrichments of every statement in a framework"""
+    return invalidate_statements(get_framework_statement_hashes(framework_id))
+
+def clear_cache() -> int:
+    """Deletes all cached enrichments"""
+    _semantic_index.clear()
+    return clear_enrichment_cache()
+
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Returns cache statistics
+
+    Returns:
+        Dictionary with process counters (hits, misses, semantic_hits, semantic_misses, stores,
+        evictions, hit_rate, semantic_hit_rate) and database totals (entries, keys, total_hits,
+        expired, contexts). semantic_hit_rate is relative to the exact misses that were looked up semantically.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    semantic_lookups = stats["semantic_hits"] + stats["semantic_misses"]
+    stats["semantic_hit_rate"] = stats["semantic_hits"] / semantic_lookups if semantic_lookups else 0.0
+    stats.update(get_enrichment_cache_summary() or {})
+    return stats
@@ -1,43 +1,54 @@
+import hashlib
+import json
 import logging
-from typing import Optional, Dict, Any
+import re
+import threading
+from functools import partial
+from typing import Optional, Dict, Any, List, Callable, Sequence, Tuple
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 
 from services.ai_service import get_chat_model
+from services.telemetry_service import get_token_usage, llm_call_context
+from services.single_flight_service import SingleFlight, make_flight_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Templates put their static instructions and examples first and the variables last,
+# so the static part can be sent as a cacheable system prefix (see split_prompt_template)
 DEFAULT_PROMPT = """You are an expert in personalizing digital skills statements for professionals.
 
-CONTEXT:
-{context}
-
 TASK:
-Transform the following generic digital skills statement into a personalized version that is more relevant, specific, and tailored to the individual's professional context described above.
-
-ORIGINAL STATEMENT:
-{original_statement}
+Transform the generic digital skills statement below into a personalized version that is more relevant, specific, and tailored to the individual's professional context described below.
 
 Enrich the statement while keeping its meaning intact, ensuring clarity, relevance, 
-and appropriate difficulty based on the context. Limit the response to a maximum of 
-{length} characters without cutting off mid-sentence. 
+and appropriate difficulty based on the context. 
 Don't make phrases which include the job profile ex. 'As a ...' and don't include 
 the digital proficiency level.
 
+CONTEXT:
+{context}
+
+ORIGINAL STATEMENT:
+{original_statement}
+
+Limit the response to a maximum of {length} characters without cutting off mid-sentence.
 """
 
 # Basic Prompt (V1)
-BASIC_PROMPT = """Context: {context}
-Original Statement: {original_statement}
-
-Enrich the statement while keeping its meaning intact, ensuring clarity, relevance, 
-and appropriate difficulty based on the context. Limit the response to a maximum of 
-{length} characters without cutting off mid-sentence. 
+BASIC_PROMPT = """Enrich the statement while keeping its meaning intact, ensuring clarity, relevance, 
+and appropriate difficulty based on the context. 
 Don't make phrases which include the job profile ex. 'As a ...' and don't include 
 the digital proficiency level.
+
+Context: {context}
+Original Statement: {original_statement}
+
+Limit the response to a maximum of {length} characters without cutting off mid-sentence.
 """
 
 # Few Shot Prompt related to Digcomp (V2)
@@ -101,9 +112,11 @@ Original Statement: I know how to organize digital content (e.g., documents, ima
 Problematic Enrichment: I possess the expertise to efficiently categorize and manage digital content such as documents, images, and videos utilizing techniques like folder organization and tagging.
 Revised Enrichment: Digital content is structured with folders and tags, ensuring quick access to employee records and improving HR efficiency.
 
+Enrich the statement below by integrating its context, while keeping its meaning intact, ensuring clarity, relevance, and appropriate difficulty based on the context. Avoid verbose or overly complex language. Do not include phrases like 'As a ...', 'Revised Enrichment:' or explicit digital proficiency levels.
+
 Context: {context}
 Original Statement: {original_statement}
-Enrich the statement by integrating the context of a {context}. While keeping its meaning intact, ensuring clarity, relevance, and appropriate difficulty based on the context. Avoid verbose or overly complex language. Limit the response to a maximum of {length} characters without cutting off mid-sentence. Do not include phrases like 'As a ...', 'Revised Enrichment:' or explicit digital proficiency levels.
+Limit the response to a maximum of {length} characters without cutting off mid-sentence.
 """
 
 # General Few Shot Prompt (V3)
@@ -132,9 +145,11 @@ Context: A Small Business Owner expanding their online presence.
 Original Statement: I use social media to promote my business.
 Enriched Statement: I strategically utilize social media platforms to build brand awareness, connect with customers, and drive business growth.
 
+Enrich the statement below while keeping its meaning intact, ensuring clarity, relevance, and appropriate difficulty based on the context. Don't make phrases which include the job profile ex. 'As a ...' and don't include the digital proficiency level or start with Enriched Statement:
+
 Context: {context}
 Original Statement: {original_statement}
-Enrich the statement while keeping its meaning intact, ensuring clarity, relevance, and appropriate difficulty based on the context. Limit the response to a maximum of {length} characters without cutting off mid-sentence. Don't make phrases which include the job profile ex. 'As a ...' and don't include the digital proficiency level or start with Enriched Statement:
+Limit the response to a maximum of {length} characters without cutting off mid-sentence.
 """
 
 def calculate_length(original_statement: str, statement_length: int) -> int:
@@ -144,6 +159,493 @@ def calculate_length(original_statement: str, statement_length: int) -> int:
     # which should be 100 characters, not 100% increase
     return statement_length
 
+# Built-in prompt templates by their reserved (non-positive) prompt IDs
+BUILT_IN_PROMPTS = {
+    0: DEFAULT_PROMPT,
+    -1: BASIC_PROMPT,
+    -2: DIGCOMP_FEW_SHOT_PROMPT,
+    -3: GENERAL_FEW_SHOT_PROMPT
+}
+
+# Default number of enrichment requests in flight for batch calls
+DEFAULT_BATCH_CONCURRENCY = 8
+
+# Statements per request in multi-statement mode
+DEFAULT_MULTI_CHUNK_SIZE = 10
+MAX_MULTI_CHUNK_SIZE = 25
+
+# Stands in for {original_statement} when a template is applied to several statements
+MULTI_STATEMENT_PLACEHOLDER = "(each of the statements listed under STATEMENTS below)"
+
+# Appended to the selected template in multi-statement mode
+MULTI_STATEMENT_INSTRUCTIONS = """
+
+STATEMENTS:
+{statements}
+
+Apply the instructions above to each statement in STATEMENTS separately and independently.
+Respond with a JSON object only, in the form {{"enrichments": [{{"id": 1, "enriched": "..."}}]}},
+with exactly one entry for every statement id and nothing else.
+"""
+
+# Appended to the selected template in self-assessment mode: enrich and score in one request
+SELF_ASSESSMENT_INSTRUCTIONS = """
+
+Then evaluate your enriched statement against the original statement:
+1. Clarity (0-5): How clear and understandable is the statement?
+2. Relevance for context (0-5): How relevant is the statement to the professional context?
+3. Retention of original meaning (0-5): How well does it preserve the core meaning of the original statement?
+4. Difficulty (0-5): How complex is the language and concepts used?
+
+Respond with a JSON object only, in the form
+{{"enriched": "...", "clarity": 0, "relevance_for_context": 0, "retention_of_original_meaning": 0, "difficulty": 0, "explanation": "..."}}
+where explanation is 1-2 sentences explaining your evaluation.
+"""
+
+SELF_ASSESSMENT_SCORES = ("clarity", "relevance_for_context", "retention_of_original_meaning", "difficulty")
+
+def resolve_prompt_template(prompt_id: Optional[int] = None) -> str:
+    """
+    Resolves a prompt ID to its template
+    
+    Args:
+        prompt_id: Prompt ID (0 and negative IDs are built-in prompts); read from global settings if None
+        
+    Returns:
+        Prompt template, falling back to DEFAULT_PROMPT if the prompt doesn't exist
+    """
+    if prompt_id is None:
+        from services.db.crud._settings import get_global_settings
+        
+        global_settings = get_global_settings("user_settings")
+        prompt_id = global_settings.get("selected_prompt_id", 0) if global_settings else 0
+    
+    if prompt_id in BUILT_IN_PROMPTS:
+        return BUILT_IN_PROMPTS[prompt_id]
+    
+    from services.db.crud._prompts import get_prompt_content
+    
+    # Load only the selected prompt's content, falling back to default if not found
+    return get_prompt_content(prompt_id) or DEFAULT_PROMPT
+
+# A {variable} placeholder, but not an escaped {{literal}}
+TEMPLATE_VARIABLE_PATTERN = re.compile(r"(?<!\{)\{[A-Za-z_][A-Za-z0-9_]*\}(?!\})")
+
+# Identical single-statement enrichments in flight (e.g. a cohort with the same profile) share one request
+_enrichment_flight = SingleFlight("enrichment")
+
+# Token usage per static prompt prefix since process start
+_token_usage: Dict[str, Dict[str, int]] = {}
+_token_usage_lock = threading.Lock()
+
+def split_prompt_template(prompt_template: str) -> Tuple[str, str]:
+    """
+    Splits a template into its static prefix and variable suffix
+    
+    Everything before the first line with a placeholder is static. It is sent as the
+    system message, so repeated requests share an identical prefix that the provider
+    can cache.
+    
+    Returns:
+        Tuple of (system prefix, human suffix); the prefix is empty if the template starts with a variable
+    """
+    lines = prompt_template.splitlines(keepends=True)
+    for index, line in enumerate(lines):
+        if TEMPLATE_VARIABLE_PATTERN.search(line):
+            return "".join(lines[:index]).strip(), "".join(lines[index:]).strip()
+    return "", prompt_template.strip()
+
+def build_enrichment_prompt(prompt_template: str) -> ChatPromptTemplate:
+    """Builds a system (static prefix) + human (variable suffix) chat prompt from a template"""
+    prefix, suffix = split_prompt_template(prompt_template)
+    messages = [("system", prefix)] if prefix else []
+    messages.append(("human", suffix))
+    return ChatPromptTemplate.from_messages(messages)
+
+def _prefix_hash(prompt_template: str) -> str:
+    return hashlib.sha256(split_prompt_template(prompt_template)[0].encode("utf-8")).hexdigest()[:16]
+
+def _record_token_usage(prefix_hash: str, message: Any) -> Any:
+    input_tokens, output_tokens, cached_tokens = get_token_usage(message)
+    with _token_usage_lock:
+        usage = _token_usage.setdefault(prefix_hash, {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0})
+        usage["requests"] += 1
+        usage["input_tokens"] += input_tokens
+        usage["output_tokens"] += output_tokens
+        usage["cached_tokens"] += cached_tokens
+    return message
+
+def get_token_usage_stats(prompt_template: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Returns enrichment token usage since process start
+    
+    Args:
+        prompt_template: Only count requests sharing this template's static prefix (all requests if None)
+        
+    Returns:
+        Dictionary with requests, input_tokens, output_tokens, cached_tokens and
+        cache_hit_rate (share of input tokens served from the provider's prompt cache)
+    """
+    with _token_usage_lock:
+        if prompt_template is None:
+            entries = list(_token_usage.values())
+        else:
+            entries = [_token_usage.get(_prefix_hash(prompt_template), {})]
+        stats = {key: sum(entry.get(key, 0) for entry in entries)
+                 for key in ("requests", "input_tokens", "output_tokens", "cached_tokens")}
+    stats["cache_hit_rate"] = stats["cached_tokens"] / stats["input_tokens"] if stats["input_tokens"] else 0.0
+    return stats
+
+def _build_chain(prompt_template: str, model, usage_template: Optional[str] = None):
+    """prompt | model | usage recorder | parser, with usage counted under usage_template's prefix"""
+    record_usage = RunnableLambda(partial(_record_token_usage, _prefix_hash(usage_template or prompt_template)))
+    return build_enrichment_prompt(prompt_template) | model | record_usage | StrOutputParser()
+
+def build_enrichment_chain(
+    prompt_template: str,
+    model_name: str = "gpt-4o",
+    temperature: float = 0.7,
+    timeout: Optional[float] = None
+):
+    """Builds the prompt | model | parser chain used for enrichment"""
+    model = get_chat_model(model_name, temperature, timeout=timeout) if timeout else get_chat_model(model_name, temperature)
+    return _build_chain(prompt_template, model)
+
+def _build_enrichment_inputs(
+    context: str,
+    statements: Sequence[str],
+    statement_length: int,
+    additional_params: Optional[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    inputs = []
+    for statement in statements:
+        params = {
+            "context": context,
+            "original_statement": statement,
+            "length": calculate_length(statement, statement_length)
+        }
+        # Add any additional parameters
+        if additional_params:
+            params.update(additional_params)
+        inputs.append(params)
+    return inputs
+
+def _build_batch_results(statements: Sequence[str], outputs: List[Any]) -> List[Dict[str, Any]]:
+    results = []
+    for statement, output in zip(statements, outputs):
+        # abatch returns cancellations (not Exceptions) as results too
+        if isinstance(output, BaseException):
+            logger.error(f"Error enriching statement: {str(output)}")
+            results.append({"original": statement, "enriched": None, "error": output})
+        else:
+            results.append({"original": statement, "enriched": output.strip(), "error": None})
+    return results
+
+def enrich_statements_batch(
+    context: str,
+    statements: Sequence[str],
+    statement_length: int = 150,
+    prompt_template: Optional[str] = None,
+    model_name: str = "gpt-4o",
+    temperature: float = 0.7,
+    additional_params: Optional[Dict[str, Any]] = None,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    timeout: Optional[float] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Enriches several statements for the same context
+    
+    The prompt is resolved and the chain built once, then all statements run through
+    chain.batch with bounded concurrency. A failing statement doesn't fail the batch.
+    
+    Args:
+        context: The context for enrichment
+        statements: The original statements to enrich
+        statement_length: Target length in characters
+        prompt_template: Custom prompt template (uses selected prompt from settings if None)
+        model_name: Name of the LLM model to use
+        temperature: Temperature setting for the LLM
+        additional_params: Additional parameters to pass to the prompt
+        max_concurrency: Maximum number of requests in flight
+        timeout: Per-request timeout in seconds
+        progress_callback: Called as progress_callback(completed, total) from the calling thread
+        
+    Returns:
+        List in input order of {"original", "enriched", "error"} dictionaries
+    """
+    if not statements:
+        return []
+    
+    if prompt_template is None:
+        prompt_template = resolve_prompt_template()
+    
+    chain = build_enrichment_chain(prompt_template, model_name, temperature, timeout)
+    inputs = _build_enrichment_inputs(context, statements, statement_length, additional_params)
+    config = {"max_concurrency": max_concurrency}
+    
+    logger.info(f"Enriching {len(statements)} statements (max concurrency {max_concurrency})")
+    
+    with llm_call_context(operation="enrichment", prompt_hash=_prefix_hash(prompt_template)):
+        if progress_callback is None:
+            outputs = chain.batch(inputs, config=config, return_exceptions=True)
+        else:
+            outputs = [None] * len(inputs)
+            for completed, (index, output) in enumerate(chain.batch_as_completed(inputs, config=config, return_exceptions=True), start=1):
+                outputs[index] = output
+                progress_callback(completed, len(inputs))
+    
+    return _build_batch_results(statements, outputs)
+
+def build_multi_enrichment_chain(
+    prompt_template: str,
+    model_name: str = "gpt-4o",
+    temperature: float = 0.7,
+    timeout: Optional[float] = None
+):
+    """Builds the chain that enriches several statements in one JSON-mode request"""
+    model = get_chat_model(model_name, temperature, timeout=timeout) if timeout else get_chat_model(model_name, temperature)
+    return _build_chain(
+        prompt_template + MULTI_STATEMENT_INSTRUCTIONS, model.bind(response_format={"type": "json_object"}), prompt_template
+    )
+
+def parse_multi_enrichment_output(output: str, statement_ids: Sequence[int]) -> Dict[int, str]:
+    """
+    Parses and validates the JSON answer of a multi-statement request
+
+    Items with unknown or repeated ids or without a non-empty enriched text are dropped,
+    so the caller can fall back to single requests for exactly those statements.
+
+    Returns:
+        Dictionary mapping each valid statement id to its enriched statement
+    """
+    # Tolerate a markdown code fence around the JSON
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", output.strip())
+    data = json.loads(text)
+    items = data.get("enrichments", []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("Expected a list of enrichments")
+
+    expected = set(statement_ids)
+    enriched = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            statement_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        text = item.get("enriched")
+        if statement_id not in expected or statement_id in enriched or not isinstance(text, str) or not text.strip():
+            continue
+        enriched[statement_id] = text.strip()
+    return enriched
+
+def enrich_statements_multi(
+    context: str,
+    statements: Sequence[str],
+    statement_length: int = 150,
+    prompt_template: Optional[str] = None,
+    model_name: str = "gpt-4o",
+    temperature: float = 0.7,
+    additional_params: Optional[Dict[str, Any]] = None,
+    chunk_size: int = DEFAULT_MULTI_CHUNK_SIZE,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    timeout: Optional[float] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Enriches statements in chunks, several statements per LLM request
+    
+    The template (including few-shot examples and context) is sent once per chunk
+    instead of once per statement. The model answers in JSON, mapped back by statement
+    id. Statements whose item is missing or invalid, or whose whole chunk fails to
+    parse, are retried with single-statement requests via enrich_statements_batch.
+    
+    Args:
+        chunk_size: Statements per request
+        (other arguments as in enrich_statements_batch)
+        
+    Returns:
+        List in input order of {"original", "enriched", "error"} dictionaries
+    """
+    if not statements:
+        return []
+    
+    if prompt_template is None:
+        prompt_template = resolve_prompt_template()
+    
+    chunk_size = max(1, min(chunk_size, MAX_MULTI_CHUNK_SIZE))
+    chunks = [list(range(start, min(start + chunk_size, len(statements)))) for start in range(0, len(statements), chunk_size)]
+    inputs = []
+    for chunk in chunks:
+        params = {
+            "context": context,
+            "original_statement": MULTI_STATEMENT_PLACEHOLDER,
+            "length": calculate_length(statements[chunk[0]], statement_length),
+            "statements": "\n".join(json.dumps({"id": number, "statement": statements[index]})
+                                    for number, index in enumerate(chunk, start=1))
+        }
+        if additional_params:
+            params.update(additional_params)
+        inputs.append(params)
+    
+    chain = build_multi_enrichment_chain(prompt_template, model_name, temperature, timeout)
+    config = {"max_concurrency": max_concurrency}
+    
+    logger.info(f"Enriching {len(statements)} statements in {len(chunks)} multi-statement requests")
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(statements)
+    completed = 0
+    with llm_call_context(operation="enrichment_multi", prompt_hash=_prefix_hash(prompt_template)):
+        for chunk_index, output in chain.batch_as_completed(inputs, config=config, return_exceptions=True):
+            chunk = chunks[chunk_index]
+            if isinstance(output, Exception):
+                logger.warning(f"Multi-statement request failed, falling back to single requests: {str(output)}")
+                continue
+            try:
+                enriched = parse_multi_enrichment_output(output, range(1, len(chunk) + 1))
+            except (ValueError, AttributeError) as e:
+                logger.warning(f"Unparseable multi-statement response, falling back to single requests: {str(e)}")
+                continue
+            
+            for number, index in enumerate(chunk, start=1):
+                if number in enriched:
+                    results[index] = {"original": statements[index], "enriched": enriched[number], "error": None}
+                    completed += 1
+            if progress_callback:
+                progress_callback(completed, len(statements))
+    
+    fallback_indices = [index for index, result in enumerate(results) if result is None]
+    if fallback_indices:
+        logger.info(f"Falling back to single requests for {len(fallback_indices)} statements")
+        fallback_results = enrich_statements_batch(
+            context,
+            [statements[index] for index in fallback_indices],
+            statement_length=statement_length,
+            prompt_template=prompt_template,
+            model_name=model_name,
+            temperature=temperature,
+            additional_params=additional_params,
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+            progress_callback=(lambda done, _: progress_callback(completed + done, len(statements))) if progress_callback else None
+        )
+        for index, result in zip(fallback_indices, fallback_results):
+            results[index] = result
+    
+    return results
+
+def build_self_assessment_chain(
+    prompt_template: str,
+    model_name: str = "gpt-4o",
+    temperature: float = 0.7,
+    timeout: Optional[float] = None
+):
+    """Builds the chain that enriches a statement and scores it in one JSON-mode request"""
+    model = get_chat_model(model_name, temperature, timeout=timeout) if timeout else get_chat_model(model_name, temperature)
+    return _build_chain(
+        prompt_template + SELF_ASSESSMENT_INSTRUCTIONS, model.bind(response_format={"type": "json_object"}), prompt_template
+    )
+
+def parse_self_assessment_output(output: str) -> Dict[str, Any]:
+    """
+    Parses and validates the JSON answer of a self-assessment request
+
+    Scores outside 0-5 are clamped into the range rather than failing the attempt.
+
+    Returns:
+        Dictionary with enriched, scores (the four rubric scores) and explanation
+
+    Raises:
+        ValueError: If the answer has no enriched statement or a score is missing
+    """
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", output.strip())
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+
+    enriched = data.get("enriched")
+    if not isinstance(enriched, str) or not enriched.strip():
+        raise ValueError("Missing enriched statement")
+
+    explanation = data.get("explanation")
+    return {"enriched": enriched.strip(), "scores": parse_rubric_scores(data, clamp=True), "explanation": explanation if isinstance(explanation, str) else ""}
+
+def parse_rubric_scores(data: Dict[str, Any], clamp: bool = False) -> Dict[str, int]:
+    """
+    Validates the four rubric scores of a JSON answer
+
+    Args:
+        data: The parsed JSON answer
+        clamp: Clamp scores outside 0-5 into the range instead of rejecting them
+
+    Returns:
+        Dictionary with the SELF_ASSESSMENT_SCORES keys as integers from 0 to 5
+
+    Raises:
+        ValueError: If a score is missing, not a number or (without clamp) outside 0-5
+    """
+    scores = {}
+    for key in SELF_ASSESSMENT_SCORES:
+        value = data.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not (clamp or 0 <= value <= 5):
+            raise ValueError(f"Missing or invalid score '{key}': {value!r}")
+        scores[key] = max(0, min(5, int(round(value))))
+    return scores
+
+def enrich_statement_with_self_assessment(
+    context: str,
+    original_statement: str,
+    statement_length: int = 150,
+    prompt_template: Optional[str] = None,
+    model_name: str = "gpt-4o",
+    temperature: float = 0.7,
+    additional_params: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Enriches a statement and has the model score its own result in the same request
+
+    Saves the separate evaluation round trip; see parse_self_assessment_output for the result.
+    """
+    if prompt_template is None:
+        prompt_template = resolve_prompt_template()
+
+    chain = build_self_assessment_chain(prompt_template, model_name, temperature)
+    params = _build_enrichment_inputs(context, [original_statement], statement_length, additional_params)[0]
+
+    with llm_call_context(operation="enrichment_self_assessment", prompt_hash=_prefix_hash(prompt_template)):
+        output = chain.invoke(params)
+
+    return parse_self_assessment_output(output)
+
+async def aenrich_statements_batch(
+    context: str,
+    statements: Sequence[str],
+    statement_length: int = 150,
+    prompt_template: Optional[str] = None,
+    model_name: str = "gpt-4o",
+    temperature: float = 0.7,
+    additional_params: Optional[Dict[str, Any]] = None,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    timeout: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """Async version of enrich_statements_batch using chain.abatch"""
+    if not statements:
+        return []
+    
+    if prompt_template is None:
+        prompt_template = resolve_prompt_template()
+    
+    chain = build_enrichment_chain(prompt_template, model_name, temperature, timeout)
+    inputs = _build_enrichment_inputs(context, statements, statement_length, additional_params)
+    
+    logger.info(f"Enriching {len(statements)} statements asynchronously (max concurrency {max_concurrency})")
+    with llm_call_context(operation="enrichment", prompt_hash=_prefix_hash(prompt_template)):
+        outputs = await chain.abatch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+    
+    return _build_batch_results(statements, outputs)
+
 def enrich_statement_with_llm(
     context: str, 
     original_statement: str, 
@@ -151,10 +653,15 @@ def enrich_statement_with_llm(
     prompt_template: Optional[str] = None,
     model_name: str = "gpt-4o",
     temperature: float = 0.7,
-    additional_params: Optional[Dict[str, Any]] = None
+    additional_params: Optional[Dict[str, Any]] = None,
+    sample: Optional[int] = None
 ) -> str:
     """
-    Enriches a statement using LangChain
+    Enriches a single statement (see enrich_statements_batch)
+    
+    Concurrent calls with identical arguments wait for one request and share its
+    result or exception. Calls meant as separate samples of the same request (e.g.
+    the speculative candidates of one regeneration run) pass different sample numbers.
     
     Args:
         context: The context for enrichment
@@ -164,64 +671,64 @@ def enrich_statement_with_llm(
         model_name: Name of the LLM model to use
         temperature: Temperature setting for the LLM
         additional_params: Additional parameters to pass to the prompt
+        sample: Sample number; calls with different numbers never share a request
         
     Returns:
         Enriched statement
     """
-    try:
-        # Calculate the character limit
-        rounded_length = calculate_length(original_statement, statement_length)
-        
-        # If no prompt template provided, get from settings
-        if prompt_template is None:
-            # Get global settings
-            from services.db.crud._settings import get_global_settings
-            from services.db.crud._prompts import get_all_prompts
-            
-            global_settings = get_global_settings("user_settings")
-            selected_prompt_id = global_settings.get("selected_prompt_id", 0) if global_settings else 0
-            
-            # If selected prompt is default (0) or one of the built-in prompts (negative IDs)
-            if selected_prompt_id == 0:
-                prompt_template = DEFAULT_PROMPT
-            elif selected_prompt_id == -1:
-                prompt_template = BASIC_PROMPT
-            elif selected_prompt_id == -2:
-                prompt_template = DIGCOMP_FEW_SHOT_PROMPT
-            elif selected_prompt_id == -3:
-                prompt_template = GENERAL_FEW_SHOT_PROMPT
-            else:
-                # Get the selected prompt from database
-                all_prompts = get_all_prompts()
-                selected_prompt = None
-                for p in all_prompts:
-                    if p["id"] == selected_prompt_id:
-                        selected_prompt = p
-                        break
-                
-                # Use the selected prompt or default if not found
-                prompt_template = selected_prompt["content"] if selected_prompt else DEFAULT_PROMPT
-        
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-
-        # Prepare parameters for the prompt
-        params = {
-            "context": context,
-            "original_statement": original_statement,
-            "length": rounded_length
-        }
+    if prompt_template is None:
+        prompt_template = resolve_prompt_template()
+    
+    def enrich():
+        result = enrich_statements_batch(
+            context,
+            [original_statement],
+            statement_length=statement_length,
+            prompt_template=prompt_template,
+            model_name=model_name,
+            temperature=temperature,
+            additional_params=additional_params,
+            max_concurrency=1
+        )[0]
         
-        # Add any additional parameters
-        if additional_params:
-            params.update(additional_params)
-
-        # Create and run the chain
-        chain = prompt | get_chat_model(model_name, temperature) | StrOutputParser()
+        if result["error"] is not None:
+            raise result["error"]
         
-        logger.info(f"Enriching statement of length {len(original_statement)} to target length {rounded_length}")
-        enriched = chain.invoke(params)
+        return result["enriched"]
+    
+    key = make_flight_key(context, original_statement, statement_length, prompt_template, model_name, temperature, additional_params, sample)
+    return _enrichment_flight.do(key, enrich)
 
-        return enriched.strip()
-    except Exception as e:
-        logger.error(f"Error enriching statement: {str(e)}", exc_info=True)
-        raise 
\ No newline at end of file
+async def aenrich_statement_with_llm(
+    context: str,
+    original_statement: str,
+    statement_length: int = 150,
+    prompt_template: Optional[str] = None,
+    model_name: str = "gpt-4o",
+    temperature: float = 0.7,
+    additional_params: Optional[Dict[str, Any]] = None,
+    sample: Optional[int] = None
+) -> str:
+    """Async version of enrich_statement_with_llm"""
+    if prompt_template is None:
+        prompt_template = resolve_prompt_template()
+
+    async def enrich():
+        result = (await aenrich_statements_batch(
+            context,
+            [original_statement],
+            statement_length=statement_length,
+            prompt_template=prompt_template,
+            model_name=model_name,
+            temperature=temperature,
+            additional_params=additional_params,
+            max_concurrency=1
+        ))[0]
+
+        if result["error"] is not None:
+            raise result["error"]
+
+        return result["enriched"]
+
+    key = make_flight_key(context, original_statement, statement_length, prompt_template, model_name, temperature, additional_params, sample)
+    return await _enrichment_flight.ado(key, enrich)
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Optional, TypeVar
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_start_lock = threading.Lock()
+
+def _run_loop(loop: asyncio.AbstractEventLoop, started: threading.Event) -> None:
+    asyncio.set_event_loop(loop)
+    loop.call_soon(started.set)
+    loop.run_forever()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the process-wide background event loop, starting its thread on first use
+
+    All async LLM and embedding calls of the process share this loop, so one loop
+    holds every in-flight request instead of one thread per request. The loop lives
+    as long as the process (the thread is a daemon).
+    """
+    global _loop, _thread
+    with _start_lock:
+        if _loop is None or not _thread.is_alive():
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+            thread = threading.Thread(target=_run_loop, args=(loop, started), name="ai-event-loop", daemon=True)
+            thread.start()
+            started.wait()
+            _loop, _thread = loop, thread
+            logger.info("Started background event loop")
+        return _loop
+
+def in_event_loop_thread() -> bool:
+    """Returns whether the caller runs on the background loop (where blocking on it would deadlock)"""
+    return _thread is not None and threading.current_thread() is _thread
+
+def submit(coroutine: Awaitable[T]) -> "Future[T]":
+    """
+    Schedules a coroutine on the background loop without waiting for it
+
+    The coroutine runs in a copy of the caller's context, so llm_call_context fields
+    and the llm_priority class carry over.
+
+    Returns:
+        concurrent.futures.Future of the result; cancelling it cancels the coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop())
+
+def run_async(coroutine: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Runs a coroutine on the background loop and blocks the calling thread for its result
+
+    This is the bridge for Streamlit script threads and other synchronous code. The
+    coroutine must not call Streamlit itself; report progress from the calling
+    thread instead (see generation_service.run_concurrently_async).
+
+    Args:
+        coroutine: The coroutine to run
+        timeout: Seconds to wait before the coroutine is cancelled (None waits indefinitely)
+
+    Returns:
+        The coroutine's result
+
+    Raises:
+        TimeoutError: If the timeout passes first
+        RuntimeError: If called from the background loop itself; await the coroutine there instead
+    """
+    if in_event_loop_thread():
+        coroutine.close()
+        raise RuntimeError("run_async called from the background event loop; await the coroutine instead")
+
+    future = submit(coroutine)
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Timed out after {timeout} seconds")
+    except BaseException:
+        # e.g. Streamlit stopping the script thread: don't leave the requests running
+        future.cancel()
+        raise
@@ -0,0 +1,334 @@
+import csv
+import io
+import json
+import logging
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from services.db.crud._frameworks import save_framework, delete_framework
+from services.db.crud._framework_items import (
+    append_framework_statements, refresh_framework_structure, iter_framework_statement_rows
+)
+
+try:
+    import ijson
+except ImportError:  # Optional: JSON files are then parsed in one go
+    ijson = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FRAMEWORK_FILE_FORMATS = ("csv", "jsonl", "json")
+DEFAULT_IMPORT_BATCH_SIZE = 500
+
+# Limits matching the framework tables
+MAX_NAME_LENGTH = 255
+MAX_STATEMENT_LENGTH = 2000
+
+# Only the first errors are kept in the report; the total is always counted
+MAX_REPORTED_ERRORS = 1000
+
+# Accepted column/key names for each field
+FIELD_ALIASES = {
+    "category": ("category", "competence_area", "area"),
+    "subcategory": ("subcategory", "competence", "sub_category"),
+    "statement": ("statement", "text", "description")
+}
+
+# Each raw row is (row number, parsed data or None, parse error or None)
+RawRow = Tuple[int, Optional[Any], Optional[str]]
+FrameworkRow = Tuple[str, str, str]
+
+def detect_file_format(filename: str) -> Optional[str]:
+    """Returns the framework file format for a filename based on its extension"""
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension == "ndjson":
+        return "jsonl"
+    return extension if extension in FRAMEWORK_FILE_FORMATS else None
+
+def _iter_csv_rows(stream: BinaryIO) -> Iterator[RawRow]:
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text_stream)
+        if reader.fieldnames:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for data in reader:
+            yield reader.line_num, data, None
+    finally:
+        # Leave the caller's stream open
+        text_stream.detach()
+
+def _iter_jsonl_rows(stream: BinaryIO) -> Iterator[RawRow]:
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+
+def _iter_structure_rows(items: Iterator[Tuple[str, Any]]) -> Iterator[RawRow]:
+    """Flattens {category: {subcategory: [statements]}} items into rows numbered by statement"""
+    row_number = 0
+    for category, subcategories in items:
+        if not isinstance(subcategories, dict):
+            row_number += 1
+            yield row_number, None, f"Category '{category}' must map subcategories to statement lists"
+            continue
+        for subcategory, statements in subcategories.items():
+            if not isinstance(statements, list):
+                row_number += 1
+                yield row_number, None, f"Subcategory '{subcategory}' must contain a list of statements"
+                continue
+            for statement in statements:
+                row_number += 1
+                yield row_number, {"category": category, "subcategory": subcategory, "statement": statement}, None
+
+def _first_json_char(stream: BinaryIO) -> str:
+    """Peeks at the first non-whitespace character of a seekable stream"""
+    start = stream.tell()
+    while True:
+        chunk = stream.read(1024)
+        if not chunk:
+            stream.seek(start)
+            return ""
+        stripped = chunk.lstrip(b" \t\r\n\xef\xbb\xbf")
+        if stripped:
+            stream.seek(start)
+            return stripped[:1].decode("utf-8", errors="ignore")
+
+def _iter_json_rows(stream: BinaryIO) -> Iterator[RawRow]:
+    """
+    Parses either a list of row objects or a nested framework structure.
+
+    With ijson installed the file is streamed item by item (one category at a time
+    for the nested form); otherwise it is loaded with json.load.
+    """
+    if ijson is not None and stream.seekable():
+        if _first_json_char(stream) == "[":
+            for row_number, data in enumerate(ijson.items(stream, "item", use_float=True), start=1):
+                yield row_number, data, None
+        else:
+            yield from _iter_structure_rows(ijson.kvitems(stream, "", use_float=True))
+        return
+
+    data = json.load(stream)
+    if isinstance(data, list):
+        for row_number, item in enumerate(data, start=1):
+            yield row_number, item, None
+    elif isinstance(data, dict):
+        yield from _iter_structure_rows(iter(data.items()))
+    else:
+        yield 1, None, "JSON must be a list of rows or a {category: {subcategory: [statements]}} object"
+
+def iter_framework_file_rows(stream: BinaryIO, file_format: str) -> Iterator[RawRow]:
+    """
+    Streams raw rows from a framework file
+
+    Args:
+        stream: Binary file object
+        file_format: One of FRAMEWORK_FILE_FORMATS
+
+    Returns:
+        Iterator of (row number, parsed data, parse error) tuples
+    """
+    if file_format == "csv":
+        return _iter_csv_rows(stream)
+    if file_format == "jsonl":
+        return _iter_jsonl_rows(stream)
+    if file_format == "json":
+        return _iter_json_rows(stream)
+    raise ValueError(f"Unsupported framework file format: {file_format}")
+
+def _get_field(data: Dict[str, Any], field: str) -> str:
+    for key in FIELD_ALIASES[field]:
+        value = data.get(key)
+        if value is not None and str(value).strip():
+            return str(value).strip()
+    return ""
+
+def validate_framework_row(data: Any) -> Tuple[Optional[FrameworkRow], Optional[str]]:
+    """
+    Validates a single framework row
+
+    Args:
+        data: Parsed row, expected to be a dict with category, subcategory and statement
+
+    Returns:
+        Tuple of (category, subcategory, statement) and None, or None and an error message
+    """
+    if not isinstance(data, dict):
+        return None, "Row must be an object with category, subcategory and statement"
+
+    data = {str(key).strip().lower(): value for key, value in data.items() if key is not None}
+    category = _get_field(data, "category")
+    subcategory = _get_field(data, "subcategory")
+    statement = _get_field(data, "statement")
+
+    missing = [field for field, value in (("category", category), ("subcategory", subcategory), ("statement", statement)) if not value]
+    if missing:
+        return None, f"Missing {', '.join(missing)}"
+    if len(category) > MAX_NAME_LENGTH or len(subcategory) > MAX_NAME_LENGTH:
+        return None, f"Category and subcategory names must be at most {MAX_NAME_LENGTH} characters"
+    if len(statement) > MAX_STATEMENT_LENGTH:
+        return None, f"Statement must be at most {MAX_STATEMENT_LENGTH} characters"
+
+    return (category, subcategory, statement), None
+
+def iter_validated_batches(
+    raw_rows: Iterator[RawRow],
+    batch_size: int = DEFAULT_IMPORT_BATCH_SIZE
+) -> Iterator[Tuple[List[FrameworkRow], List[int], List[Dict[str, Any]]]]:
+    """
+    Groups raw rows into validated batches
+
+    Returns:
+        Iterator of (valid rows, their row numbers, errors) per batch of at most batch_size valid rows
+    """
+    batch, row_numbers, errors = [], [], []
+    for row_number, data, error in raw_rows:
+        row = None
+        if error is None:
+            row, error = validate_framework_row(data)
+        if error:
+            errors.append({"row": row_number, "error": error})
+        else:
+            batch.append(row)
+            row_numbers.append(row_number)
+
+        if len(batch) >= batch_size:
+            yield batch, row_numbers, errors
+            batch, row_numbers, errors = [], [], []
+
+    if batch or errors:
+        yield batch, row_numbers, errors
+
+def import_framework(
+    stream: BinaryIO,
+    file_format: str,
+    name: str,
+    description: Optional[str] = None,
+    created_by: Optional[int] = None,
+    batch_size: int = DEFAULT_IMPORT_BATCH_SIZE,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """
+    Imports a framework file as a new framework
+
+    The file is parsed and validated in batches, and each batch is appended to the
+    framework's normalized tables, so memory use is bounded by the batch size.
+
+    Args:
+        stream: Binary file object
+        file_format: One of FRAMEWORK_FILE_FORMATS
+        name: Name of the new framework
+        description: Optional framework description
+        created_by: ID of the importing user
+        batch_size: Number of valid rows validated and inserted at a time
+        dry_run: Only validate the file without saving anything
+
+    Returns:
+        Report with framework_id, rows_read, imported, error_count and the first errors
+    """
+    report = {"framework_id": None, "rows_read": 0, "imported": 0, "error_count": 0, "errors": []}
+
+    def add_errors(errors):
+        report["error_count"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(report["errors"])
+        if room > 0:
+            report["errors"].extend(errors[:room])
+
+    framework_id = None
+    if not dry_run:
+        # No version yet: the first one is recorded with the imported statements below
+        framework_id = save_framework(name, {}, description, created_by=created_by, record_version=False)
+        if not framework_id:
+            add_errors([{"row": None, "error": "Could not create framework"}])
+            return report
+
+    try:
+        for batch, row_numbers, errors in iter_validated_batches(iter_framework_file_rows(stream, file_format), batch_size):
+            report["rows_read"] += len(batch) + len(errors)
+            add_errors(errors)
+            if not batch:
+                continue
+
+            if dry_run:
+                report["imported"] += len(batch)
+                continue
+
+            result = append_framework_statements(framework_id, batch, refresh=False)
+            if result is None:
+                raise RuntimeError(f"Failed to insert rows {row_numbers[0]}-{row_numbers[-1]}")
+            report["imported"] += result["inserted"]
+            add_errors([
+                {"row": row_numbers[index], "error": "Duplicate statement in subcategory"}
+                for index in result["duplicates"]
+            ])
+            logger.info(f"Imported {report['imported']} statements into framework {framework_id}")
+    except Exception as e:
+        logger.error(f"Error importing framework: {str(e)}", exc_info=True)
+        add_errors([{"row": None, "error": str(e)}])
+        if framework_id:
+            delete_framework(framework_id)
+        report["imported"] = 0
+        return report
+
+    if dry_run:
+        return report
+
+    if report["imported"] == 0:
+        delete_framework(framework_id)
+        add_errors([{"row": None, "error": "No valid statements found"}])
+        return report
+
+    refresh_framework_structure(framework_id, created_by=created_by)
+    report["framework_id"] = framework_id
+    return report
+
+def iter_framework_export(framework_id: int, file_format: str, batch_size: int = 1000) -> Iterator[str]:
+    """
+    Streams a framework as CSV, JSONL or nested JSON text chunks
+
+    Empty categories and subcategories are not exported.
+    """
+    rows = iter_framework_statement_rows(framework_id, batch_size)
+
+    if file_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["category", "subcategory", "statement"])
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif file_format == "jsonl":
+        for category, subcategory, statement in rows:
+            yield json.dumps({"category": category, "subcategory": subcategory, "statement": statement}, ensure_ascii=False) + "\n"
+    elif file_format == "json":
+        current_category = current_subcategory = None
+        yield "{"
+        for category, subcategory, statement in rows:
+            if category != current_category:
+                if current_category is not None:
+                    yield "\n    ]\n  },"
+                yield f"\n  {json.dumps(category, ensure_ascii=False)}: {{\n    {json.dumps(subcategory, ensure_ascii=False)}: [\n      "
+            elif subcategory != current_subcategory:
+                yield f"\n    ],\n    {json.dumps(subcategory, ensure_ascii=False)}: [\n      "
+            else:
+                yield ",\n      "
+            yield json.dumps(statement, ensure_ascii=False)
+            current_category, current_subcategory = category, subcategory
+        if current_category is not None:
+            yield "\n    ]\n  }"
+        yield "\n}\n"
+    else:
+        raise ValueError(f"Unsupported framework file format: {file_format}")
+
+def export_framework(framework_id: int, stream, file_format: str) -> None:
+    """Writes a framework to a text stream in the given format"""
+    for chunk in iter_framework_export(framework_id, file_format):
+        stream.write(chunk)
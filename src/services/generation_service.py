@@ -0,0 +1,760 @@
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from services.enrichment_service import (
+    enrich_statement_with_llm, aenrich_statement_with_llm, enrich_statements_multi,
+    resolve_prompt_template, MAX_MULTI_CHUNK_SIZE
+)
+from services.metrics_service import calculate_quality_metrics, acalculate_quality_metrics
+from services.event_loop_service import submit
+from services.enrichment_cache_service import (
+    build_semantic_cache_key, combine_cache_key, lookup_enrichments, lookup_semantic_enrichments, embed_context, store_enrichments
+)
+from services.ai_service import DEFAULT_CHAT_TEMPERATURE, get_task_model
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Defaults for the generation_max_concurrency / generation_timeout_seconds settings
+DEFAULT_MAX_CONCURRENCY = 8
+MAX_CONCURRENCY_LIMIT = 32
+DEFAULT_TIMEOUT_SECONDS = 120
+
+# Default for the multi_statement_chunk_size setting; 1 sends one statement per request
+DEFAULT_MULTI_STATEMENT_CHUNK_SIZE = 1
+
+# Defaults for the progressive_generation_enabled / quiz_page_size settings
+DEFAULT_PROGRESSIVE_GENERATION = False
+DEFAULT_QUIZ_PAGE_SIZE = 5
+MAX_QUIZ_PAGE_SIZE = 20
+
+# Default for the quiz_prefetch_window setting; 0 generates all statements up front
+DEFAULT_PREFETCH_WINDOW = 10
+
+# A pipeline without heartbeats for this long (e.g. the browser tab was closed) pauses
+DEFAULT_PIPELINE_IDLE_SECONDS = 600
+
+# How often coordinating threads without a precise deadline wake up to check their state
+POLL_INTERVAL_SECONDS = 0.5
+
+PROFICIENCY_LEVELS = {
+    1: "Beginner",
+    2: "Basic",
+    3: "Intermediate",
+    4: "Advanced",
+    5: "Expert"
+}
+
+class GenerationTimeoutError(TimeoutError):
+    """Raised (as a result error) when a single generation call exceeds its timeout"""
+
+def get_generation_settings(global_settings: Optional[Dict[str, Any]]) -> Tuple[int, float]:
+    """
+    Returns the concurrency limit and per-call timeout from global settings
+
+    Args:
+        global_settings: The "user_settings" global settings (may be None)
+
+    Returns:
+        Tuple of (max_concurrency, timeout_seconds)
+    """
+    global_settings = global_settings or {}
+    max_concurrency = int(global_settings.get("generation_max_concurrency", DEFAULT_MAX_CONCURRENCY))
+    timeout_seconds = float(global_settings.get("generation_timeout_seconds", DEFAULT_TIMEOUT_SECONDS))
+    return max(1, min(max_concurrency, MAX_CONCURRENCY_LIMIT)), max(1.0, timeout_seconds)
+
+def get_multi_statement_chunk_size(global_settings: Optional[Dict[str, Any]]) -> int:
+    """Returns how many statements are enriched per request when evaluation is disabled"""
+    global_settings = global_settings or {}
+    chunk_size = int(global_settings.get("multi_statement_chunk_size", DEFAULT_MULTI_STATEMENT_CHUNK_SIZE))
+    return max(1, min(chunk_size, MAX_MULTI_CHUNK_SIZE))
+
+def get_progressive_settings(global_settings: Optional[Dict[str, Any]]) -> Tuple[bool, int, int]:
+    """
+    Returns whether the quiz starts before all statements are generated, the page size
+    and how many statements are prefetched ahead of the user
+
+    Returns:
+        Tuple of (progressive_enabled, quiz_page_size, prefetch_window); the window is
+        at least one page, or 0 to generate all statements up front
+    """
+    global_settings = global_settings or {}
+    enabled = bool(global_settings.get("progressive_generation_enabled", DEFAULT_PROGRESSIVE_GENERATION))
+    page_size = max(1, min(int(global_settings.get("quiz_page_size", DEFAULT_QUIZ_PAGE_SIZE)), MAX_QUIZ_PAGE_SIZE))
+    prefetch_window = int(global_settings.get("quiz_prefetch_window", DEFAULT_PREFETCH_WINDOW))
+    return enabled, page_size, max(prefetch_window, page_size) if prefetch_window > 0 else 0
+
+def run_concurrently(
+    func: Callable[[Any], Any],
+    items: Sequence[Any],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Runs func over items on a bounded thread pool
+
+    Results are returned in input order. A failing or timed-out item does not affect
+    the others. Timed-out calls are abandoned: their results are discarded, but the
+    worker thread runs on until the underlying request returns.
+
+    Args:
+        func: Function called with a single item
+        items: Items to process
+        max_concurrency: Maximum number of calls in flight
+        timeout: Seconds a single call may run before it is reported as timed out (None disables)
+        progress_callback: Called as progress_callback(completed, total) from the calling thread
+
+    Returns:
+        List of {"result", "error", "duration"} dictionaries, one per item
+    """
+    total = len(items)
+    if total == 0:
+        return []
+
+    results: List[Optional[Dict[str, Any]]] = [None] * total
+    started: Dict[int, float] = {}
+    started_lock = threading.Lock()
+
+    def call(index, item):
+        with started_lock:
+            started[index] = time.monotonic()
+        return func(item)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, total)), thread_name_prefix="generation")
+    # Each call runs in a copy of the caller's context so telemetry fields (llm_call_context) carry over
+    futures = {executor.submit(contextvars.copy_context().run, call, index, item): index for index, item in enumerate(items)}
+    pending = set(futures)
+    completed = 0
+
+    def next_deadline_in(now):
+        """Seconds until the earliest pending call times out (None without a timeout)"""
+        if not timeout:
+            return None
+        with started_lock:
+            waits = [started[futures[future]] + timeout - now for future in pending if futures[future] in started]
+            # A call that hasn't started yet can't time out sooner than a full timeout from now
+            if len(waits) < len(pending):
+                waits.append(timeout)
+        return max(0.0, min(waits))
+
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=next_deadline_in(time.monotonic()), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+
+            for future in done:
+                index = futures[future]
+                duration = now - started.get(index, now)
+                try:
+                    results[index] = {"result": future.result(), "error": None, "duration": duration}
+                except Exception as e:
+                    logger.error(f"Generation for item {index} failed: {str(e)}")
+                    results[index] = {"result": None, "error": e, "duration": duration}
+                completed += 1
+
+            timed_out = []
+            if timeout:
+                with started_lock:
+                    timed_out = [future for future in pending
+                                 if futures[future] in started and now - started[futures[future]] >= timeout]
+                for future in timed_out:
+                    index = futures[future]
+                    pending.discard(future)
+                    future.cancel()
+                    logger.warning(f"Generation for item {index} timed out after {timeout}s")
+                    results[index] = {
+                        "result": None,
+                        "error": GenerationTimeoutError(f"Timed out after {timeout} seconds"),
+                        "duration": now - started[index]
+                    }
+                    completed += 1
+
+            if progress_callback and (done or timed_out):
+                progress_callback(completed, total)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+def run_concurrently_async(
+    func: Callable[[Any], Awaitable[Any]],
+    items: Sequence[Any],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Awaits func over items on the background event loop (see event_loop_service)
+
+    Same contract as run_concurrently, but a call in flight holds no thread, so the
+    calling thread alone can drive hundreds of requests. Timed-out calls are cancelled.
+    If the calling thread is interrupted (e.g. Streamlit stops the script during a
+    progress_callback), the calls still in flight are cancelled as well.
+
+    Args:
+        func: Coroutine function called with a single item
+        items: Items to process
+        max_concurrency: Maximum number of calls in flight
+        timeout: Seconds a single call may run before it is reported as timed out (None disables)
+        progress_callback: Called as progress_callback(completed, total) from the calling thread
+
+    Returns:
+        List of {"result", "error", "duration"} dictionaries, one per item
+    """
+    total = len(items)
+    if total == 0:
+        return []
+
+    completions: "queue.Queue[Tuple[int, Dict[str, Any]]]" = queue.Queue()
+
+    async def run_one(semaphore: asyncio.Semaphore, index: int, item: Any) -> None:
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(func(item), timeout) if timeout else await func(item)
+                entry = {"result": result, "error": None, "duration": time.monotonic() - start}
+            except asyncio.TimeoutError:
+                logger.warning(f"Generation for item {index} timed out after {timeout}s")
+                entry = {
+                    "result": None,
+                    "error": GenerationTimeoutError(f"Timed out after {timeout} seconds"),
+                    "duration": time.monotonic() - start
+                }
+            except Exception as e:
+                logger.error(f"Generation for item {index} failed: {str(e)}")
+                entry = {"result": None, "error": e, "duration": time.monotonic() - start}
+        completions.put((index, entry))
+
+    async def run_all() -> None:
+        # Created on the loop; each call runs in a copy of the caller's context, as with run_concurrently
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        await asyncio.gather(*(run_one(semaphore, index, item) for index, item in enumerate(items)))
+
+    results: List[Optional[Dict[str, Any]]] = [None] * total
+    future = submit(run_all())
+    completed = 0
+    try:
+        while completed < total:
+            try:
+                index, entry = completions.get(timeout=POLL_INTERVAL_SECONDS)
+            except queue.Empty:
+                if future.done():
+                    # Raises if run_all failed outside the per-item handling (e.g. it was cancelled)
+                    future.result()
+                    break
+                continue
+            results[index] = entry
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, total)
+    finally:
+        future.cancel()
+
+    return results
+
+def get_proficiency_label(proficiency: Any) -> str:
+    """Converts a numeric proficiency level to its label"""
+    if isinstance(proficiency, int):
+        return PROFICIENCY_LEVELS.get(proficiency, "Intermediate")
+    return proficiency or "Intermediate"
+
+def generate_enriched_statement(
+    statement: str,
+    context: str,
+    proficiency: str = "Intermediate",
+    evaluation_enabled: bool = True,
+    max_attempts: int = 5,
+    statement_length: int = 150,
+    prompt_template: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Generates the enriched version of one statement for the quiz
+
+    Safe to call from worker threads: it does not touch Streamlit session state.
+
+    Returns:
+        Dictionary with the enriched statement and its quality metrics
+    """
+    if evaluation_enabled:
+        # Threshold-based generation with multiple attempts
+        from services.statement_evaluation_service import regenerate_until_threshold
+
+        _, enriched, _, _, history = regenerate_until_threshold(
+            context=context,
+            original_statement=statement,
+            proficiency=proficiency,
+            statement_length=statement_length,
+            prompt_template=prompt_template,
+            max_attempts=max_attempts
+        )
+
+        # Get metrics of the returned attempt
+        metrics = next((entry["metrics"] for entry in reversed(history)
+                        if entry["enriched_statement"] == enriched and entry.get("metrics")), None)
+        if metrics is None:
+            metrics = calculate_quality_metrics(statement, enriched)
+    else:
+        # Simple generation (single attempt)
+        enriched = enrich_statement_with_llm(context, statement, statement_length, prompt_template, model_name=get_task_model("enrich"))
+        metrics = calculate_quality_metrics(statement, enriched)
+
+    return {"enriched": enriched, "metrics": metrics}
+
+async def agenerate_enriched_statement(
+    statement: str,
+    context: str,
+    statement_length: int = 150,
+    prompt_template: Optional[str] = None,
+    model_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Async version of generate_enriched_statement without evaluation (single attempt)
+
+    The enrichment and metrics requests both run on the event loop. The threshold-based
+    regeneration loop is synchronous and has no async version.
+
+    Returns:
+        Dictionary with the enriched statement and its quality metrics
+    """
+    enriched = await aenrich_statement_with_llm(
+        context, statement, statement_length, prompt_template, model_name=model_name or get_task_model("enrich")
+    )
+    metrics = await acalculate_quality_metrics(statement, enriched)
+    return {"enriched": enriched, "metrics": metrics}
+
+def _generate_uncached(
+    statements: Sequence[str],
+    context: str,
+    proficiency: str,
+    evaluation_enabled: bool,
+    max_attempts: int,
+    statement_length: int,
+    prompt_template: str,
+    max_concurrency: int,
+    timeout: Optional[float],
+    progress_callback: Optional[Callable[[int, int], None]],
+    chunk_size: int = DEFAULT_MULTI_STATEMENT_CHUNK_SIZE
+) -> List[Dict[str, Any]]:
+    """
+    With evaluation each statement runs its own regeneration loop on the thread pool.
+    Without evaluation every statement is one request on the event loop, driven by the
+    calling thread, or several statements share a request if chunk_size > 1.
+    """
+    if evaluation_enabled:
+        results = run_concurrently(
+            lambda statement: generate_enriched_statement(
+                statement, context, proficiency, evaluation_enabled, max_attempts, statement_length, prompt_template
+            ),
+            statements,
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+            progress_callback=progress_callback
+        )
+    elif chunk_size <= 1:
+        enrichment_model = get_task_model("enrich")
+        results = run_concurrently_async(
+            lambda statement: agenerate_enriched_statement(statement, context, statement_length, prompt_template, enrichment_model),
+            statements,
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+            progress_callback=progress_callback
+        )
+    else:
+        enrichments = enrich_statements_multi(
+            context,
+            statements,
+            statement_length=statement_length,
+            prompt_template=prompt_template,
+            model_name=get_task_model("enrich"),
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+            progress_callback=progress_callback,
+            chunk_size=chunk_size
+        )
+        succeeded = [item for item in enrichments if item["error"] is None]
+        # Embedding requests only wait on the network, so they share the event loop instead of a thread pool
+        metrics_results = iter(run_concurrently_async(
+            lambda item: acalculate_quality_metrics(item["original"], item["enriched"]),
+            succeeded,
+            max_concurrency=max_concurrency,
+            timeout=timeout
+        ))
+
+        results = []
+        for item in enrichments:
+            if item["error"] is not None:
+                results.append({"result": None, "error": item["error"], "duration": None})
+                continue
+            metrics_result = next(metrics_results)
+            if metrics_result["error"] is not None:
+                results.append(metrics_result)
+            else:
+                results.append({
+                    "result": {"enriched": item["enriched"], "metrics": metrics_result["result"]},
+                    "error": None,
+                    "duration": metrics_result["duration"]
+                })
+
+    return results
+
+def _lookup_cache(
+    statements: Sequence[str],
+    context: str,
+    proficiency: str,
+    evaluation_enabled: bool,
+    max_attempts: int,
+    statement_length: int,
+    prompt_template: str,
+    enrichment_model: str,
+    cache_settings: Dict[str, Any]
+) -> Tuple[Dict[int, Dict[str, Any]], List[str], List[str], Optional[List[float]]]:
+    """
+    Looks statements up in the enrichment cache, exactly and then semantically
+
+    Returns:
+        Tuple of (hits by statement index, semantic keys, cache keys, context embedding or None)
+    """
+    total = len(statements)
+    evaluation_settings = {
+        "enabled": evaluation_enabled,
+        "max_attempts": max_attempts if evaluation_enabled else 1,
+        "proficiency": proficiency if evaluation_enabled else None
+    }
+    semantic_keys = [
+        build_semantic_cache_key(
+            prompt_template, statement, statement_length,
+            enrichment_model, DEFAULT_CHAT_TEMPERATURE, evaluation_settings
+        )
+        for statement in statements
+    ]
+    cache_keys = [combine_cache_key(semantic_key, context) for semantic_key in semantic_keys]
+    cached = lookup_enrichments(cache_keys, cache_settings.get("variants", 1))
+    hits = {index: cached[key] for index, key in enumerate(cache_keys) if key in cached}
+
+    context_embedding = None
+    if cache_settings.get("semantic_enabled") and len(hits) < total:
+        # Embedded once per quiz; also stored with new entries so later profiles can match them
+        context_embedding = embed_context(context)
+        if context_embedding is not None:
+            misses = [index for index in range(total) if index not in hits]
+            similar = lookup_semantic_enrichments(
+                [semantic_keys[index] for index in misses],
+                context_embedding,
+                cache_settings.get("semantic_threshold")
+            )
+            for index in misses:
+                if semantic_keys[index] in similar:
+                    hit = similar[semantic_keys[index]]
+                    hits[index] = {"enriched": hit["enriched"], "metrics": hit["metrics"]}
+
+    return hits, semantic_keys, cache_keys, context_embedding
+
+def lookup_cached_enrichments(
+    statements: Sequence[str],
+    context: str,
+    proficiency: str = "Intermediate",
+    evaluation_enabled: bool = True,
+    max_attempts: int = 5,
+    statement_length: int = 150,
+    cache_settings: Optional[Dict[str, Any]] = None
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Returns the statements generate_enriched_statements would serve from the enrichment cache, without generating any
+
+    Returns:
+        {statement index: {"enriched", "metrics"}} of the exact and semantic cache hits
+    """
+    if not (cache_settings and cache_settings.get("enabled")):
+        return {}
+    return _lookup_cache(
+        statements, context, proficiency, evaluation_enabled, max_attempts, statement_length,
+        resolve_prompt_template(), get_task_model("enrich"), cache_settings
+    )[0]
+
+def generate_enriched_statements(
+    statements: Sequence[str],
+    context: str,
+    proficiency: str = "Intermediate",
+    evaluation_enabled: bool = True,
+    max_attempts: int = 5,
+    statement_length: int = 150,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    cache_settings: Optional[Dict[str, Any]] = None,
+    chunk_size: int = DEFAULT_MULTI_STATEMENT_CHUNK_SIZE
+) -> List[Dict[str, Any]]:
+    """
+    Generates enriched statements concurrently, serving repeated inputs from the enrichment cache
+
+    Exact cache misses can be served from an enrichment generated for a similar profile
+    context when the semantic cache is enabled.
+
+    Args:
+        cache_settings: Settings from enrichment_cache_service.get_cache_settings (None disables the cache)
+        chunk_size: Statements per request without evaluation (see get_multi_statement_chunk_size)
+
+    Returns:
+        List in input order of {"result": {"enriched", "metrics"} or None, "error", "duration", "cached"}
+    """
+    start = time.monotonic()
+    total = len(statements)
+    # Resolve the prompt once instead of once per statement
+    prompt_template = resolve_prompt_template()
+
+    cache_enabled = bool(cache_settings and cache_settings.get("enabled"))
+    # Keyed by the model the routing policy starts enrichments on
+    enrichment_model = get_task_model("enrich")
+    hits: Dict[int, Dict[str, Any]] = {}
+    semantic_keys = []
+    cache_keys = []
+    context_embedding = None
+    if cache_enabled:
+        hits, semantic_keys, cache_keys, context_embedding = _lookup_cache(
+            statements, context, proficiency, evaluation_enabled, max_attempts, statement_length,
+            prompt_template, enrichment_model, cache_settings
+        )
+
+    missing_indices = [index for index in range(total) if index not in hits]
+    hit_count = len(hits)
+    if progress_callback and hit_count:
+        progress_callback(hit_count, total)
+
+    generated = _generate_uncached(
+        [statements[index] for index in missing_indices],
+        context,
+        proficiency,
+        evaluation_enabled,
+        max_attempts,
+        statement_length,
+        prompt_template,
+        max_concurrency,
+        timeout,
+        (lambda completed, _: progress_callback(hit_count + completed, total)) if progress_callback else None,
+        chunk_size
+    )
+
+    results: List[Optional[Dict[str, Any]]] = [None] * total
+    for index, hit in hits.items():
+        results[index] = {"result": hit, "error": None, "duration": 0.0, "cached": True}
+    for index, result in zip(missing_indices, generated):
+        results[index] = {**result, "cached": False}
+
+    if cache_enabled:
+        store_enrichments(
+            [{
+                "cache_key": cache_keys[index],
+                "semantic_key": semantic_keys[index],
+                "original": statements[index],
+                "enriched": result["result"]["enriched"],
+                "metrics": result["result"]["metrics"]
+            } for index, result in zip(missing_indices, generated) if result["error"] is None],
+            prompt_template,
+            enrichment_model,
+            DEFAULT_CHAT_TEMPERATURE,
+            statement_length,
+            cache_settings,
+            context=context,
+            context_embedding=context_embedding
+        )
+
+    failed = sum(1 for result in results if result["error"] is not None)
+    logger.info(
+        f"Generated {total - failed}/{total} statements ({hit_count} from cache) in {time.monotonic() - start:.1f}s "
+        f"(concurrency {max_concurrency})"
+    )
+    return results
+
+class GenerationPipeline:
+    """
+    Generates statements on a background thread and hands them over as they complete
+
+    Statements are generated in waves of wave_size through generate_enriched_statements,
+    so each wave uses the full concurrency and still goes through the enrichment cache.
+    With a prefetch window the pipeline only stays that many statements ahead of the
+    position reported by the consumer, so LLM spend follows the statements users reach.
+
+    The consumer polls take_ready() and reports its position (e.g. on every Streamlit
+    rerun); each report is also a heartbeat. Without heartbeats for idle_timeout seconds
+    the thread exits; the next heartbeat resumes it where it stopped. The pipeline never
+    touches Streamlit session state.
+    """
+
+    def __init__(
+        self,
+        statements: Sequence[str],
+        context: str,
+        wave_size: int,
+        prefetch_window: int = 0,
+        idle_timeout: float = DEFAULT_PIPELINE_IDLE_SECONDS,
+        **generation_kwargs
+    ):
+        """
+        Args:
+            statements: Statements to generate, in quiz order
+            context: The enrichment context
+            wave_size: Maximum statements per generate_enriched_statements call
+            prefetch_window: Statements to generate ahead of the consumer's position (0 generates all)
+            idle_timeout: Seconds without heartbeat after which the thread stops until the next one
+            generation_kwargs: Further arguments for generate_enriched_statements
+        """
+        self.statements = list(statements)
+        self.context = context
+        self.wave_size = max(1, wave_size)
+        self.prefetch_window = max(0, prefetch_window)
+        self.idle_timeout = idle_timeout
+        self.generation_kwargs = generation_kwargs
+        self.failed = 0
+        self._ready: List[Tuple[int, Dict[str, Any]]] = []
+        self._generated = 0
+        self._position = 0
+        self._last_heartbeat = time.monotonic()
+        self._condition = threading.Condition()
+        self._cancelled = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._context: Optional[contextvars.Context] = None
+
+    @property
+    def total(self) -> int:
+        return len(self.statements)
+
+    @property
+    def finished(self) -> bool:
+        """True once no more results will arrive (all waves ran or the pipeline was cancelled)"""
+        with self._condition:
+            return self._cancelled.is_set() or self._generated >= self.total
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def remaining(self) -> int:
+        """Statements that have not been handed over yet (excluding failed ones)"""
+        with self._condition:
+            if self._cancelled.is_set():
+                return len(self._ready)
+            return self.total - self._generated + len(self._ready)
+
+    def start(self) -> "GenerationPipeline":
+        """
+        Starts (or resumes) the background thread
+
+        The thread runs in a copy of the context of the first start() call, so telemetry
+        fields (llm_call_context) carry over to resumed runs as well.
+        """
+        with self._condition:
+            if self.running or self.finished:
+                return self
+            if self._context is None:
+                self._context = contextvars.copy_context()
+            self._last_heartbeat = time.monotonic()
+            self._thread = threading.Thread(
+                target=self._context.run, args=(self._run,), name="generation-pipeline", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        """Stops after the wave in flight; its results are discarded"""
+        self._cancelled.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def heartbeat(self, position: Optional[int] = None) -> None:
+        """
+        Signals that the consumer is still there, optionally with its new position
+
+        Args:
+            position: Number of handed-over statements the consumer has reached
+        """
+        with self._condition:
+            self._last_heartbeat = time.monotonic()
+            if position is not None:
+                self._position = max(self._position, position)
+            self._condition.notify_all()
+        if not self.running:
+            self.start()
+
+    def take_ready(self) -> List[Tuple[int, Dict[str, Any]]]:
+        """Returns and clears the completed (statement index, result) pairs, in statement order"""
+        with self._condition:
+            ready, self._ready = self._ready, []
+        return ready
+
+    def has_pending(self) -> bool:
+        """True while results are still expected or waiting to be taken"""
+        with self._condition:
+            return bool(self._ready) or not self.finished
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until results are ready to take, the thread stops or the timeout passes
+
+        Returns:
+            True if results are ready
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while not self._ready and self.running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(POLL_INTERVAL_SECONDS if remaining is None else min(remaining, POLL_INTERVAL_SECONDS))
+            return bool(self._ready)
+
+    def _next_wave_size(self) -> int:
+        """Statements the next wave may generate; 0 while the prefetch window is full (holds the lock)"""
+        size = min(self.wave_size, self.total - self._generated)
+        if self.prefetch_window:
+            # Failed statements never reach the consumer, so they don't count against the window
+            ahead = (self._generated - self.failed) - self._position
+            size = min(size, self.prefetch_window - ahead)
+        return max(0, size)
+
+    def _run(self) -> None:
+        try:
+            while True:
+                with self._condition:
+                    # Wait for room in the prefetch window
+                    while True:
+                        if self._cancelled.is_set() or self._generated >= self.total:
+                            return
+                        if time.monotonic() - self._last_heartbeat > self.idle_timeout:
+                            logger.info(f"Generation pipeline idle; paused after {self._generated}/{self.total} statements")
+                            return
+                        size = self._next_wave_size()
+                        if size:
+                            break
+                        self._condition.wait(POLL_INTERVAL_SECONDS)
+                    offset = self._generated
+
+                wave = self.statements[offset:offset + size]
+                try:
+                    results = generate_enriched_statements(wave, self.context, **self.generation_kwargs)
+                except Exception as e:
+                    logger.error(f"Generation wave at {offset} failed: {str(e)}")
+                    results = [{"result": None, "error": e, "duration": None, "cached": False}] * len(wave)
+                if self._cancelled.is_set():
+                    logger.info(f"Generation pipeline cancelled after {offset}/{self.total} statements")
+                    return
+
+                with self._condition:
+                    for index, result in enumerate(results, start=offset):
+                        if result["error"] is None:
+                            self._ready.append((index, result))
+                        else:
+                            self.failed += 1
+                    self._generated += len(wave)
+                    self._condition.notify_all()
+        finally:
+            with self._condition:
+                self._condition.notify_all()
@@ -0,0 +1,263 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.db.crud._statement_preferences import get_statement_preferences
+from services.db.crud._learned_evaluators import save_learned_evaluator, get_active_learned_evaluator
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Modes of the learned_evaluator_mode setting:
+# gate - candidates the model predicts users won't prefer are rejected before the LLM evaluation
+# replace - the model's prediction decides instead of the LLM evaluation
+LEARNED_EVALUATOR_MODES = ("off", "gate", "replace")
+DEFAULT_LEARNED_EVALUATOR_MODE = "off"
+DEFAULT_LEARNED_MIN_PROBABILITY = 0.5
+
+DEFAULT_MIN_TRAINING_SAMPLES = 50
+DEFAULT_TEST_FRACTION = 0.25
+CALIBRATION_BINS = 5
+
+# Pairs rated within this margin of 0 say nothing about the preference and are left out
+NEUTRAL_SCORE_MARGIN = 0.1
+
+# Computed from the metrics every enrichment already carries, so scoring needs no extra requests
+FEATURE_NAMES = [
+    "cosine_embedding",
+    "cosine_tfidf",
+    "word_count",
+    "character_count",
+    "avg_word_length",
+    "avg_sentence_length",
+    "estimated_reading_ease",
+    "length_ratio",
+    "added_words"
+]
+
+_loaded: Dict[str, Any] = {"evaluator": None, "checked": False}
+_load_lock = threading.Lock()
+
+_stats = {"scored": 0, "rejected": 0, "accepted": 0, "agreements": 0, "compared": 0}
+_stats_lock = threading.Lock()
+
+def extract_features(original: str, enriched: str, metrics: Dict[str, Any]) -> List[float]:
+    """
+    Builds the FEATURE_NAMES vector of a statement pair
+
+    Args:
+        original: The original statement
+        enriched: The enriched statement
+        metrics: Quality metrics of the pair (see metrics_service.calculate_quality_metrics)
+    """
+    readability = metrics.get("readability") or {}
+    original_words = len(original.split())
+    return [
+        float(metrics.get("cosine_embedding", 0.0)),
+        float(metrics.get("cosine_tfidf", 0.0)),
+        float(readability.get("word_count", len(enriched.split()))),
+        float(readability.get("character_count", len(enriched))),
+        float(readability.get("avg_word_length", 0.0)),
+        float(readability.get("avg_sentence_length", 0.0)),
+        float(readability.get("estimated_reading_ease", 0.0)),
+        len(enriched) / max(1, len(original)),
+        float(len(enriched.split()) - original_words)
+    ]
+
+class LearnedEvaluatorModel:
+    """Standardized logistic regression predicting whether users prefer the enriched statement"""
+
+    def __init__(self, feature_names: Sequence[str], parameters: Dict[str, Any], evaluator_id: Optional[int] = None):
+        self.id = evaluator_id
+        self.feature_names = list(feature_names)
+        self.mean = np.asarray(parameters["mean"], dtype=np.float64)
+        self.scale = np.asarray(parameters["scale"], dtype=np.float64)
+        self.coef = np.asarray(parameters["coef"], dtype=np.float64)
+        self.intercept = float(parameters["intercept"])
+
+    def predict_proba(self, features: Sequence[Sequence[float]]) -> np.ndarray:
+        """Returns the probability that the enriched statement is preferred, per row"""
+        standardized = (np.asarray(features, dtype=np.float64) - self.mean) / self.scale
+        return 1.0 / (1.0 + np.exp(-(standardized @ self.coef + self.intercept)))
+
+def get_learned_evaluator_settings(global_settings: Optional[Dict[str, Any]]) -> Tuple[str, float]:
+    """
+    Returns the learned evaluator mode and the probability a candidate needs
+
+    Returns:
+        Tuple of (mode, min_probability); mode is one of LEARNED_EVALUATOR_MODES
+    """
+    global_settings = global_settings or {}
+    mode = global_settings.get("learned_evaluator_mode", DEFAULT_LEARNED_EVALUATOR_MODE)
+    if mode not in LEARNED_EVALUATOR_MODES:
+        mode = DEFAULT_LEARNED_EVALUATOR_MODE
+    min_probability = float(global_settings.get("learned_min_probability", DEFAULT_LEARNED_MIN_PROBABILITY))
+    return mode, min_probability
+
+def build_training_set(preferences: Sequence[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Turns rated statement pairs into features and labels (1 = enriched preferred)
+
+    Pairs without metrics or with a neutral rating are skipped.
+    """
+    features, labels = [], []
+    for preference in preferences:
+        score = preference.get("score")
+        if not preference.get("metrics") or score is None or abs(score) <= NEUTRAL_SCORE_MARGIN:
+            continue
+        features.append(extract_features(preference["original"], preference["enriched"], preference["metrics"]))
+        labels.append(1 if score > 0 else 0)
+    return np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURE_NAMES)), np.asarray(labels, dtype=np.int64)
+
+def calibration_table(probabilities: np.ndarray, labels: np.ndarray, bins: int = CALIBRATION_BINS) -> List[Dict[str, Any]]:
+    """Groups predictions into equal-width probability bins with the observed preference rate of each"""
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    table = []
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (probabilities >= low) & ((probabilities < high) if high < 1.0 else (probabilities <= high))
+        if not in_bin.any():
+            continue
+        table.append({
+            "range": f"{low:.1f}-{high:.1f}",
+            "count": int(in_bin.sum()),
+            "predicted": float(probabilities[in_bin].mean()),
+            "observed": float(labels[in_bin].mean())
+        })
+    return table
+
+def train_learned_evaluator(
+    min_samples: int = DEFAULT_MIN_TRAINING_SAMPLES,
+    test_fraction: float = DEFAULT_TEST_FRACTION,
+    activate: bool = True,
+    random_state: int = 0
+) -> Dict[str, Any]:
+    """
+    Fits the learned evaluator on the stored quiz preferences
+
+    The model is evaluated on a held-out split first, then refitted on all pairs and stored.
+
+    Args:
+        min_samples: Minimum number of usable (non-neutral) rated pairs
+        test_fraction: Share of the pairs held out for the report
+        activate: Whether the new model replaces the active one
+        random_state: Seed of the train/test split
+
+    Returns:
+        Dictionary with evaluator_id and report (samples, positive_rate, accuracy,
+        baseline_accuracy, roc_auc, brier_score, calibration and coefficients)
+
+    Raises:
+        ValueError: If there are too few pairs or only one class
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import accuracy_score, brier_score_loss, roc_auc_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    features, labels = build_training_set(get_statement_preferences())
+    if len(labels) < min_samples:
+        raise ValueError(f"Only {len(labels)} usable rated statement pairs, at least {min_samples} are needed")
+    if len(set(labels.tolist())) < 2:
+        raise ValueError("All rated statement pairs have the same preference")
+
+    def fit(x, y):
+        scaler = StandardScaler().fit(x)
+        model = LogisticRegression(class_weight="balanced", max_iter=1000).fit(scaler.transform(x), y)
+        return scaler, model
+
+    x_train, x_test, y_train, y_test = train_test_split(
+        features, labels, test_size=test_fraction, random_state=random_state, stratify=labels
+    )
+    scaler, model = fit(x_train, y_train)
+    probabilities = model.predict_proba(scaler.transform(x_test))[:, 1]
+    report = {
+        "samples": int(len(labels)),
+        "test_samples": int(len(y_test)),
+        "positive_rate": float(labels.mean()),
+        "accuracy": float(accuracy_score(y_test, probabilities >= 0.5)),
+        "baseline_accuracy": float(max(y_test.mean(), 1 - y_test.mean())),
+        "roc_auc": float(roc_auc_score(y_test, probabilities)) if len(set(y_test.tolist())) > 1 else None,
+        "brier_score": float(brier_score_loss(y_test, probabilities)),
+        "calibration": calibration_table(probabilities, y_test)
+    }
+
+    scaler, model = fit(features, labels)
+    report["coefficients"] = dict(zip(FEATURE_NAMES, model.coef_[0].round(4).tolist()))
+    parameters = {
+        "mean": scaler.mean_.tolist(),
+        # Constant features have a scale of 0 in older scikit-learn versions
+        "scale": np.where(scaler.scale_ == 0, 1.0, scaler.scale_).tolist(),
+        "coef": model.coef_[0].tolist(),
+        "intercept": float(model.intercept_[0])
+    }
+    evaluator_id = save_learned_evaluator(FEATURE_NAMES, parameters, report, len(labels), activate=activate)
+    if evaluator_id is None:
+        raise RuntimeError("Failed to store the learned evaluator")
+
+    if activate:
+        reload_learned_evaluator()
+    logger.info(f"Trained learned evaluator {evaluator_id} on {len(labels)} pairs (accuracy {report['accuracy']:.2f})")
+    return {"evaluator_id": evaluator_id, "report": report}
+
+def get_learned_evaluator() -> Optional[LearnedEvaluatorModel]:
+    """Returns the active learned evaluator, loading it once per process"""
+    with _load_lock:
+        if not _loaded["checked"]:
+            record = get_active_learned_evaluator()
+            if record and record["feature_names"] == FEATURE_NAMES:
+                _loaded["evaluator"] = LearnedEvaluatorModel(record["feature_names"], record["parameters"], record["id"])
+            elif record:
+                logger.warning("The active learned evaluator uses other features, retrain it with manage.py train-evaluator")
+            _loaded["checked"] = True
+        return _loaded["evaluator"]
+
+def reload_learned_evaluator() -> None:
+    """Drops the loaded evaluator so the next call picks up the active one"""
+    with _load_lock:
+        _loaded["evaluator"] = None
+        _loaded["checked"] = False
+
+def predict_preference(original: str, enriched: str, metrics: Dict[str, Any]) -> Optional[float]:
+    """
+    Predicts the probability that users prefer the enriched statement
+
+    Returns:
+        Probability, or None if no learned evaluator is trained
+    """
+    evaluator = get_learned_evaluator()
+    if evaluator is None:
+        return None
+    probability = float(evaluator.predict_proba([extract_features(original, enriched, metrics)])[0])
+    with _stats_lock:
+        _stats["scored"] += 1
+    return probability
+
+def record_learned_decision(accepted: bool, evaluator_accepted: Optional[bool] = None) -> None:
+    """
+    Counts a decision of the learned evaluator
+
+    Args:
+        accepted: Whether the candidate reached the probability threshold
+        evaluator_accepted: The LLM evaluator's verdict on the same candidate, if it ran
+    """
+    with _stats_lock:
+        _stats["accepted" if accepted else "rejected"] += 1
+        if evaluator_accepted is not None:
+            _stats["compared"] += 1
+            _stats["agreements"] += int(accepted == evaluator_accepted)
+
+def get_learned_evaluator_stats() -> Dict[str, Any]:
+    """
+    Returns learned evaluator counters since process start
+
+    Returns:
+        Dictionary with scored, accepted, rejected, compared (candidates the LLM also
+        evaluated) and agreement (share of those where both agreed, or None)
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["agreement"] = stats["agreements"] / stats["compared"] if stats["compared"] else None
+    return stats
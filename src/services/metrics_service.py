@@ -1,3 +1,4 @@
+import asyncio
 import numpy as np
 from services.embedding_service import load_embedding_model
 from typing import Dict, Any, Optional
@@ -34,28 +35,49 @@ def calculate_quality_metrics(original: str, enriched: str) -> Dict[str, Any]:
         print("DEBUG: Getting embeddings for enriched text")
         enriched_embedding = embedding_model.embed_query(enriched)
         
-        # Calculate cosine similarity
-        print("DEBUG: Calculating cosine similarity")
-        embedding_sim = calculate_cosine_similarity(original_embedding, enriched_embedding)
-        
-        # TF-IDF similarity (improved calculation)
-        print("DEBUG: Calculating TF-IDF similarity")
-        tfidf_sim = calculate_tfidf_similarity(original, enriched)
-        
-        # Enhanced readability metrics
-        print("DEBUG: Calculating readability metrics")
-        readability = calculate_readability_metrics(enriched)
-        
+        metrics = build_quality_metrics(original, enriched, original_embedding, enriched_embedding)
         print("DEBUG: Metrics calculation completed successfully")
-        return {
-            "cosine_tfidf": float(tfidf_sim),
-            "cosine_embedding": float(embedding_sim),
-            "readability": readability
-        }
+        return metrics
     except Exception as e:
         print(f"DEBUG: Error calculating metrics: {e}")
         raise 
 
+async def acalculate_quality_metrics(original: str, enriched: str) -> Dict[str, Any]:
+    """
+    Async version of calculate_quality_metrics
+    
+    Both statements are embedded concurrently, as separate queries so identical
+    statements in flight share a request (see ai_service.CoalescingOpenAIEmbeddings).
+    
+    Raises:
+        ValueError: If empty strings are provided
+    """
+    if not original or not enriched:
+        raise ValueError("Empty string provided for metrics calculation")
+    
+    embedding_model = load_embedding_model()
+    original_embedding, enriched_embedding = await asyncio.gather(
+        embedding_model.aembed_query(original), embedding_model.aembed_query(enriched)
+    )
+    return build_quality_metrics(original, enriched, original_embedding, enriched_embedding)
+
+def build_quality_metrics(original: str, enriched: str, original_embedding, enriched_embedding) -> Dict[str, Any]:
+    """Combines the embedding similarity with the TF-IDF similarity and readability metrics"""
+    # Calculate cosine similarity
+    embedding_sim = calculate_cosine_similarity(original_embedding, enriched_embedding)
+    
+    # TF-IDF similarity (improved calculation)
+    tfidf_sim = calculate_tfidf_similarity(original, enriched)
+    
+    # Enhanced readability metrics
+    readability = calculate_readability_metrics(enriched)
+    
+    return {
+        "cosine_tfidf": float(tfidf_sim),
+        "cosine_embedding": float(embedding_sim),
+        "readability": readability
+    }
+
 def calculate_cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
     """Calculate cosine similarity between two vectors."""
     return float(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
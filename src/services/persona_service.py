@@ -0,0 +1,306 @@
+import contextvars
+import logging
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+from services.ai_service import get_embedding_model, llm_priority
+from services.db.crud._profiles import get_all_profiles
+from services.db.crud._personas import (
+    create_personas, save_persona_enrichments, activate_personas, get_personas, get_persona_enrichments
+)
+from services.db.crud._settings import get_global_settings
+from services.db.crud._statement_catalog import compute_statement_hash
+from services.enrichment_service import resolve_prompt_template
+from services.enrichment_cache_service import compute_prompt_hash
+from services.generation_service import (
+    generate_enriched_statement, generate_enriched_statements, run_concurrently, get_generation_settings, get_proficiency_label
+)
+from services.statement_service import get_all_statements
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Defaults for the persona_* global settings
+DEFAULT_PERSONA_COUNT = 8
+DEFAULT_PERSONA_SERVING_ENABLED = False
+DEFAULT_PERSONA_MIN_SIMILARITY = 0.85
+DEFAULT_PERSONA_REFINEMENT_ENABLED = True
+
+PROFILE_FIELDS = ("job_role", "job_domain", "years_experience", "digital_proficiency", "primary_tasks")
+
+def get_persona_settings(global_settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Returns the persona serving settings from global settings
+
+    Returns:
+        Dictionary with enabled, min_similarity and refinement_enabled
+    """
+    global_settings = global_settings or {}
+    return {
+        "enabled": bool(global_settings.get("persona_serving_enabled", DEFAULT_PERSONA_SERVING_ENABLED)),
+        "min_similarity": float(global_settings.get("persona_min_similarity", DEFAULT_PERSONA_MIN_SIMILARITY)),
+        "refinement_enabled": bool(global_settings.get("persona_refinement_enabled", DEFAULT_PERSONA_REFINEMENT_ENABLED))
+    }
+
+def build_profile_context(profile: Dict[str, Any]) -> str:
+    """Builds the enrichment context from a user profile"""
+    return ", ".join(
+        [f"{k.replace('_', ' ').title()}: {v}" for k, v in profile.items() if v]
+    )
+
+def get_persona_statements() -> List[str]:
+    """Returns every statement of the active statement source plus the custom statements"""
+    statements = list(get_all_statements())
+    global_settings = get_global_settings("user_settings") or {}
+    statements.extend(global_settings.get("custom_statements", []))
+    return list(dict.fromkeys(statements))
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def cluster_profiles(
+    embeddings: Sequence[Sequence[float]],
+    n_clusters: int,
+    random_state: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Clusters profile context embeddings with k-means
+
+    Embeddings are normalized first so that Euclidean k-means groups by cosine similarity.
+
+    Returns:
+        List of clusters with centroid (normalized), members (indices) and representative
+        (index of the member closest to the centroid)
+    """
+    vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    n_clusters = max(1, min(n_clusters, len(vectors)))
+    kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=random_state).fit(vectors)
+
+    centroids = _normalize_rows(kmeans.cluster_centers_)
+    clusters = []
+    for label, centroid in enumerate(centroids):
+        members = np.flatnonzero(kmeans.labels_ == label)
+        if len(members) == 0:
+            continue
+        representative = int(members[np.argmax(vectors[members] @ centroid)])
+        clusters.append({
+            "centroid": centroid.tolist(),
+            "members": members.tolist(),
+            "representative": representative
+        })
+    return clusters
+
+def build_personas(
+    n_clusters: int = DEFAULT_PERSONA_COUNT,
+    statements: Optional[List[str]] = None,
+    statement_length: int = 150,
+    max_attempts: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Clusters all user profiles into personas and pre-enriches statements for each persona
+
+    Every statement goes through regenerate_until_threshold with the context of the
+    profile closest to the persona centre. Enrichments are accepted against the
+    difficulty window of that proficiency, so profiles are clustered within each
+    proficiency level. The new personas replace the previous ones only after all of
+    their enrichments are stored.
+
+    Args:
+        n_clusters: Number of personas, split across the proficiency levels by their share of
+            profiles (at least one per level, capped by the number of distinct profiles)
+        statements: Statements to enrich, defaults to get_persona_statements()
+        statement_length: Target length of the enriched statements
+        max_attempts: Regeneration attempts per statement (evaluation settings by default)
+        max_concurrency: Parallel generations, defaults to the generation settings
+        timeout: Seconds per generation, defaults to the generation settings
+        progress_callback: Called as progress_callback(completed, total) over all persona statements
+
+    Returns:
+        Dictionary with personas, profiles, statements, enriched and failed counts
+    """
+    global_settings = get_global_settings("user_settings")
+    default_concurrency, default_timeout = get_generation_settings(global_settings)
+    max_concurrency = max_concurrency or default_concurrency
+    timeout = timeout or default_timeout
+    if max_attempts is None and global_settings:
+        max_attempts = global_settings.get("evaluation_max_attempts")
+    statements = statements if statements is not None else get_persona_statements()
+
+    # One entry per distinct context; identical profiles only add weight
+    profiles_by_context: Dict[str, List[Dict[str, Any]]] = {}
+    for profile in get_all_profiles() or []:
+        context = build_profile_context({field: profile.get(field) for field in PROFILE_FIELDS})
+        if context:
+            profiles_by_context.setdefault(context, []).append(profile)
+
+    report = {"personas": 0, "profiles": sum(len(p) for p in profiles_by_context.values()),
+              "statements": len(statements), "enriched": 0, "failed": 0}
+    if not profiles_by_context or not statements:
+        logger.warning("No profiles or statements to build personas from")
+        return report
+
+    contexts = list(profiles_by_context)
+    embeddings = get_embedding_model().embed_documents(contexts)
+
+    # The context includes the proficiency, so all profiles of a context share it
+    levels: Dict[str, List[int]] = {}
+    for index, context in enumerate(contexts):
+        proficiency = get_proficiency_label(profiles_by_context[context][0].get("digital_proficiency"))
+        levels.setdefault(proficiency, []).append(index)
+
+    clusters = []
+    for proficiency, indices in levels.items():
+        level_clusters = max(1, round(n_clusters * len(indices) / len(contexts)))
+        for cluster in cluster_profiles([embeddings[index] for index in indices], level_clusters):
+            clusters.append({
+                "centroid": cluster["centroid"],
+                "members": [indices[member] for member in cluster["members"]],
+                "representative": indices[cluster["representative"]],
+                "proficiency": proficiency
+            })
+
+    prompt_template = resolve_prompt_template()
+    personas = []
+    for cluster in clusters:
+        members = [profile for index in cluster["members"] for profile in profiles_by_context[contexts[index]]]
+        roles = Counter(profile.get("job_role") for profile in members if profile.get("job_role"))
+        personas.append({
+            "label": roles.most_common(1)[0][0] if roles else f"Persona {len(personas) + 1}",
+            "context": contexts[cluster["representative"]],
+            "proficiency": cluster["proficiency"],
+            "centroid": cluster["centroid"],
+            "profile_count": len(members),
+            "prompt_hash": compute_prompt_hash(prompt_template),
+            "statement_length": statement_length
+        })
+
+    persona_ids = create_personas(personas)
+    if not persona_ids:
+        raise RuntimeError("Failed to store personas")
+
+    total = len(persona_ids) * len(statements)
+    for number, (persona_id, persona) in enumerate(zip(persona_ids, personas)):
+        logger.info(f"Pre-enriching {len(statements)} statements for persona '{persona['label']}'")
+        offset = number * len(statements)
+        # Offline work yields to interactive requests in the LLM scheduler
+        with llm_priority("background"):
+            results = run_concurrently(
+                lambda statement: generate_enriched_statement(
+                    statement, persona["context"], persona["proficiency"], True,
+                    max_attempts, statement_length, prompt_template
+                ),
+                statements,
+                max_concurrency=max_concurrency,
+                timeout=timeout,
+                progress_callback=(lambda completed, _: progress_callback(offset + completed, total)) if progress_callback else None
+            )
+
+        enrichments = [{
+            "statement_hash": compute_statement_hash(statement),
+            "original": statement,
+            "enriched": result["result"]["enriched"],
+            "metrics": result["result"]["metrics"]
+        } for statement, result in zip(statements, results) if result["error"] is None]
+        report["enriched"] += save_persona_enrichments(persona_id, enrichments)
+        report["failed"] += len(statements) - len(enrichments)
+
+    activate_personas(persona_ids)
+    report["personas"] = len(persona_ids)
+    logger.info(f"Built {report['personas']} personas with {report['enriched']} enrichments ({report['failed']} failed)")
+    return report
+
+def find_nearest_persona(
+    context_embedding: Sequence[float],
+    proficiency: str,
+    prompt_hash: str,
+    statement_length: int,
+    min_similarity: float = DEFAULT_PERSONA_MIN_SIMILARITY
+) -> Tuple[Optional[Dict[str, Any]], float]:
+    """
+    Maps a profile context to the closest active persona of the same proficiency level
+
+    Contexts differing only in the proficiency embed very close together, so the level
+    is matched exactly rather than through the similarity.
+
+    Returns:
+        Tuple of (persona or None if none is similar enough, cosine similarity)
+    """
+    personas = [persona for persona in get_personas(prompt_hash)
+                if persona["proficiency"] == proficiency and persona["statement_length"] == statement_length
+                and len(persona["centroid"]) == len(context_embedding)]
+    if not personas:
+        return None, 0.0
+
+    query = np.asarray(context_embedding, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1.0)
+    similarities = _normalize_rows(np.asarray([persona["centroid"] for persona in personas], dtype=np.float32)) @ query
+    best = int(np.argmax(similarities))
+    similarity = float(similarities[best])
+    return (personas[best] if similarity >= min_similarity else None), similarity
+
+def get_persona_enrichments_for_context(
+    statements: Sequence[str],
+    context_embedding: Sequence[float],
+    proficiency: str,
+    statement_length: int = 150,
+    min_similarity: float = DEFAULT_PERSONA_MIN_SIMILARITY
+) -> Tuple[Optional[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """
+    Serves precomputed enrichments of the persona nearest to a profile context
+
+    Args:
+        proficiency: Proficiency label of the profile; only personas of that level are served
+
+    Returns:
+        Tuple of (persona or None, {statement index: {"enriched", "metrics"}})
+    """
+    persona, similarity = find_nearest_persona(
+        context_embedding, proficiency, compute_prompt_hash(resolve_prompt_template()), statement_length, min_similarity
+    )
+    if persona is None:
+        return None, {}
+
+    hashes = [compute_statement_hash(statement) for statement in statements]
+    enrichments = get_persona_enrichments(persona["id"], hashes)
+    served = {index: enrichments[statement_hash] for index, statement_hash in enumerate(hashes) if statement_hash in enrichments}
+    logger.info(f"Serving {len(served)}/{len(statements)} statements from persona '{persona['label']}' (similarity {similarity:.2f})")
+    return persona, served
+
+def refine_in_background(
+    statements: Sequence[str],
+    context: str,
+    cache_settings: Dict[str, Any],
+    **generation_kwargs
+) -> Optional[threading.Thread]:
+    """
+    Generates personalized enrichments on a background thread
+
+    The results go into the enrichment cache, so the user's next quiz is personalized
+    instead of persona-based. Requires the enrichment cache to be enabled.
+
+    Returns:
+        The started thread, or None if there is nothing to refine
+    """
+    if not statements or not cache_settings.get("enabled"):
+        return None
+
+    def refine():
+        try:
+            with llm_priority("background"):
+                generate_enriched_statements(list(statements), context, cache_settings=cache_settings, **generation_kwargs)
+        except Exception as e:
+            logger.error(f"Background persona refinement failed: {str(e)}")
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(refine,), name="persona-refinement", daemon=True)
+    thread.start()
+    return thread
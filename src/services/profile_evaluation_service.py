@@ -4,37 +4,25 @@ import json
 from typing import Dict, Any, Optional, List, Tuple
 
 from langchain.prompts import ChatPromptTemplate
-from services.ai_service import get_llm_model
+from services.ai_service import get_llm_model, call_with_escalation, acall_with_escalation
+from services.telemetry_service import llm_call_context
 
 logger = logging.getLogger(__name__)
 
-def evaluate_profile_with_ai(profile_data: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Evaluate user profile data with AI and provide suggestions for improvement.
-    
-    Args:
-        profile_data: Dictionary containing user profile information
-        
-    Returns:
-        Dictionary with evaluation results and suggestions
-    """
+def _contains_json_object(result: Any) -> bool:
+    """Returns whether a model response contains a parseable JSON object"""
+    text = result.content
+    start, end = text.find('{'), text.rfind('}') + 1
+    if start < 0 or end <= start:
+        return False
     try:
-        # Extract profile fields
-        primary_tasks = profile_data.get("primary_tasks", "")
-        job_role = profile_data.get("job_role", "")
-        job_domain = profile_data.get("job_domain", "")
-        years_experience = profile_data.get("years_experience", 0)
-        digital_proficiency = profile_data.get("digital_proficiency", 3)
-        
-        if not primary_tasks or not job_role or not job_domain:
-            return {
-                "is_good": True,  # Default to true if no data to evaluate
-                "feedback": "",
-                "suggestion": ""
-            }
-        
-        # Create the evaluation prompt with improved criteria based on completeness, clarity, and credibility
-        prompt = ChatPromptTemplate.from_template("""
+        json.loads(text[start:end])
+        return True
+    except json.JSONDecodeError:
+        return False
+
+# Evaluation criteria: completeness, clarity and credibility, plus an improved tasks description
+PROFILE_EVALUATION_PROMPT = """
         You are an expert career coach helping users create effective digital skills profiles.
         
         User information:
@@ -77,91 +65,159 @@ def evaluate_profile_with_ai(profile_data: Dict[str, Any]) -> Dict[str, Any]:
         - completeness: integer (1-5 score)
         - clarity: integer (1-5 score)
         - credibility: integer (1-5 score)
-        """)
-        
-        # Get the LLM model
-        llm = get_llm_model(temperature=0.2)  # Lower temperature for more consistent responses
-        
-        # Create the chain and run it
-        chain = prompt | llm
-        
-        # Convert digital_proficiency to text label for better context
-        proficiency_labels = {
-            1: "Beginner",
-            2: "Basic",
-            3: "Intermediate", 
-            4: "Advanced",
-            5: "Expert"
-        }
-        
-        digital_proficiency_label = proficiency_labels.get(
-            digital_proficiency if isinstance(digital_proficiency, int) else 3, 
-            "Intermediate"
-        )
-        
-        # Execute the chain
-        result = chain.invoke({
-            "job_role": job_role,
-            "job_domain": job_domain,
-            "years_experience": years_experience,
-            "digital_proficiency": digital_proficiency_label,
-            "primary_tasks": primary_tasks
-        })
-        
-        # Parse the result - the model should return JSON
-        try:
-            # Try to extract JSON from the response
-            response_text = result.content
-            # Find JSON content (in case the model added extra text)
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = response_text[json_start:json_end]
-                evaluation = json.loads(json_str)
-                
-                # Determine if the profile is good based on scores
-                scores = [
-                    evaluation.get("completeness", 0),
-                    evaluation.get("clarity", 0),
-                    evaluation.get("credibility", 0)
-                ]
-                
-                # Profile is good if all scores are at least 3
-                is_good = all(score >= 3 for score in scores)
-                evaluation["is_good"] = is_good
-                
-                # Ensure all expected keys are present
-                if "feedback" not in evaluation:
-                    evaluation["feedback"] = "Please provide valid information in all fields."
-                if "suggestion" not in evaluation:
-                    evaluation["suggestion"] = primary_tasks
-                if "invalid_fields" not in evaluation:
-                    evaluation["invalid_fields"] = []
-            else:
-                # Fallback if no JSON found
-                evaluation = {
-                    "is_good": False,
-                    "feedback": "Unable to analyze the input properly. Please ensure all fields contain valid information.",
-                    "suggestion": primary_tasks,
-                    "invalid_fields": []
-                }
-        except json.JSONDecodeError:
-            # Fallback if JSON parsing fails
+        """
+
+# Digital proficiency levels as the prompt names them
+PROFICIENCY_LABELS = {
+    1: "Beginner",
+    2: "Basic",
+    3: "Intermediate", 
+    4: "Advanced",
+    5: "Expert"
+}
+
+# Default to true if no data to evaluate
+INCOMPLETE_PROFILE_EVALUATION = {
+    "is_good": True,
+    "feedback": "",
+    "suggestion": ""
+}
+
+def _build_profile_inputs(profile_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Returns the prompt variables of a profile, or None if it lacks the fields to evaluate"""
+    # Extract profile fields
+    primary_tasks = profile_data.get("primary_tasks", "")
+    job_role = profile_data.get("job_role", "")
+    job_domain = profile_data.get("job_domain", "")
+    years_experience = profile_data.get("years_experience", 0)
+    digital_proficiency = profile_data.get("digital_proficiency", 3)
+    
+    if not primary_tasks or not job_role or not job_domain:
+        return None
+    
+    # Convert digital_proficiency to text label for better context
+    digital_proficiency_label = PROFICIENCY_LABELS.get(
+        digital_proficiency if isinstance(digital_proficiency, int) else 3, 
+        "Intermediate"
+    )
+    
+    return {
+        "job_role": job_role,
+        "job_domain": job_domain,
+        "years_experience": years_experience,
+        "digital_proficiency": digital_proficiency_label,
+        "primary_tasks": primary_tasks
+    }
+
+def _parse_profile_evaluation(result: Any, primary_tasks: str) -> Dict[str, Any]:
+    """Turns the model's answer into the evaluation dictionary, with safe fallbacks"""
+    # Parse the result - the model should return JSON
+    try:
+        # Try to extract JSON from the response
+        response_text = result.content
+        # Find JSON content (in case the model added extra text)
+        json_start = response_text.find('{')
+        json_end = response_text.rfind('}') + 1
+        if json_start >= 0 and json_end > json_start:
+            json_str = response_text[json_start:json_end]
+            evaluation = json.loads(json_str)
+            
+            # Determine if the profile is good based on scores
+            scores = [
+                evaluation.get("completeness", 0),
+                evaluation.get("clarity", 0),
+                evaluation.get("credibility", 0)
+            ]
+            
+            # Profile is good if all scores are at least 3
+            is_good = all(score >= 3 for score in scores)
+            evaluation["is_good"] = is_good
+            
+            # Ensure all expected keys are present
+            if "feedback" not in evaluation:
+                evaluation["feedback"] = "Please provide valid information in all fields."
+            if "suggestion" not in evaluation:
+                evaluation["suggestion"] = primary_tasks
+            if "invalid_fields" not in evaluation:
+                evaluation["invalid_fields"] = []
+        else:
+            # Fallback if no JSON found
             evaluation = {
                 "is_good": False,
                 "feedback": "Unable to analyze the input properly. Please ensure all fields contain valid information.",
                 "suggestion": primary_tasks,
                 "invalid_fields": []
             }
+    except json.JSONDecodeError:
+        # Fallback if JSON parsing fails
+        evaluation = {
+            "is_good": False,
+            "feedback": "Unable to analyze the input properly. Please ensure all fields contain valid information.",
+            "suggestion": primary_tasks,
+            "invalid_fields": []
+        }
+    
+    return evaluation
+
+def _error_evaluation(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    # Return a safe default
+    return {
+        "is_good": False,
+        "feedback": "An error occurred during evaluation. Please try again.",
+        "suggestion": profile_data.get("primary_tasks", "") if isinstance(profile_data, dict) else "",
+        "invalid_fields": []
+    }
+
+def evaluate_profile_with_ai(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Evaluate user profile data with AI and provide suggestions for improvement.
+    
+    Args:
+        profile_data: Dictionary containing user profile information
+        
+    Returns:
+        Dictionary with evaluation results and suggestions
+    """
+    try:
+        inputs = _build_profile_inputs(profile_data)
+        if inputs is None:
+            return dict(INCOMPLETE_PROFILE_EVALUATION)
         
-        return evaluation
+        prompt = ChatPromptTemplate.from_template(PROFILE_EVALUATION_PROMPT)
+        
+        # Execute the chain on the routed model (lower temperature for more consistent responses),
+        # escalating to a stronger model if the answer contains no JSON object
+        def run_chain(model_name):
+            chain = prompt | get_llm_model(model_name, temperature=0.2)
+            return chain.invoke(inputs)
+        
+        with llm_call_context(operation="profile_evaluation"):
+            result = call_with_escalation("profile_eval", run_chain, accept=_contains_json_object)
+        
+        return _parse_profile_evaluation(result, inputs["primary_tasks"])
         
     except Exception as e:
         logger.error(f"Error evaluating profile with AI: {str(e)}", exc_info=True)
-        # Return a safe default
-        return {
-            "is_good": False,
-            "feedback": "An error occurred during evaluation. Please try again.",
-            "suggestion": primary_tasks if 'primary_tasks' in locals() else "",
-            "invalid_fields": []
-        }
\ No newline at end of file
+        return _error_evaluation(profile_data)
+
+async def aevaluate_profile_with_ai(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Async version of evaluate_profile_with_ai"""
+    try:
+        inputs = _build_profile_inputs(profile_data)
+        if inputs is None:
+            return dict(INCOMPLETE_PROFILE_EVALUATION)
+        
+        prompt = ChatPromptTemplate.from_template(PROFILE_EVALUATION_PROMPT)
+        
+        async def run_chain(model_name):
+            chain = prompt | get_llm_model(model_name, temperature=0.2)
+            return await chain.ainvoke(inputs)
+        
+        with llm_call_context(operation="profile_evaluation"):
+            result = await acall_with_escalation("profile_eval", run_chain, accept=_contains_json_object)
+        
+        return _parse_profile_evaluation(result, inputs["primary_tasks"])
+        
+    except Exception as e:
+        logger.error(f"Error evaluating profile with AI: {str(e)}", exc_info=True)
+        return _error_evaluation(profile_data)
\ No newline at end of file
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_registry: Dict[str, "SingleFlight"] = {}
+_registry_lock = threading.Lock()
+
+def make_flight_key(*parts: Any) -> str:
+    """Hash of everything that determines a request's result"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class _Flight:
+    """One in-flight call and the callers waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution
+
+    The first caller of a key runs the call; callers arriving while it is in flight
+    wait and get its result, or its exception raised again. Nothing is kept once the
+    call finishes, so this only deduplicates requests in flight (caching is up to the
+    caller). Blocking (do) and async (ado) callers of a key share the same flight. If
+    an async leader is cancelled, its followers don't inherit the cancellation; one
+    of them runs the call instead.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {"executed": 0, "shared": 0, "errors": 0}
+        with _registry_lock:
+            _registry[name] = self
+
+    def _join(self, key: str) -> Tuple[_Flight, bool]:
+        """Returns the key's flight and whether the caller leads it (runs the call)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["shared"] += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self._stats["executed"] += 1
+            return flight, True
+
+    def _land(self, key: str, flight: _Flight, result: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            del self._flights[key]
+            flight.result, flight.error = result, error
+            if error is not None and not isinstance(error, asyncio.CancelledError):
+                self._stats["errors"] += 1
+            # Set under the lock, so a follower either sees it or is in async_waiters
+            flight.done.set()
+            waiters = list(flight.async_waiters)
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(lambda future=future: future.done() or future.set_result(None))
+
+    @staticmethod
+    def _outcome(flight: _Flight) -> Any:
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def do(self, key: str, call: Callable[[], T]) -> T:
+        """
+        Runs call, or waits for the identical call already in flight
+
+        Args:
+            key: Request hash (see make_flight_key)
+            call: Function making the request
+
+        Returns:
+            The call's result
+
+        Raises:
+            The call's exception, in the leader and in every follower
+        """
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                try:
+                    result = call()
+                except BaseException as e:
+                    self._land(key, flight, error=e)
+                    raise
+                self._land(key, flight, result)
+                return result
+
+            flight.done.wait()
+            if not isinstance(flight.error, asyncio.CancelledError):
+                return self._outcome(flight)
+
+    async def ado(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Async version of do; call returns the awaitable making the request"""
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                try:
+                    result = await call()
+                except BaseException as e:
+                    self._land(key, flight, error=e)
+                    raise
+                self._land(key, flight, result)
+                return result
+
+            with self._lock:
+                if not flight.done.is_set():
+                    waiter = asyncio.get_running_loop().create_future()
+                    flight.async_waiters.append((asyncio.get_running_loop(), waiter))
+                else:
+                    waiter = None
+            if waiter is not None:
+                await waiter
+            if not isinstance(flight.error, asyncio.CancelledError):
+                return self._outcome(flight)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns executed (requests made), shared (calls served by another's request), errors and in_flight"""
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._flights)}
+
+def get_single_flight_stats() -> Dict[str, Dict[str, int]]:
+    """Returns the counters of every SingleFlight since process start, by name"""
+    with _registry_lock:
+        flights = dict(_registry)
+    return {name: flight.get_stats() for name, flight in flights.items()}
@@ -1,26 +1,63 @@
+import contextvars
+import hashlib
+import json
 import logging
+import math
+import random
 import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Tuple, Any, Optional
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.messages import AIMessage, HumanMessage
 
-from services.ai_service import get_chat_model
-from services.enrichment_service import enrich_statement_with_llm, DEFAULT_PROMPT, BASIC_PROMPT, DIGCOMP_FEW_SHOT_PROMPT, GENERAL_FEW_SHOT_PROMPT
+from services.ai_service import get_chat_model, get_task_model, get_routing_policy, can_escalate, call_with_escalation, record_tier_outcome
+from services.telemetry_service import llm_call_context
+from services.enrichment_service import enrich_statement_with_llm, enrich_statement_with_self_assessment, resolve_prompt_template, SELF_ASSESSMENT_SCORES, parse_rubric_scores, DEFAULT_PROMPT, BASIC_PROMPT, DIGCOMP_FEW_SHOT_PROMPT, GENERAL_FEW_SHOT_PROMPT
 from services.metrics_service import calculate_quality_metrics
+from services.candidate_filter_service import prefilter_candidate, get_prefilter_settings
+from services.learned_evaluator_service import predict_preference, record_learned_decision, get_learned_evaluator_settings
+from services.attempt_budget_service import AttemptBudget, get_adaptive_attempt_settings
+from services.db.crud._evaluation_cache import get_cached_evaluation, save_cached_evaluation
+from services.single_flight_service import SingleFlight, make_flight_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Evaluation prompt
-EVALUATION_PROMPT = """You are an expert evaluator of digital skills statements.
+# Defaults for the speculative_candidates / speculative_rounds settings; one candidate per round is the sequential loop
+DEFAULT_SPECULATIVE_CANDIDATES = 1
+MAX_SPECULATIVE_CANDIDATES = 5
 
-ORIGINAL STATEMENT:
-{original_statement}
+# Defaults for the self_assessment_enabled / self_assessment_calibration_rate settings
+DEFAULT_SELF_ASSESSMENT_ENABLED = False
+DEFAULT_CALIBRATION_RATE = 0.1
 
-ENRICHED STATEMENT:
-{enriched_statement}
+# Self-assessed vs independent scores of the calibration samples since process start
+_calibration_samples: List[Tuple[Dict[str, int], Dict[str, int], str]] = []
+_calibration_lock = threading.Lock()
+MAX_CALIBRATION_SAMPLES = 1000
+
+# Version of EVALUATION_PROMPT and its scoring criteria; bump it when either changes so
+# that evaluations cached under the previous rubric are no longer used
+RUBRIC_VERSION = 2
+
+# Requests per evaluation when the model's answer doesn't match the schema
+EVALUATION_PARSE_ATTEMPTS = 2
+
+# Evaluations kept in memory in front of the evaluation_cache table
+EVALUATION_MEMORY_CACHE_SIZE = 2048
+
+_evaluation_memory_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_evaluation_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "parse_retries": 0, "parse_failures": 0}
+_evaluation_lock = threading.Lock()
+
+# Evaluation prompt
+EVALUATION_PROMPT = """You are an expert evaluator of digital skills statements.
 
 TASK:
 Evaluate the enriched statement based on the following criteria:
@@ -29,19 +66,177 @@ Evaluate the enriched statement based on the following criteria:
 3. Retention of original meaning (0-5): How well does it preserve the core meaning of the original statement?
 4. Difficulty (0-5): How complex is the language and concepts used?
 
-Provide your evaluation in the following format:
-Clarity: [score]
-Relevance for context: [score]
-Retention of original meaning: [score]
-Difficulty: [score]
+Respond with a JSON object only, in the form
+{{"clarity": 0, "relevance_for_context": 0, "retention_of_original_meaning": 0, "difficulty": 0, "explanation": "..."}}
+where every score is an integer from 0 to 5 and explanation is 1-2 sentences explaining your evaluation.
+
+ORIGINAL STATEMENT:
+{original_statement}
 
-Brief explanation: [1-2 sentences explaining your evaluation]
+ENRICHED STATEMENT:
+{enriched_statement}
 """
 
+# Concurrent evaluations of the same pair (e.g. from sessions with the same profile) share one request
+_evaluation_flight = SingleFlight("evaluation")
+
+def compute_evaluation_key(original_statement: str, enriched_statement: str, model_name: str) -> str:
+    """Hash identifying an evaluation: rubric version, evaluator model and the statement pair"""
+    payload = json.dumps([RUBRIC_VERSION, model_name, original_statement, enriched_statement], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def parse_evaluation_output(output: str) -> Dict[str, Any]:
+    """
+    Parses and validates the JSON answer to EVALUATION_PROMPT
+
+    Returns:
+        Dictionary with scores and explanation
+
+    Raises:
+        ValueError: If the answer isn't a JSON object with four valid scores
+    """
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", output.strip())
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    explanation = data.get("explanation")
+    return {"scores": parse_rubric_scores(data), "explanation": explanation if isinstance(explanation, str) else ""}
+
+def _remember_evaluation(eval_key: str, evaluation: Dict[str, Any]) -> None:
+    with _evaluation_lock:
+        _evaluation_memory_cache[eval_key] = evaluation
+        _evaluation_memory_cache.move_to_end(eval_key)
+        while len(_evaluation_memory_cache) > EVALUATION_MEMORY_CACHE_SIZE:
+            _evaluation_memory_cache.popitem(last=False)
+
+def _count(stat: str) -> None:
+    with _evaluation_lock:
+        _evaluation_stats[stat] += 1
+
+def get_evaluation_stats() -> Dict[str, Any]:
+    """
+    Returns evaluation cache and parsing counters since process start
+
+    Returns:
+        Dictionary with memory_hits, db_hits, misses, parse_retries, parse_failures and hit_rate
+    """
+    with _evaluation_lock:
+        stats = dict(_evaluation_stats)
+    lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+    return stats
+
+def _build_evaluation_chain(model_name: str, temperature: float):
+    return get_chat_model(model_name, temperature).bind(response_format={"type": "json_object"}) | StrOutputParser()
+
+def _parse_or_reask(output: str, messages: List[Any], model_name: str, parse_attempt: int) -> Tuple[Optional[Dict[str, Any]], List[Any]]:
+    """
+    Parses an evaluation answer
+
+    Returns:
+        Tuple of (evaluation, None) or (None, messages re-asking with the validation error)
+
+    Raises:
+        ValueError: If this was the last of EVALUATION_PARSE_ATTEMPTS requests
+    """
+    try:
+        return parse_evaluation_output(output), None
+    except ValueError as e:
+        # json.JSONDecodeError is a ValueError as well
+        logger.warning(f"Malformed evaluation from {model_name} (request {parse_attempt}/{EVALUATION_PARSE_ATTEMPTS}): {str(e)}")
+        if parse_attempt == EVALUATION_PARSE_ATTEMPTS:
+            _count("parse_failures")
+            raise ValueError(f"No valid evaluation after {EVALUATION_PARSE_ATTEMPTS} requests: {str(e)}")
+        _count("parse_retries")
+        return None, messages + [
+            AIMessage(content=output),
+            HumanMessage(content=f"That answer is invalid ({str(e)}). Respond again with the JSON object only, "
+                                 "with all four scores as integers from 0 to 5.")
+        ]
+
+def _request_evaluation(messages: List[Any], model_name: str, temperature: float) -> Dict[str, Any]:
+    """Asks one model for the evaluation, re-asking with the validation error up to EVALUATION_PARSE_ATTEMPTS times"""
+    chain = _build_evaluation_chain(model_name, temperature)
+    for parse_attempt in range(1, EVALUATION_PARSE_ATTEMPTS + 1):
+        evaluation, messages = _parse_or_reask(chain.invoke(messages), messages, model_name, parse_attempt)
+        if evaluation is not None:
+            return evaluation
+
+def _lookup_evaluation(eval_key: str) -> Optional[Dict[str, Any]]:
+    """Returns a cached evaluation from memory or the evaluation_cache table, counting hits and misses"""
+    with _evaluation_lock:
+        cached = _evaluation_memory_cache.get(eval_key)
+        if cached is not None:
+            _evaluation_memory_cache.move_to_end(eval_key)
+            _evaluation_stats["memory_hits"] += 1
+            return cached
+    
+    cached = get_cached_evaluation(eval_key)
+    if cached is not None:
+        _count("db_hits")
+        _remember_evaluation(eval_key, cached)
+        return cached
+    _count("misses")
+    return None
+
+def _store_evaluation(eval_key: str, model_name: str, evaluation: Dict[str, Any]) -> None:
+    save_cached_evaluation(eval_key, RUBRIC_VERSION, model_name, evaluation["scores"], evaluation["explanation"])
+    _remember_evaluation(eval_key, evaluation)
+    logger.info(f"Evaluated statement with scores: {evaluation['scores']}")
+
+def _build_evaluation_messages(original_statement: str, enriched_statement: str) -> List[Any]:
+    prompt = ChatPromptTemplate.from_template(EVALUATION_PROMPT)
+    return prompt.format_messages(original_statement=original_statement, enriched_statement=enriched_statement)
+
+def evaluate_statement_structured(
+    original_statement: str,
+    enriched_statement: str,
+    model_name: Optional[str] = None,
+    temperature: float = 0.3
+) -> Dict[str, Any]:
+    """
+    Evaluates an enriched statement against the original, with validated JSON output
+    
+    Results are cached in memory and in the evaluation_cache table under
+    compute_evaluation_key, so identical pairs (e.g. from the prompt engineer and the
+    quiz flow) are evaluated once per rubric version. An answer that doesn't match the
+    schema is sent back to the model with the validation error, up to
+    EVALUATION_PARSE_ATTEMPTS requests in total.
+    
+    Without model_name the "evaluate" task's routed model is used, and a model that
+    gives no valid answer escalates to the next tier (ai_service.call_with_escalation).
+    
+    A pair that isn't cached yet is requested once however many callers ask for it
+    concurrently; they all get its result or exception.
+    
+    Returns:
+        Dictionary with scores (clarity, relevance_for_context, retention_of_original_meaning, difficulty) and explanation
+        
+    Raises:
+        ValueError: If no valid answer was returned
+    """
+    # Routed evaluations are cached under the task's first model, whichever tier answered
+    cache_model = model_name or get_task_model("evaluate")
+    eval_key = compute_evaluation_key(original_statement, enriched_statement, cache_model)
+    cached = _lookup_evaluation(eval_key)
+    if cached is not None:
+        return cached
+    
+    def evaluate():
+        messages = _build_evaluation_messages(original_statement, enriched_statement)
+        with llm_call_context(operation="evaluation"):
+            evaluation = call_with_escalation(
+                "evaluate", lambda model: _request_evaluation(messages, model, temperature), model_name=model_name
+            )
+        _store_evaluation(eval_key, cache_model, evaluation)
+        return evaluation
+    
+    return _evaluation_flight.do(make_flight_key(eval_key, model_name, temperature), evaluate)
+
 def evaluate_statement_with_llm(
     original_statement: str, 
     enriched_statement: str,
-    model_name: str = "gpt-4o",
+    model_name: Optional[str] = None,
     temperature: float = 0.3
 ) -> str:
     """
@@ -50,32 +245,22 @@ def evaluate_statement_with_llm(
     Args:
         original_statement: The original statement
         enriched_statement: The enriched statement to evaluate
-        model_name: Name of the LLM model to use
+        model_name: Name of the LLM model to use (routed when None)
         temperature: Temperature setting for the LLM
         
     Returns:
-        Evaluation text with scores and explanation
+        Evaluation text with scores and explanation (see evaluate_statement_structured for the scores themselves)
     """
     try:
-        prompt = ChatPromptTemplate.from_template(EVALUATION_PROMPT)
-        
-        # Create and run the chain
-        chain = prompt | get_chat_model(model_name, temperature) | StrOutputParser()
-        
-        evaluation = chain.invoke({
-            "original_statement": original_statement,
-            "enriched_statement": enriched_statement
-        })
-        
-        logger.info(f"Evaluated statement with result: {evaluation[:100]}...")
-        return evaluation.strip()
+        evaluation = evaluate_statement_structured(original_statement, enriched_statement, model_name, temperature)
+        return format_evaluation(evaluation["scores"], evaluation["explanation"])
     except Exception as e:
         logger.error(f"Error evaluating statement: {str(e)}", exc_info=True)
         raise
 
 def extract_scores(evaluation: str) -> Dict[str, int]:
     """
-    Extracts numerical scores from evaluation text
+    Extracts numerical scores from evaluation text in the format of format_evaluation
     
     Args:
         evaluation: The evaluation text containing scores
@@ -132,28 +317,291 @@ def check_difficulty_threshold(proficiency: str, difficulty: int) -> bool:
     logger.info(f"Difficulty threshold check for {proficiency} level: {difficulty} is within [{min_difficulty}, {max_difficulty}]: {result}")
     return result
 
+def candidate_accepted(entry: Dict[str, Any], proficiency: str) -> bool:
+    """Returns the learned evaluator's verdict on a history entry if it decided, else whether the scores meet the thresholds"""
+    if "learned_accepted" in entry:
+        return entry["learned_accepted"]
+    return meets_thresholds(entry["scores"], proficiency)
+
+def meets_thresholds(scores: Dict[str, int], proficiency: str) -> bool:
+    """Checks the evaluation scores of a candidate against the quality thresholds"""
+    return (scores["clarity"] >= 3 and
+            scores["relevance_for_context"] >= 3 and
+            scores["retention_of_original_meaning"] >= 3 and
+            check_difficulty_threshold(proficiency, scores["difficulty"]))
+
+def get_speculative_settings(global_settings: Optional[Dict[str, Any]]) -> Tuple[int, Optional[int]]:
+    """
+    Returns the candidates generated in parallel per round and the number of rounds
+
+    Returns:
+        Tuple of (candidates, rounds); rounds is None when not configured, in which case
+        there are as many rounds as keep the total number of candidates at max_attempts
+    """
+    global_settings = global_settings or {}
+    candidates = int(global_settings.get("speculative_candidates", DEFAULT_SPECULATIVE_CANDIDATES))
+    rounds = global_settings.get("speculative_rounds")
+    return max(1, min(candidates, MAX_SPECULATIVE_CANDIDATES)), (max(1, int(rounds)) if rounds else None)
+
+def get_self_assessment_settings(global_settings: Optional[Dict[str, Any]]) -> Tuple[bool, float]:
+    """
+    Returns whether candidates are scored by the generating call itself, and the share of
+    them that is also evaluated independently for calibration
+
+    Returns:
+        Tuple of (enabled, calibration_rate)
+    """
+    global_settings = global_settings or {}
+    enabled = bool(global_settings.get("self_assessment_enabled", DEFAULT_SELF_ASSESSMENT_ENABLED))
+    rate = float(global_settings.get("self_assessment_calibration_rate", DEFAULT_CALIBRATION_RATE))
+    return enabled, max(0.0, min(rate, 1.0))
+
+def format_evaluation(scores: Dict[str, int], explanation: str) -> str:
+    """Formats scores as readable evaluation text, which extract_scores can read back"""
+    return (
+        f"Clarity: {scores['clarity']}\n"
+        f"Relevance for context: {scores['relevance_for_context']}\n"
+        f"Retention of original meaning: {scores['retention_of_original_meaning']}\n"
+        f"Difficulty: {scores['difficulty']}\n\n"
+        f"Brief explanation: {explanation}"
+    )
+
+def record_calibration_sample(self_scores: Dict[str, int], independent_scores: Dict[str, int], proficiency: str) -> None:
+    """Keeps a self-assessed / independent score pair for get_self_assessment_calibration"""
+    with _calibration_lock:
+        _calibration_samples.append((self_scores, independent_scores, proficiency))
+        del _calibration_samples[:-MAX_CALIBRATION_SAMPLES]
+
+def get_self_assessment_calibration() -> Dict[str, Any]:
+    """
+    Compares self-assessed scores with independent evaluations of the same candidates
+
+    Returns:
+        Dictionary with samples, per-criterion bias (mean self minus independent score) and
+        mean absolute error, and threshold_agreement (share of samples where both scores
+        lead to the same accept/reject decision)
+    """
+    with _calibration_lock:
+        samples = list(_calibration_samples)
+    
+    criteria = SELF_ASSESSMENT_SCORES
+    if not samples:
+        return {"samples": 0, "bias": {}, "mean_absolute_error": {}, "threshold_agreement": None}
+    
+    return {
+        "samples": len(samples),
+        "bias": {key: sum(own[key] - other[key] for own, other, _ in samples) / len(samples) for key in criteria},
+        "mean_absolute_error": {key: sum(abs(own[key] - other[key]) for own, other, _ in samples) / len(samples) for key in criteria},
+        "threshold_agreement": sum(
+            meets_thresholds(own, proficiency) == meets_thresholds(other, proficiency) for own, other, proficiency in samples
+        ) / len(samples)
+    }
+
+def generate_candidate(
+    context: str,
+    original_statement: str,
+    statement_length: int,
+    prompt_template: str,
+    model_name: str,
+    temperature: float,
+    attempt: int,
+    self_assess: bool = False,
+    calibrate: bool = False,
+    proficiency: str = "Intermediate",
+    prefilter_similarity: Optional[float] = None,
+    learned: Optional[Tuple[str, float]] = None
+) -> Dict[str, Any]:
+    """
+    Generates and evaluates one enrichment candidate
+    
+    With self_assess the generating call also returns the scores, halving the round
+    trips. With calibrate the candidate is evaluated independently as well; those
+    scores are then the ones used and the pair is kept for calibration.
+    
+    With prefilter_similarity the candidate first goes through the local pre-filter
+    (candidate_filter_service), which repairs it or rejects it without an evaluation.
+    A self-assessed candidate the pre-filter repaired is evaluated independently, as
+    its self-scores were given to the unrepaired text.
+    
+    With learned=(mode, min_probability) the learned evaluator predicts whether users
+    prefer the candidate. In "gate" mode candidates below min_probability are rejected
+    without an evaluation; in "replace" mode the prediction decides (learned_accepted)
+    and score_sum is the probability scaled to the rubric's 0-15 range.
+
+    Returns:
+        History entry with metrics, enriched_statement, evaluation, scores, attempt and score_sum
+        (plus self_scores for self-assessed candidates, prefilter for rejected ones and
+        learned_probability / learned_accepted when the learned evaluator ran)
+    """
+    self_scores = None
+    metrics = None
+    with llm_call_context(attempt=attempt):
+        if self_assess:
+            assessment = enrich_statement_with_self_assessment(
+                context=context,
+                original_statement=original_statement,
+                statement_length=statement_length,
+                prompt_template=prompt_template,
+                model_name=model_name,
+                temperature=temperature
+            )
+            enriched_statement = assessment["enriched"]
+            scores = self_scores = assessment["scores"]
+            explanation = assessment["explanation"]
+        else:
+            # Enrich statement; the attempt number keeps concurrent candidates of a run apart
+            enriched_statement = enrich_statement_with_llm(
+                context=context,
+                original_statement=original_statement,
+                statement_length=statement_length,
+                prompt_template=prompt_template,
+                model_name=model_name,
+                temperature=temperature,
+                sample=attempt
+            )
+        
+        if prefilter_similarity is not None:
+            checked = prefilter_candidate(
+                original_statement, enriched_statement, statement_length, proficiency, prefilter_similarity,
+                saves_evaluation=not self_assess or calibrate
+            )
+            if checked["rejected"]:
+                return {
+                    "metrics": checked["metrics"],
+                    "original_statement": original_statement,
+                    "enriched_statement": checked["text"],
+                    "evaluation": f"Rejected by pre-filter: {checked['rejected']}",
+                    "scores": {"clarity": 0, "relevance_for_context": 0, "retention_of_original_meaning": 0, "difficulty": 0},
+                    "attempt": attempt,
+                    "score_sum": 0,
+                    "prefilter": checked["rejected"]
+                }
+            if self_scores is not None and checked["text"] != enriched_statement:
+                logger.info("Pre-filter repaired a self-assessed candidate, evaluating it independently")
+                self_scores = None
+            enriched_statement, metrics = checked["text"], checked["metrics"]
+        
+        learned_probability, learned_accepted = None, None
+        if learned is not None:
+            if metrics is None:
+                metrics = calculate_quality_metrics(original_statement, enriched_statement)
+            learned_probability = predict_preference(original_statement, enriched_statement, metrics)
+        if learned_probability is not None:
+            learned_mode, min_probability = learned
+            learned_accepted = learned_probability >= min_probability
+            if learned_mode == "gate" and not learned_accepted:
+                record_learned_decision(False)
+                return {
+                    "metrics": metrics,
+                    "original_statement": original_statement,
+                    "enriched_statement": enriched_statement,
+                    "evaluation": f"Rejected by learned evaluator: predicted preference {learned_probability:.2f} below {min_probability:.2f}",
+                    "scores": {"clarity": 0, "relevance_for_context": 0, "retention_of_original_meaning": 0, "difficulty": 0},
+                    "attempt": attempt,
+                    "score_sum": 0,
+                    "learned_probability": learned_probability,
+                    "learned_accepted": False
+                }
+        replacing = learned_probability is not None and learned[0] == "replace"
+        
+        independent = None
+        # self_scores is None for self-assessed candidates whose text was repaired
+        if calibrate or (self_assess and self_scores is None) or not (self_assess or replacing):
+            # Evaluate enriched statement
+            independent = evaluate_statement_structured(
+                original_statement=original_statement,
+                enriched_statement=enriched_statement
+            )
+            scores, explanation = independent["scores"], independent["explanation"]
+        elif replacing and not self_assess:
+            scores = {"clarity": 0, "relevance_for_context": 0, "retention_of_original_meaning": 0, "difficulty": 0}
+            explanation = "Not evaluated by the LLM"
+    
+    if learned_probability is not None:
+        record_learned_decision(learned_accepted, meets_thresholds(scores, proficiency) if independent else None)
+    
+    evaluation = format_evaluation(scores, explanation)
+    if replacing:
+        evaluation = f"Learned evaluator: predicted preference {learned_probability:.2f}\n{evaluation}"
+    if self_scores is not None and calibrate:
+        record_calibration_sample(self_scores, scores, proficiency)
+    
+    # Calculate quality metrics (unless the pre-filter already did)
+    if metrics is None:
+        metrics = calculate_quality_metrics(original_statement, enriched_statement)
+    
+    # Calculate total score for ranking
+    score_sum = (
+        scores["clarity"] + 
+        scores["relevance_for_context"] + 
+        scores["retention_of_original_meaning"]
+    )
+    if replacing:
+        score_sum = round(learned_probability * 15, 2)
+    
+    return {
+        "metrics": metrics,
+        "original_statement": original_statement,
+        "enriched_statement": enriched_statement,
+        "evaluation": evaluation,
+        "scores": scores,
+        "attempt": attempt,
+        "score_sum": score_sum,
+        **({"self_scores": self_scores} if self_scores is not None else {}),
+        **({"learned_probability": learned_probability} if learned_probability is not None else {}),
+        **({"learned_accepted": learned_accepted} if replacing else {})
+    }
+
 def regenerate_until_threshold(
     context: str, 
     original_statement: str, 
     proficiency: str,
     statement_length: int = 150,
     prompt_template: Optional[str] = None,
-    model_name: str = "gpt-4o",
+    model_name: Optional[str] = None,
     temperature: float = 0.7,
-    max_attempts: Optional[int] = None
+    max_attempts: Optional[int] = None,
+    candidates: Optional[int] = None,
+    rounds: Optional[int] = None
 ) -> Tuple[str, str, str, int, List[Dict[str, Any]]]:
     """
     Regenerates statement until quality thresholds are met
     
+    With more than one candidate per round (speculative mode), each round generates and
+    evaluates the candidates in parallel and returns the first one that meets the
+    thresholds; the other candidates of the round are cancelled or their results ignored.
+    This trades tokens for tail latency.
+    
+    With self_assessment_enabled each candidate is generated and scored in a single
+    request; a sample of them (self_assessment_calibration_rate) is still evaluated
+    independently, see get_self_assessment_calibration.
+    
+    With prefilter_enabled candidates are checked and repaired locally first; rejected
+    candidates count as attempts but cost no evaluation.
+    
+    With learned_evaluator_mode "gate" or "replace" a model trained on quiz preferences
+    (manage.py train-evaluator) rejects candidates before the evaluation or replaces it.
+    
+    Every run's attempts are recorded (attempt_budget_service). With
+    adaptive_attempts_enabled the run stops early once the recorded outcomes for this
+    prompt, proficiency and statement say a further attempt is unlikely to improve
+    score_sum; in speculative mode this is checked before each further round.
+    
+    Without model_name the "enrich" task's routed model is used (ai_service). With
+    model_routing_enabled the attempts start on the task's tier and move one tier up
+    after every model_routing_escalate_after attempts that don't meet the thresholds.
+    
     Args:
         context: The context for enrichment
         original_statement: The original statement to enrich
         proficiency: User's proficiency level
         statement_length: Target length for enriched statement
         prompt_template: Custom prompt template to use
-        model_name: Name of the LLM model to use
+        model_name: Name of the LLM model to use (routed when None)
         temperature: Temperature setting for the LLM
         max_attempts: Maximum number of regeneration attempts (overrides settings)
+        candidates: Candidates generated in parallel per round (overrides settings)
+        rounds: Maximum number of speculative rounds (overrides settings)
         
     Returns:
         Tuple containing:
@@ -166,13 +614,8 @@ def regenerate_until_threshold(
     attempt_count = 0
     enrichment_history = []
     
-    best_score_sum = 0
-    best_enriched_statement = None
-    best_evaluation = None
-    
     # Get global settings
     from services.db.crud._settings import get_global_settings
-    from services.db.crud._prompts import get_all_prompts
     
     global_settings = get_global_settings("user_settings")
     
@@ -187,7 +630,7 @@ def regenerate_until_threshold(
             original_statement=original_statement,
             statement_length=statement_length,
             prompt_template=prompt_template,
-            model_name=model_name,
+            model_name=model_name or get_task_model("enrich"),
             temperature=temperature
         )
         
@@ -211,94 +654,108 @@ def regenerate_until_threshold(
     if max_attempts is None:
         max_attempts = global_settings.get("evaluation_max_attempts", 5) if global_settings else 5
     
-    # If no prompt template provided, use DEFAULT_PROMPT
+    default_candidates, default_rounds = get_speculative_settings(global_settings)
+    candidates = max(1, candidates or default_candidates)
+    rounds = rounds or default_rounds or math.ceil(max_attempts / candidates)
+    
+    # Resolve the prompt once for all attempts
     if prompt_template is None:
-        selected_prompt_id = global_settings.get("selected_prompt_id", 0) if global_settings else 0
-        
-        # If selected prompt is default (0), use DEFAULT_PROMPT
-        if selected_prompt_id == 0:
-            prompt_template = DEFAULT_PROMPT
-        else:
-            # Get the selected prompt from database
-            all_prompts = get_all_prompts()
-            selected_prompt = None
-            for p in all_prompts:
-                if p["id"] == selected_prompt_id:
-                    selected_prompt = p
-                    break
-            
-            # Use the selected prompt or default if not found
-            prompt_template = selected_prompt["content"] if selected_prompt else DEFAULT_PROMPT
+        prompt_template = resolve_prompt_template(global_settings.get("selected_prompt_id", 0) if global_settings else 0)
     
-    while attempt_count < max_attempts:
-        attempt_count += 1
-        logger.info(f"Enrichment attempt {attempt_count}/{max_attempts}")
-        
+    self_assess, calibration_rate = get_self_assessment_settings(global_settings)
+    prefilter_enabled, prefilter_similarity = get_prefilter_settings(global_settings)
+    learned_mode, learned_min_probability = get_learned_evaluator_settings(global_settings)
+    adaptive, min_improvement_probability, min_observations = get_adaptive_attempt_settings(global_settings)
+    budget = AttemptBudget(
+        prompt_template, proficiency, original_statement, max_attempts if candidates == 1 else rounds * candidates,
+        adaptive=adaptive, min_probability=min_improvement_probability, min_observations=min_observations
+    )
+    
+    def finish(enriched_statement, evaluation):
+        budget.record(enrichment_history, lambda entry: candidate_accepted(entry, proficiency))
+        return original_statement, enriched_statement, evaluation, attempt_count, enrichment_history
+    
+    escalate_after = get_routing_policy()["escalate_after"]
+    
+    def attempt(number, escalation):
+        candidate_model = model_name or get_task_model("enrich", escalation)
+        start = time.monotonic()
         try:
-            # Enrich statement
-            enriched_statement = enrich_statement_with_llm(
-                context=context,
-                original_statement=original_statement,
-                statement_length=statement_length,
-                prompt_template=prompt_template,
-                model_name=model_name,
-                temperature=temperature
-            )
-            
-            # Evaluate enriched statement
-            evaluation = evaluate_statement_with_llm(
-                original_statement=original_statement,
-                enriched_statement=enriched_statement
+            entry = generate_candidate(
+                context, original_statement, statement_length, prompt_template, candidate_model, temperature, number,
+                self_assess=self_assess, calibrate=self_assess and random.random() < calibration_rate, proficiency=proficiency,
+                prefilter_similarity=prefilter_similarity if prefilter_enabled else None,
+                learned=(learned_mode, learned_min_probability) if learned_mode != "off" else None
             )
+        except Exception:
+            record_tier_outcome("enrich", candidate_model, time.monotonic() - start, False)
+            raise
+        accepted = candidate_accepted(entry, proficiency)
+        record_tier_outcome(
+            "enrich", candidate_model, time.monotonic() - start, accepted, quality=entry["score_sum"],
+            escalated=not accepted and model_name is None and number % escalate_after == 0 and can_escalate("enrich", escalation)
+        )
+        entry["model_name"] = candidate_model
+        return entry
+    
+    if candidates == 1:
+        while attempt_count < max_attempts and budget.should_continue(attempt_count + 1):
+            attempt_count += 1
+            logger.info(f"Enrichment attempt {attempt_count}/{max_attempts}")
             
-            # Extract scores
-            scores = extract_scores(evaluation)
-            
-            # Calculate quality metrics
-            metrics = calculate_quality_metrics(original_statement, enriched_statement)
-            
-            # Calculate total score for ranking
-            score_sum = (
-                scores["clarity"] + 
-                scores["relevance_for_context"] + 
-                scores["retention_of_original_meaning"]
-            )
-            
-            # Add to history
-            enrichment_history.append({
-                "metrics": metrics,
-                "original_statement": original_statement,
-                "enriched_statement": enriched_statement,
-                "evaluation": evaluation,
-                "scores": scores,
-                "attempt": attempt_count,
-                "score_sum": score_sum
-            })
-            
-            # Check if this is the best statement so far
-            if score_sum > best_score_sum:
-                best_score_sum = score_sum
-                best_enriched_statement = enriched_statement
-                best_evaluation = evaluation
-            
-            # Check thresholds
-            if (scores["clarity"] >= 3 and 
-                scores["relevance_for_context"] >= 3 and
-                scores["retention_of_original_meaning"] >= 3 and
-                check_difficulty_threshold(proficiency, scores["difficulty"])):
+            try:
+                entry = attempt(attempt_count, (attempt_count - 1) // escalate_after)
+                enrichment_history.append(entry)
                 
-                logger.info(f"Quality thresholds met on attempt {attempt_count}")
-                return original_statement, enriched_statement, evaluation, attempt_count, enrichment_history
+                # Check thresholds
+                if candidate_accepted(entry, proficiency):
+                    logger.info(f"Quality thresholds met on attempt {attempt_count}")
+                    return finish(entry["enriched_statement"], entry["evaluation"])
+                    
+            except Exception as e:
+                logger.error(f"Error during regeneration attempt {attempt_count}: {str(e)}", exc_info=True)
+                # Continue to next attempt
+    else:
+        executor = ThreadPoolExecutor(max_workers=candidates, thread_name_prefix="candidate")
+        try:
+            for round_number in range(1, rounds + 1):
+                if not budget.should_continue(attempt_count + 1):
+                    break
+                logger.info(f"Speculative round {round_number}/{rounds} with {candidates} candidates")
+                # Each candidate runs in a copy of the caller's context so telemetry fields carry over
+                # The whole round runs on the tier reached by the attempts before it
+                futures = [
+                    executor.submit(contextvars.copy_context().run, attempt, attempt_count + index + 1, attempt_count // escalate_after)
+                    for index in range(candidates)
+                ]
+                attempt_count += candidates
                 
-        except Exception as e:
-            logger.error(f"Error during regeneration attempt {attempt_count}: {str(e)}", exc_info=True)
-            # Continue to next attempt
+                for future in as_completed(futures):
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        logger.error(f"Error during speculative candidate: {str(e)}", exc_info=True)
+                        continue
+                    enrichment_history.append(entry)
+                    
+                    if candidate_accepted(entry, proficiency):
+                        for other in futures:
+                            other.cancel()
+                        logger.info(f"Quality thresholds met by attempt {entry['attempt']} in round {round_number}")
+                        return finish(entry["enriched_statement"], entry["evaluation"])
+        finally:
+            # Candidates still in flight finish in the background; their results are discarded
+            executor.shutdown(wait=False, cancel_futures=True)
     
-    # If we've reached max attempts without meeting thresholds, return the best one
-    logger.warning(f"Reached maximum attempts ({max_attempts}) without meeting all thresholds. Returning best statement.")
+    # If we've reached max attempts (or stopped early) without meeting thresholds, return the best one
+    if budget.stopped_early:
+        logger.info(f"Stopped early after {attempt_count} attempts without meeting all thresholds. Returning best statement.")
+    else:
+        logger.warning(f"Reached maximum attempts ({attempt_count}) without meeting all thresholds. Returning best statement.")
     
-    if best_enriched_statement is None:
+    best = max(enrichment_history, key=lambda entry: entry["score_sum"], default=None)
+    if best is None or best["score_sum"] == 0:
         logger.error("Failed to generate any valid enriched statements")
-        return original_statement, original_statement, "Evaluation failed", attempt_count, enrichment_history
+        return finish(original_statement, "Evaluation failed")
         
-    return original_statement, best_enriched_statement, best_evaluation, attempt_count, enrichment_history
+    return finish(best["enriched_statement"], best["evaluation"])
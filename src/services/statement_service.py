@@ -1,6 +1,9 @@
 import streamlit as st
 from services.db.crud._settings import get_global_settings
-from services.db.crud._frameworks import get_all_frameworks, get_framework
+from services.db.crud._frameworks import get_all_frameworks, get_framework, get_framework_summaries
+from services.db.crud._statement_catalog import compute_statement_hash
+from services.db.crud._framework_items import get_statements_for_selection
+from services.db.crud._framework_versions import get_framework_version
 
 # All available statements
 CURRENT_STATEMENTS = [
@@ -129,6 +132,19 @@ def get_active_framework():
     # Fall back to DigiComp framework
     return DIGCOMP_FRAMEWORK
 
+def get_active_framework_version():
+    """Returns (framework_id, version) of the active database framework, or (None, None) for built-in statements"""
+    global_settings = get_global_settings("user_settings")
+    
+    if not global_settings or global_settings.get("statement_source", "default") != "framework":
+        return None, None
+    
+    framework_id = global_settings.get("selected_framework_id")
+    framework_version = get_framework_version(framework_id) if framework_id else None
+    if framework_version:
+        return framework_id, framework_version["version"]
+    return None, None
+
 def get_sample_statements():
     """Returns a subset of statements for demo"""
     framework = get_active_framework()
@@ -147,30 +163,35 @@ def get_statements_from_settings():
     
     if statement_source == "framework":
         # Get statements from selected framework
-        framework = get_active_framework()
+        framework_id = global_settings.get("selected_framework_id")
         selected_categories = global_settings.get("selected_categories", [])
         selected_subcategories = global_settings.get("selected_subcategories", {})
         
-        # Add statements from selected categories
-        for category in selected_categories:
-            selected_statements.extend(get_statements_by_category_from_framework(category, framework))
-        
-        # Add statements from selected subcategories
-        for category, subcategories in selected_subcategories.items():
-            if category not in selected_categories:  # Skip if entire category is already selected
-                for subcategory in subcategories:
-                    selected_statements.extend(get_statements_by_subcategory_from_framework(category, subcategory, framework))
+        # Load only the selected categories/subcategories from the normalized tables
+        partial_statements = get_statements_for_selection(framework_id, selected_categories, selected_subcategories) if framework_id else None
         
-        # Remove duplicates
-        selected_statements = list(set(selected_statements))
+        if partial_statements is not None:
+            selected_statements.extend(partial_statements)
+        else:
+            framework = get_active_framework()
+            
+            # Add statements from selected categories
+            for category in selected_categories:
+                selected_statements.extend(get_statements_by_category_from_framework(category, framework))
+            
+            # Add statements from selected subcategories
+            for category, subcategories in selected_subcategories.items():
+                if category not in selected_categories:  # Skip if entire category is already selected
+                    for subcategory in subcategories:
+                        selected_statements.extend(get_statements_by_subcategory_from_framework(category, subcategory, framework))
+            
+            # Remove duplicates
+            selected_statements = list(set(selected_statements))
         
         # If no statements selected from categories/subcategories, get statements from individual selection
         if not selected_statements:
-            all_framework_statements = get_all_framework_statements(framework)
-            selected_indices = global_settings.get("selected_statements", [])
-            for index in selected_indices:
-                if 0 <= index < len(all_framework_statements):
-                    selected_statements.append(all_framework_statements[index])
+            all_framework_statements = get_all_framework_statements(get_active_framework())
+            selected_statements.extend(get_individually_selected_statements(global_settings, all_framework_statements))
     elif statement_source == "digcomp":
         # Legacy DigiComp support
         selected_categories = global_settings.get("selected_categories", [])
@@ -192,16 +213,10 @@ def get_statements_from_settings():
         # If no statements selected from categories/subcategories, get statements from individual selection
         if not selected_statements:
             all_digcomp_statements = get_all_digcomp_statements()
-            selected_indices = global_settings.get("selected_statements", [])
-            for index in selected_indices:
-                if 0 <= index < len(all_digcomp_statements):
-                    selected_statements.append(all_digcomp_statements[index])
+            selected_statements.extend(get_individually_selected_statements(global_settings, all_digcomp_statements))
     else:
         # Use default statements
-        selected_indices = global_settings.get("selected_statements", [])
-        for index in selected_indices:
-            if 0 <= index < len(CURRENT_STATEMENTS):
-                selected_statements.append(CURRENT_STATEMENTS[index])
+        selected_statements.extend(get_individually_selected_statements(global_settings, CURRENT_STATEMENTS))
     
     # Add custom statements
     if "custom_statements" in global_settings:
@@ -213,6 +228,29 @@ def get_statements_from_settings():
     
     return selected_statements
 
+def get_selected_statement_indices(global_settings, all_statements):
+    """Returns positional indices of individually selected statements.
+    
+    Hashes in "selected_statement_hashes" take precedence over the stored positional
+    indices, so selections survive reordering or editing of the framework.
+    """
+    selected_hashes = global_settings.get("selected_statement_hashes")
+    if selected_hashes is not None:
+        positions = {}
+        for index, statement in enumerate(all_statements):
+            positions.setdefault(compute_statement_hash(statement), index)
+        return [positions[statement_hash] for statement_hash in selected_hashes if statement_hash in positions]
+    
+    return [index for index in global_settings.get("selected_statements", []) if 0 <= index < len(all_statements)]
+
+def get_individually_selected_statements(global_settings, all_statements):
+    """Returns the individually selected statements from the given list"""
+    return [all_statements[index] for index in get_selected_statement_indices(global_settings, all_statements)]
+
+def get_statement_hashes(statements):
+    """Returns the catalog hashes for a list of statements"""
+    return [compute_statement_hash(statement) for statement in statements]
+
 def get_all_statements():
     """Returns all available statements based on current source"""
     global_settings = get_global_settings("user_settings")
@@ -266,15 +304,33 @@ def get_statements_by_subcategory(category_name, subcategory_name):
     """Returns statements for a specific subcategory (DigiComp backward compatibility)"""
     return get_statements_by_subcategory_from_framework(category_name, subcategory_name, DIGCOMP_FRAMEWORK)
 
-def get_category_for_statement(statement, framework=None):
-    """Returns the category and subcategory for a given statement"""
-    if framework is None:
-        framework = get_active_framework()
-    
+def build_statement_index(framework):
+    """Returns a mapping of statement hash to its text, category and subcategory in a framework"""
+    index = {}
     for category_name, category in framework.items():
         for subcategory_name, statements in category.items():
-            if statement in statements:
-                return category_name, subcategory_name
+            for statement in statements:
+                index.setdefault(compute_statement_hash(statement), {
+                    "text": statement,
+                    "category": category_name,
+                    "subcategory": subcategory_name
+                })
+    return index
+
+def get_category_for_statement(statement, framework=None, statement_index=None):
+    """Returns the category and subcategory for a given statement
+    
+    Callers that look up many statements can pass a prebuilt statement_index
+    (see build_statement_index) to avoid rescanning the framework.
+    """
+    if statement_index is None:
+        if framework is None:
+            framework = get_active_framework()
+        statement_index = build_statement_index(framework)
+    
+    entry = statement_index.get(compute_statement_hash(statement))
+    if entry:
+        return entry["category"], entry["subcategory"]
     
     # For custom statements that aren't in the framework, return a default category
     return "Custom Digital Skills", "Custom Statement"
@@ -298,8 +354,8 @@ def get_subcategories(category_name, framework=None):
     return []
 
 def get_available_frameworks():
-    """Returns all available frameworks"""
-    frameworks = get_all_frameworks()
+    """Returns all available frameworks as lightweight summaries (without structure)"""
+    frameworks = get_framework_summaries()
     
     # Add built-in options
     built_in_frameworks = [
@@ -0,0 +1,216 @@
+import atexit
+import contextvars
+import datetime
+import logging
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens: (input, cached input, output); matched by longest model name prefix
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50)
+}
+
+# Records are written in batches by a background thread
+WRITER_BATCH_SIZE = 50
+WRITER_FLUSH_SECONDS = 2.0
+
+# Who and what the current LLM calls are for (user_id, quiz_session_id, operation, prompt_id, prompt_hash, attempt)
+_call_context: contextvars.ContextVar = contextvars.ContextVar("llm_call_context", default={})
+
+@contextmanager
+def llm_call_context(**fields):
+    """
+    Attaches fields to every LLM call recorded inside the block
+
+    Nested blocks add to (and override) the outer fields. Values of None are ignored.
+    Threads started inside the block only see the fields if they copy the context
+    (LangChain's batch does; see generation_service.run_concurrently).
+    """
+    token = _call_context.set({**_call_context.get(), **{key: value for key, value in fields.items() if value is not None}})
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+def get_llm_call_context() -> Dict[str, Any]:
+    """Returns the fields set by the enclosing llm_call_context blocks"""
+    return dict(_call_context.get())
+
+def new_quiz_session_id() -> str:
+    """Returns a new ID that groups the LLM calls of one quiz"""
+    return str(uuid.uuid4())
+
+def get_token_usage(message: Any) -> Tuple[int, int, int]:
+    """Returns (input, output, cached input) tokens from a chat model response message"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    cached = (usage.get("input_token_details") or {}).get("cache_read")
+    if cached is None:
+        # Older integrations only expose the raw OpenAI usage
+        token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        cached = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0), cached or 0
+
+def estimate_cost(model_name: Optional[str], input_tokens: int, cached_tokens: int, output_tokens: int) -> Optional[float]:
+    """Estimates the USD cost of a call, or None for models without a known price"""
+    matches = [name for name in MODEL_PRICES if model_name and model_name.startswith(name)]
+    if not matches:
+        return None
+    input_price, cached_price, output_price = MODEL_PRICES[max(matches, key=len)]
+    uncached_tokens = max(0, input_tokens - cached_tokens)
+    return (uncached_tokens * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+class TelemetryWriter:
+    """Persists LLM call records from a background thread so calls never wait on the database"""
+
+    def __init__(self, batch_size: int = WRITER_BATCH_SIZE, flush_seconds: float = WRITER_FLUSH_SECONDS):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        self._ensure_started()
+        self._queue.put(record)
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Blocks until the queued records are written (or the timeout passes)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="llm-telemetry-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        from services.db.crud._llm_calls import save_llm_calls
+
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                save_llm_calls(batch)
+            except Exception as e:
+                logger.error(f"Error writing LLM telemetry: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+class LLMTelemetryCallback(BaseCallbackHandler):
+    """Records model, tokens, latency, retries and errors of every chat model call"""
+
+    # The handlers only take a lock and queue the record, so async calls run them on the
+    # event loop instead of handing each one to an executor thread
+    run_inline = True
+
+    def __init__(self, writer: TelemetryWriter):
+        self.writer = writer
+        self._runs: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, invocation_params=None, **kwargs) -> None:
+        invocation_params = invocation_params or {}
+        with self._lock:
+            self._runs[run_id] = {
+                "start": time.monotonic(),
+                "model_name": invocation_params.get("model_name") or invocation_params.get("model"),
+                "retries": 0,
+                "queue_wait": 0.0,
+                "context": get_llm_call_context()
+            }
+
+    def on_retry(self, retry_state, *, run_id, **kwargs) -> None:
+        with self._lock:
+            if run_id in self._runs:
+                self._runs[run_id]["retries"] += 1
+
+    def add_queue_wait(self, run_id, seconds: float, retried: bool = False) -> None:
+        """Adds time the call waited in the LLM scheduler (and a retry made through it)"""
+        with self._lock:
+            if run_id in self._runs:
+                self._runs[run_id]["queue_wait"] += seconds
+                self._runs[run_id]["retries"] += int(retried)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        run = self._pop(run_id)
+        if run is None:
+            return
+
+        input_tokens, output_tokens, cached_tokens = 0, 0, 0
+        generations = response.generations[0] if response.generations else []
+        if generations and getattr(generations[0], "message", None) is not None:
+            input_tokens, output_tokens, cached_tokens = get_token_usage(generations[0].message)
+        if not input_tokens and response.llm_output:
+            token_usage = response.llm_output.get("token_usage") or {}
+            input_tokens = token_usage.get("prompt_tokens", 0)
+            output_tokens = token_usage.get("completion_tokens", 0)
+
+        model_name = (response.llm_output or {}).get("model_name") or run["model_name"]
+        self._submit(run, model_name, input_tokens, output_tokens, cached_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        run = self._pop(run_id)
+        if run is not None:
+            self._submit(run, run["model_name"], 0, 0, 0, error=error)
+
+    def _pop(self, run_id) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._runs.pop(run_id, None)
+
+    def _submit(self, run, model_name, input_tokens, output_tokens, cached_tokens, error=None) -> None:
+        context = run["context"]
+        self.writer.submit({
+            "user_id": context.get("user_id"),
+            "quiz_session_id": context.get("quiz_session_id"),
+            "operation": context.get("operation"),
+            "prompt_id": context.get("prompt_id"),
+            "prompt_hash": context.get("prompt_hash"),
+            "attempt": context.get("attempt"),
+            "model_name": model_name,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached_tokens": cached_tokens,
+            # Includes the queue wait
+            "latency_ms": (time.monotonic() - run["start"]) * 1000,
+            "queue_wait_ms": run["queue_wait"] * 1000,
+            "retries": run["retries"],
+            "success": error is None,
+            "error": str(error)[:1000] if error is not None else None,
+            "cost": estimate_cost(model_name, input_tokens, cached_tokens, output_tokens),
+            "created_at": datetime.datetime.utcnow()
+        })
+
+_writer = TelemetryWriter()
+_callback = LLMTelemetryCallback(_writer)
+atexit.register(_writer.flush)
+
+def get_telemetry_callback() -> LLMTelemetryCallback:
+    """Returns the shared callback handler attached to every chat model"""
+    return _callback
+
+def flush_telemetry(timeout: float = 10.0) -> None:
+    """Waits until all recorded calls are persisted"""
+    _writer.flush(timeout)